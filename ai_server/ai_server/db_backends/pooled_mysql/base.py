@@ -0,0 +1,219 @@
+"""
+커넥션 풀을 사용하는 MySQL(PyMySQL) 백엔드.
+
+CONN_MAX_AGE=0 에서는 요청(및 close_old_connections)마다 연결을 닫으므로, 비동기 ORM 호출이 sync_to_async 스레드를
+오갈 때마다 새 MySQL 연결(TCP + 인증 + 세션 설정)이 생깁니다. 이 백엔드는 Django 가 연결을 닫을 때 실제로 닫지 않고
+프로세스 공용 풀에 돌려주고, 새 연결이 필요할 때 풀에서 꺼내 씁니다.
+- 크기 제한: MAX_SIZE 개까지만 열고, 모두 사용 중이면 TIMEOUT 초까지 반환을 기다림
+- 헬스 체크: PING_INTERVAL 초 이상 쉬었거나 오류 후 반환된 연결은 꺼낼 때 ping 으로 확인하고 끊겼으면 버림
+- 재활용: MAX_AGE 초가 지난 연결은 꺼낼 때 닫고 새로 연결 (MySQL wait_timeout 보다 짧게)
+
+설정 (DATABASES['default']['POOL']): MAX_SIZE, MAX_AGE, PING_INTERVAL, TIMEOUT
+풀은 (별칭, 연결 파라미터) 별로 따로 만들어지므로 테스트 DB 처럼 settings_dict 가 바뀌면 새 풀을 씁니다.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from django.db.backends.mysql import base as mysql_base
+
+Database = mysql_base.Database
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolEntry:
+    __slots__ = ("connection", "created_at", "returned_at", "needs_ping")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+        self.needs_ping = False
+
+
+class ConnectionPool:
+    """ 스레드 안전한 DB-API 연결 풀 (유휴 연결은 LIFO 로 꺼내 최근에 쓴 연결을 우선 재사용) """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 20, max_age: float = 1800.0,
+                 ping_interval: float = 30.0, timeout: float = 10.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_age = max_age
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: Deque[_PoolEntry] = deque()
+        self._in_use: Dict[int, _PoolEntry] = {}
+        self._size = 0
+        self._stats = {"checkouts": 0, "created": 0, "reused": 0, "recycled": 0, "broken": 0,
+                       "waits": 0, "timeouts": 0, "connect_ms": 0.0}
+
+    def _new_entry(self) -> _PoolEntry:
+        started = time.perf_counter()
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["connect_ms"] += (time.perf_counter() - started) * 1000
+        return _PoolEntry(connection)
+
+    def _is_healthy(self, entry: _PoolEntry) -> bool:
+        now = time.monotonic()
+        if now - entry.created_at > self.max_age:
+            self._count("recycled")
+            return False
+        if entry.needs_ping or now - entry.returned_at > self.ping_interval:
+            try:
+                entry.connection.ping(reconnect=False)
+            except Exception:
+                self._count("broken")
+                return False
+        return True
+
+    def _count(self, key: str):
+        with self._cond:
+            self._stats[key] += 1
+
+    def _discard(self, entry: _PoolEntry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            entry = None
+            with self._cond:
+                if self._idle:
+                    entry = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise Database.OperationalError(
+                            f"DB 커넥션 풀 대기 시간 초과 ({self.timeout}초, 최대 {self.max_size}개 사용 중)")
+                    if not waited:
+                        waited = True
+                        self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            reused = entry is not None
+            if entry is None:
+                entry = self._new_entry()
+            elif not self._is_healthy(entry):
+                self._discard(entry)
+                continue
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["reused"] += reused
+                self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def release(self, connection, reset: bool = False, needs_ping: bool = False):
+        """ 연결을 풀에 돌려줍니다. reset 이면 진행 중인 트랜잭션을 롤백합니다. """
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+            return
+        if reset:
+            try:
+                connection.rollback()
+            except Exception:
+                self._discard(entry)
+                return
+        entry.returned_at = time.monotonic()
+        entry.needs_ping = needs_ping
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def discard(self, connection):
+        """ 재사용할 수 없는 상태의 연결을 풀에서 빼고 닫습니다. """
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+        else:
+            self._discard(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle), in_use=len(self._in_use))
+        stats["connect_ms_avg"] = round(stats["connect_ms"] / stats["created"], 2) if stats["created"] else 0.0
+        stats["connect_ms"] = round(stats["connect_ms"], 1)
+        return stats
+
+
+_pools: Dict[Tuple[str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(alias: str, conn_params: Dict[str, Any]) -> Tuple[str, str]:
+    """ 같은 별칭이라도 접속 정보(호스트, DB 이름 등)가 바뀌면 다른 풀을 쓰도록 연결 파라미터까지 키에 넣습니다. """
+    return alias, repr(sorted(conn_params.items()))
+
+
+def get_pool(alias: str, conn_params: Dict[str, Any]) -> Optional[ConnectionPool]:
+    return _pools.get(_pool_key(alias, conn_params))
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    """ get_new_connection / _close 를 풀의 acquire / release 로 바꾼 MySQL DatabaseWrapper """
+
+    def _get_pool(self, conn_params: Dict[str, Any]) -> ConnectionPool:
+        key = _pool_key(self.alias, conn_params)
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = self.settings_dict.get("POOL", {})
+                    pool = ConnectionPool(
+                        functools.partial(super().get_new_connection, dict(conn_params)),
+                        max_size=int(options.get("MAX_SIZE", 20)),
+                        max_age=float(options.get("MAX_AGE", 1800)),
+                        ping_interval=float(options.get("PING_INTERVAL", 30)),
+                        timeout=float(options.get("TIMEOUT", 10)),
+                    )
+                    _pools[key] = pool
+        return pool
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """ 현재 settings_dict 의 접속 정보에 해당하는 풀 """
+        return self._get_pool(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        # 연결을 돌려줄 때도 같은 풀로 가도록, 꺼내 온 풀을 기억
+        self._connection_pool = self._get_pool(conn_params)
+        return self._connection_pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            pool = self._connection_pool
+            if self.in_atomic_block:
+                # atomic 블록 안에서 닫히면 Django 가 연결 객체를 계속 참조하므로 풀에 돌려주지 않고 버림
+                pool.discard(self.connection)
+            else:
+                pool.release(self.connection, reset=not self.autocommit, needs_ping=self.errors_occurred)
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+import json
 import os
 from pathlib import Path
 
@@ -82,9 +83,15 @@ APPEND_SLASH = False
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# 커넥션 풀 MySQL 백엔드 (선택): Django 가 연결을 닫으면(CONN_MAX_AGE 0) 실제로 닫지 않고 프로세스 공용 풀에 반환
+# 기본값은 꺼짐(기본 MySQL 백엔드). 풀 동작은 ai_server/db_backends/pooled_mysql/base.py 참고
+# 풀은 프로세스마다 따로 있으므로 켤 때는 DB_POOL_MAX_SIZE x 워커 프로세스 수 (+ 관리 명령 등 여유분) 가
+# MySQL max_connections 보다 작도록 맞출 것
+DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'false').lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'ai_server.db_backends.pooled_mysql' if DB_POOL_ENABLED else 'django.db.backends.mysql',
         'NAME': 'a2a',
         'USER': 'root',
         'PASSWORD': '2626',
@@ -92,6 +99,12 @@ DATABASES = {
         'PORT': '3306',
         'CONN_MAX_AGE': 0,
         'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '20')),
+            'MAX_AGE': float(os.getenv('DB_POOL_MAX_AGE', '1800')),
+            'PING_INTERVAL': float(os.getenv('DB_POOL_PING_INTERVAL', '30')),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
     }
 }
 
@@ -137,6 +150,134 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 TAVILY_API_KEY = os.getenv('TAVILY_API_KEY')
 
+# 회사 프로필(이름 + 최신 CompanyFile 요약) 캐시 설정
+COMPANY_PROFILE_CACHE_SIZE = int(os.getenv('COMPANY_PROFILE_CACHE_SIZE', '1024'))
+COMPANY_PROFILE_CACHE_TTL = float(os.getenv('COMPANY_PROFILE_CACHE_TTL', '300'))
+
+# 임베딩 프로바이더 설정
+# openai: OpenAI 임베딩 API / local: 네트워크 없는 CPU 해싱 임베딩 (지연 민감 배포, 오프라인 부하 테스트용)
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
+OPENAI_EMBEDDING_DIM = int(os.getenv('OPENAI_EMBEDDING_DIM', '1536'))
+LOCAL_EMBEDDING_DIM = int(os.getenv('LOCAL_EMBEDDING_DIM', '512'))
+
+# 임베딩 마이크로 배칭 설정
+# 동시 요청을 모으는 시간 창(ms)과 한 번의 호출에 담을 최대 입력 수
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '10'))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '64'))
+EMBEDDING_BATCH_STATS_LOG_EVERY = int(os.getenv('EMBEDDING_BATCH_STATS_LOG_EVERY', '100'))
+
+# 임베딩 캐시 설정
+# 디스크 캐시 경로를 빈 문자열로 지정하면 프로세스 내 LRU 캐시만 사용합니다.
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MEMORY_ENTRIES', '10000'))
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', str(BASE_DIR / 'var' / 'embedding_cache'))
+EMBEDDING_CACHE_DISK_MAX_MB = int(os.getenv('EMBEDDING_CACHE_DISK_MAX_MB', '256'))
+# 디스크 캐시 memmap 을 디스크에 기록(msync)하는 주기(초). 그 사이에는 OS write-back 에 맡기고, 종료 시에도 기록
+EMBEDDING_CACHE_FLUSH_SECONDS = float(os.getenv('EMBEDDING_CACHE_FLUSH_SECONDS', '30'))
+# 조회 N 번마다 메모리/디스크 적중률과 축출 수를 로그로 남깁니다. (0 이면 끔)
+EMBEDDING_CACHE_STATS_LOG_EVERY = int(os.getenv('EMBEDDING_CACHE_STATS_LOG_EVERY', '1000'))
+
+# 에이전트 대화 메모리 영속화 설정
+# 켜면 채팅방별 FAISS 벡터/메타데이터를 디스크에 저장하고, 중단된 대화를 다시 실행할 때 채팅방을 비우지 않고
+# 저장된 채팅 다음부터 이어서 생성합니다. (저장된 턴은 재요약/재임베딩 없이 메모리에서 복원)
+AGENT_MEMORY_PERSIST = os.getenv('AGENT_MEMORY_PERSIST', 'false').lower() == 'true'
+AGENT_MEMORY_DIR = os.getenv('AGENT_MEMORY_DIR', str(BASE_DIR / 'var' / 'room_memory'))
+# 켜면 턴 적재(요약+임베딩)를 백그라운드로 돌려 다음 에이전트 생성과 겹치게 합니다.
+AGENT_MEMORY_PIPELINED = os.getenv('AGENT_MEMORY_PIPELINED', 'false').lower() == 'true'
+# 메모리 요약 전략: llm(턴마다 LLM 요약) / raw(요약 없음) / extractive(로컬 추출 요약) / batched(임계치 초과 시 여러 턴 일괄 요약)
+AGENT_MEMORY_SUMMARY_STRATEGY = os.getenv('AGENT_MEMORY_SUMMARY_STRATEGY', 'llm')
+AGENT_MEMORY_BATCH_THRESHOLD = int(os.getenv('AGENT_MEMORY_BATCH_THRESHOLD', '6'))
+AGENT_MEMORY_BATCH_SIZE = int(os.getenv('AGENT_MEMORY_BATCH_SIZE', '4'))
+
+# 에이전트 프롬프트 토큰 예산 (instructions + 회사 요약 + 검색된 대화 기록 + 턴 입력 합계)
+PROMPT_TOKEN_ENCODING = os.getenv('PROMPT_TOKEN_ENCODING', 'o200k_base')
+AGENT_PROMPT_BUDGETS = {
+    'seller': int(os.getenv('AGENT_PROMPT_BUDGET_SELLER', '3000')),
+    'buyer': int(os.getenv('AGENT_PROMPT_BUDGET_BUYER', '3000')),
+    'final': int(os.getenv('AGENT_PROMPT_BUDGET_FINAL', '4000')),
+}
+# 회사 요약 압축 시 턴 입력(검색된 대화 기록 + 상대 메시지)용으로 남겨두는 토큰
+AGENT_PROMPT_INPUT_RESERVE = int(os.getenv('AGENT_PROMPT_INPUT_RESERVE', '1000'))
+
+# 배치 협상 실행 (manage.py run_negotiations)
+NEGOTIATION_BATCH_CONCURRENCY = int(os.getenv('NEGOTIATION_BATCH_CONCURRENCY', '4'))
+NEGOTIATION_CHECKPOINT_PATH = os.getenv('NEGOTIATION_CHECKPOINT_PATH',
+                                        str(BASE_DIR / 'var' / 'negotiation_checkpoint.jsonl'))
+
+# LLM/임베딩 호출 스케줄러 (모델별 분당 요청 수/토큰 수 한도, 우선순위 대기열, 429 backoff)
+# LLM_RATE_LIMITS 환경 변수(JSON)로 모델별 한도를 덮어쓸 수 있음. 예: {"gpt-4o": {"rpm": 5000, "tpm": 800000}}
+LLM_SCHEDULER_ENABLED = os.getenv('LLM_SCHEDULER_ENABLED', 'true').lower() == 'true'
+LLM_RATE_LIMITS = {
+    'gpt-4o': {'rpm': 500, 'tpm': 30000},
+    'gpt-4.1-mini': {'rpm': 500, 'tpm': 200000},
+    'text-embedding-3-small': {'rpm': 3000, 'tpm': 1000000},
+    **json.loads(os.getenv('LLM_RATE_LIMITS', '{}')),
+}
+LLM_DEFAULT_RATE_LIMIT = {'rpm': 500, 'tpm': 30000}
+LLM_SCHEDULER_EXPECTED_OUTPUT_TOKENS = int(os.getenv('LLM_SCHEDULER_EXPECTED_OUTPUT_TOKENS', '512'))
+LLM_SCHEDULER_MAX_RETRIES = int(os.getenv('LLM_SCHEDULER_MAX_RETRIES', '3'))
+LLM_SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv('LLM_SCHEDULER_MAX_WAIT_SECONDS', '120'))
+LLM_SCHEDULER_STATS_LOG_EVERY = int(os.getenv('LLM_SCHEDULER_STATS_LOG_EVERY', '100'))
+
+# 공용 HTTP 클라이언트 (OpenAI / Tavily 커넥션 풀, 타임아웃)
+OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv('OPENAI_HTTP_MAX_CONNECTIONS', '100'))
+OPENAI_HTTP_MAX_KEEPALIVE = int(os.getenv('OPENAI_HTTP_MAX_KEEPALIVE', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '120'))
+EXTERNAL_HTTP_POOL_SIZE = int(os.getenv('EXTERNAL_HTTP_POOL_SIZE', '10'))
+EXTERNAL_HTTP_CONNECT_TIMEOUT = float(os.getenv('EXTERNAL_HTTP_CONNECT_TIMEOUT', '3.05'))
+EXTERNAL_HTTP_READ_TIMEOUT = float(os.getenv('EXTERNAL_HTTP_READ_TIMEOUT', '15'))
+HTTP_CLIENT_STATS_LOG_EVERY = int(os.getenv('HTTP_CLIENT_STATS_LOG_EVERY', '200'))
+
+# A2A SSE 스트리밍: ASGI(uvicorn 등)로 배포할 때 true → leads/<id>/agents/chats 를 비동기 뷰로 처리
+A2A_ASYNC_STREAMING = os.getenv('A2A_ASYNC_STREAMING', 'false').lower() == 'true'
+# 부하 테스트 전용: A2A 뷰가 스텁 LLM/로컬 임베딩으로 대화를 실행하고 끝나면 채팅방을 삭제
+AGENT_DRY_RUN = os.getenv('AGENT_DRY_RUN', 'false').lower() == 'true'
+AGENT_DRY_RUN_LATENCY_MS = float(os.getenv('AGENT_DRY_RUN_LATENCY_MS', '500'))
+# 협상 작업: 끝난 작업의 이벤트를 재연결(Last-Event-ID)/다른 구독자를 위해 보관하는 시간(초)
+NEGOTIATION_JOB_TTL_SECONDS = float(os.getenv('NEGOTIATION_JOB_TTL_SECONDS', '600'))
+# 협상 작업: 같은 리드를 다른 프로세스가 실행 중일 때 저장된 채팅을 다시 조회하는 간격(초)
+NEGOTIATION_FOLLOW_POLL_SECONDS = float(os.getenv('NEGOTIATION_FOLLOW_POLL_SECONDS', '2'))
+# 채팅 write-behind: 메시지마다 INSERT 를 기다리지 않고 턴 경계/대화 종료 시 bulk_create 로 저장
+# (스트리밍 레코드는 id 대신 provisionalId 를 담고, 저장 후 'persisted' 이벤트로 실제 id 를 알려줌)
+AGENT_CHAT_WRITE_BEHIND = os.getenv('AGENT_CHAT_WRITE_BEHIND', 'false').lower() == 'true'
+# 채팅방 요약: 대화를 이 토큰 수 이하 청크로 나눠 동시에 부분 요약한 뒤 단계적으로 통합 (map-reduce)
+CHAT_SUMMARY_CHUNK_TOKENS = int(os.getenv('CHAT_SUMMARY_CHUNK_TOKENS', '6000'))
+CHAT_SUMMARY_CONCURRENCY = int(os.getenv('CHAT_SUMMARY_CONCURRENCY', '4'))
+# 채팅방 롤링 요약 저장 위치 (채팅방별 마지막 요약 채팅 id + 요약, 새 채팅만 이어서 요약)
+CHAT_SUMMARY_DIR = os.getenv('CHAT_SUMMARY_DIR', str(BASE_DIR / 'var' / 'chat_summaries'))
+
+# PDF 분석: 메모리 다운로드 제한, 텍스트 문자 예산, 페이지 병렬 추출(프로세스 풀)
+PDF_MAX_DOWNLOAD_BYTES = int(os.getenv('PDF_MAX_DOWNLOAD_BYTES', str(50 * 1024 * 1024)))
+PDF_DOWNLOAD_TIMEOUT = float(os.getenv('PDF_DOWNLOAD_TIMEOUT', '60'))
+PDF_TEXT_MAX_CHARS = int(os.getenv('PDF_TEXT_MAX_CHARS', '15000'))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))  # 1 이면 순차 추출
+# 워커 작업 하나가 맡는 페이지 수. 작을수록 문자 예산에서 일찍 멈추지만 작업당 전달/스케줄링 비용이 늘어남
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv('PDF_EXTRACT_PAGES_PER_TASK', '32'))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+# 증분 재분석: 회사의 이전 파일에서 추출한 구간별 사실 중 페이지 내용이 같은 것은 재사용 (chunked 모드에서만 동작)
+# (구간 경계는 토큰 예산과 페이지 내용 해시로 정해지며, 평균 PDF_CHUNK_BOUNDARY_PAGES 페이지마다 나뉨)
+PDF_INCREMENTAL_ANALYSIS = os.getenv('PDF_INCREMENTAL_ANALYSIS', 'true').lower() == 'true'
+# PDF 분석 방식: single (앞부분 PDF_TEXT_MAX_CHARS 자를 gpt-4o 한 번으로 분석)
+#               chunked (문서 전체를 청크별로 PDF_MAP_MODEL 이 동시에 사실 추출 → PDF_REDUCE_MODEL 이 통합)
+# 증분 재분석을 켜 두면 기본값은 chunked (single 모드는 매번 문서 전체를 다시 분석)
+PDF_ANALYSIS_MODE = os.getenv('PDF_ANALYSIS_MODE', 'chunked' if PDF_INCREMENTAL_ANALYSIS else 'single')
+PDF_CHUNKED_MAX_CHARS = int(os.getenv('PDF_CHUNKED_MAX_CHARS', '400000'))
+PDF_CHUNK_TOKENS = int(os.getenv('PDF_CHUNK_TOKENS', '4000'))
+PDF_REDUCE_MAX_TOKENS = int(os.getenv('PDF_REDUCE_MAX_TOKENS', '12000'))
+PDF_MAP_MODEL = os.getenv('PDF_MAP_MODEL', 'gpt-4.1-mini')
+PDF_REDUCE_MODEL = os.getenv('PDF_REDUCE_MODEL', 'gpt-4o')
+PDF_ANALYSIS_CONCURRENCY = int(os.getenv('PDF_ANALYSIS_CONCURRENCY', '8'))
+# PDF 분석 결과 캐시 (회사별 PDF 바이트/정규화 텍스트 sha256 지문 → 요약)
+PDF_ANALYSIS_CACHE_DIR = os.getenv('PDF_ANALYSIS_CACHE_DIR', str(BASE_DIR / 'var' / 'pdf_analysis'))
+PDF_CHUNK_BOUNDARY_PAGES = int(os.getenv('PDF_CHUNK_BOUNDARY_PAGES', '8'))
+PDF_PAGE_FACTS_DIR = os.getenv('PDF_PAGE_FACTS_DIR', str(BASE_DIR / 'var' / 'pdf_page_facts'))
+# PDF 일괄 분석: 백그라운드에서 동시에 분석하는 파일 수, 요청당 최대 파일 수, 끝난 작업의 진행 상태 보관 시간(초)
+PDF_ANALYSIS_WORKERS = int(os.getenv('PDF_ANALYSIS_WORKERS', '4'))
+PDF_BULK_MAX_FILES = int(os.getenv('PDF_BULK_MAX_FILES', '200'))
+PDF_ANALYSIS_JOB_TTL_SECONDS = float(os.getenv('PDF_ANALYSIS_JOB_TTL_SECONDS', '3600'))
+
 # CORS 설정
 # CORS_ALLOW_ALL_ORIGINS = True  # 모든 origin 허용
 # CORS_ALLOW_CREDENTIALS = True  # credentials 허용
@@ -1,4 +1,14 @@
-from agents import Agent, Runner
+import asyncio
+import logging
+import time
+from typing import List
+
+from agents import Agent
+
+from chat_agent.services.llm_scheduler import run_agent
+from chat_agent.services.token_budget import pack_chunks
+
+logger = logging.getLogger(__name__)
 
 
 async def chat_summary(chats, source_company, lead_company) -> str:
@@ -16,7 +26,92 @@ async def chat_summary(chats, source_company, lead_company) -> str:
     )
 
     chat_input = "\n".join(chats)
-    summary_result = await Runner.run(summary_agent, chat_input)
+    summary_result = await run_agent(summary_agent, chat_input)
     summary_message = summary_result.final_output.strip() if summary_result.final_output else "대화 내용 요약 실패"
 
-    return summary_message
\ No newline at end of file
+    return summary_message
+
+
+async def update_chat_summary(previous_summary: str, new_chats: str, source_company, lead_company) -> str:
+    """ 이전 보고서에 새로 오간 대화만 반영해 보고서를 갱신합니다. (입력은 대화 전체가 아니라 보고서 + 새 대화) """
+    update_agent = Agent(
+        name="SummaryUpdateAgent",
+        instructions=f"""
+                당신은 "{source_company.company_name}" 회사 소속 영업 담당자 입니다.
+                "{lead_company.company_name}" 회사 소속 buyer 와의 협상 내용을 보고해야 합니다.
+                이전에 작성한 마크다운 보고서와 그 이후 새로 오간 대화가 주어집니다.
+                새 대화 내용을 반영하여 같은 형식의 보고서 전체를 다시 출력하세요.
+                
+                **보고서 규칙**
+                1. 반드시 한국어로 작성할 것
+                2. 대화 내용을 요약하고 구매자의 니즈를 분석할 것
+                3. 새 대화로 바뀐 조건이나 결론은 이전 내용을 고쳐 쓸 것
+                """,
+    )
+
+    update_input = f"[이전 보고서]\n{previous_summary}\n\n[새 대화]\n{new_chats}"
+    update_result = await run_agent(update_agent, update_input)
+    return update_result.final_output.strip() if update_result.final_output else previous_summary
+
+
+def _partial_summary_agent(source_company, lead_company) -> Agent:
+    return Agent(
+        name="ChatChunkSummaryAgent",
+        instructions=f"""
+                "{source_company.company_name}"(판매자)와 "{lead_company.company_name}"(구매자)의 협상 대화 중 일부가 주어집니다.
+                이 부분에서 오간 제안, 가격/조건, 구매자의 요구사항과 우려, 합의되거나 남은 쟁점을
+                빠짐없이 한국어 글머리표로 간결하게 정리하세요. 보고서 형식은 쓰지 마세요.
+                """,
+    )
+
+
+def _merge_summary_agent(source_company, lead_company) -> Agent:
+    return Agent(
+        name="ChatSummaryMergeAgent",
+        instructions=f"""
+                "{source_company.company_name}"(판매자)와 "{lead_company.company_name}"(구매자) 협상 대화의
+                연속된 구간별 요약이 순서대로 주어집니다. 중복은 합치고 시간 순서와 결론의 변화를 유지하여
+                하나의 한국어 글머리표 요약으로 통합하세요. 보고서 형식은 쓰지 마세요.
+                """,
+    )
+
+
+async def reduce_chat_chunks(chunks: List[str], source_company, lead_company, chunk_tokens: int,
+                             concurrency: int = 4) -> str:
+    """
+    대화 청크들을 보고서 입력 하나(chunk_tokens 이하)로 줄입니다. (map-reduce)
+    - 청크가 하나면 LLM 호출 없이 그대로 반환
+    - map   : 청크별 부분 요약을 최대 concurrency 개씩 동시에 생성
+    - reduce: 부분 요약을 chunk_tokens 이하 묶음으로 모아 동시에 통합하는 단계를 하나가 될 때까지 반복
+              → 지연 시간이 청크 수에 대해 로그 단위로 증가
+    """
+    if len(chunks) <= 1:
+        return chunks[0] if chunks else ""
+
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def summarize(agent: Agent, text: str) -> str:
+        async with semaphore:
+            result = await run_agent(agent, text)
+        return result.final_output.strip() if result.final_output else ""
+
+    partial_agent = _partial_summary_agent(source_company, lead_company)
+    summaries = await asyncio.gather(*(summarize(partial_agent, chunk) for chunk in chunks))
+    levels = 1
+
+    merge_agent = _merge_summary_agent(source_company, lead_company)
+    separator = "\n\n---\n\n"
+    groups = list(pack_chunks(summaries, chunk_tokens, separator=separator))
+    while len(groups) > 1:
+        summaries = await asyncio.gather(*(summarize(merge_agent, group) for group in groups))
+        levels += 1
+        next_groups = list(pack_chunks(summaries, chunk_tokens, separator=separator))
+        if len(next_groups) >= len(groups):
+            # 통합 요약이 줄어들지 않으면 (예산이 너무 작음) 두 개씩 강제로 묶어 진행
+            next_groups = [separator.join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+        groups = next_groups
+
+    logger.info(f"채팅 요약: 청크 {len(chunks)}개를 {levels}단계로 통합, "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms")
+    return groups[0]
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+from django.db.backends.signals import connection_created
+
+from chat_agent.services.agent_chat_service import discard_chat_room, run_agent_conversation
+from chat_agent.services.embedding_providers import get_embedding_provider
+from chat_agent.services.stub_llm import build_stub_run_config
+
+
+def _summary(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+class Command(BaseCommand):
+    help = ("커넥션 풀 백엔드와 기본 MySQL 백엔드의 연결 준비 시간(연결 + SELECT 1 + 닫기)을 비교하고, "
+            "--lead-id 를 주면 dry-run 대화 한 번에 열리는 DB 연결 수로 대화당 절약 시간을 계산합니다.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--lead-id", type=int, help="연결 수를 셀 dry-run 대화의 리드 (스텁 LLM, 채팅방은 삭제)")
+
+    def _cycle(self, wrapper, iterations):
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            wrapper.ensure_connection()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            wrapper.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    def _connections_per_conversation(self, lead_id):
+        opened = []
+
+        def on_connection_created(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        async def run():
+            chat_room_id = None
+            async for chat in run_agent_conversation(lead_id, run_config=build_stub_run_config(0),
+                                                     embedding_provider=get_embedding_provider("local")):
+                chat_room_id = chat.get("roomId", chat_room_id)
+            if chat_room_id:
+                await discard_chat_room(chat_room_id)
+
+        connection_created.connect(on_connection_created)
+        try:
+            asyncio.run(run())
+        finally:
+            connection_created.disconnect(on_connection_created)
+        return len(opened)
+
+    def handle(self, *args, **options):
+        pooled = connections["default"]
+        if not hasattr(pooled, "pool"):
+            raise CommandError("DATABASES['default'] 가 커넥션 풀 백엔드가 아닙니다. (DB_POOL_ENABLED=true 필요)")
+        plain = MySQLDatabaseWrapper({**pooled.settings_dict}, alias="bench_plain")
+        iterations = options["iterations"]
+
+        self._cycle(pooled, 1)  # 워밍업 (풀에 연결 하나 생성)
+        results = {
+            "plain_backend": _summary(self._cycle(plain, iterations)),
+            "pooled_backend": _summary(self._cycle(pooled, iterations)),
+        }
+        saving_ms = results["plain_backend"]["mean_ms"] - results["pooled_backend"]["mean_ms"]
+        results["saving_per_connection_ms"] = round(saving_ms, 2)
+
+        if options["lead_id"]:
+            opened = self._connections_per_conversation(options["lead_id"])
+            results["connections_per_conversation"] = opened
+            results["saving_per_conversation_ms"] = round(opened * saving_ms, 1)
+        results["pool"] = pooled.pool.stats()
+        results["pool_settings"] = settings.DATABASES["default"].get("POOL", {})
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
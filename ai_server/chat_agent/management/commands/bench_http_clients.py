@@ -0,0 +1,73 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from openai import OpenAI
+
+from chat_agent.services.clients import clients
+
+
+def _summary(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        "calls": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 1),
+        "p50_ms": round(ordered[len(ordered) // 2], 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+    }
+
+
+class Command(BaseCommand):
+    help = "호출마다 새 클라이언트를 만드는 경우와 공용(커넥션 풀) 클라이언트를 쓰는 경우의 호출 지연 시간을 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=("openai", "url"), default="openai",
+                            help="openai: models.list 호출 / url: --url 에 GET 요청")
+        parser.add_argument("--url", default="https://api.tavily.com", help="--target url 일 때 요청할 주소")
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def _call_factories(self, options):
+        if options["target"] == "openai":
+            def fresh():
+                OpenAI(api_key=settings.OPENAI_API_KEY).models.list()
+
+            def pooled():
+                clients.openai().models.list()
+        else:
+            url = options["url"]
+
+            def fresh():
+                requests.get(url, timeout=clients.http_timeout)
+
+            def pooled():
+                clients.http_session().get(url, timeout=clients.http_timeout)
+        return {"fresh_client": fresh, "pooled_client": pooled}
+
+    def _run(self, call, total, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                self.stderr.write(f"호출 실패: {e}")
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(timed, range(total)))
+
+    def handle(self, *args, **options):
+        results = {}
+        for mode, call in self._call_factories(options).items():
+            self._run(call, min(options["concurrency"], options["requests"]), options["concurrency"])  # 워밍업
+            results[mode] = _summary(self._run(call, options["requests"], options["concurrency"]))
+        fresh, pooled = results["fresh_client"], results["pooled_client"]
+        results["saving_per_call_ms"] = {
+            "mean": round(fresh["mean_ms"] - pooled["mean_ms"], 1),
+            "p50": round(fresh["p50_ms"] - pooled["p50_ms"], 1),
+            "p95": round(fresh["p95_ms"] - pooled["p95_ms"], 1),
+        }
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_agent.services.pdf_extract import extract_pdf_text
+from chat_agent.services.pdf_service import PDFAnalysisService
+
+
+def _legacy_extract(pdf_bytes: bytes, max_chars: int) -> str:
+    """ 이전 방식: 임시 파일에 쓰고 모든 페이지를 문자열 += 로 이어 붙인 뒤 자름 """
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        temp_file.write(pdf_bytes)
+        temp_path = temp_file.name
+    text = ""
+    with fitz.open(temp_path) as doc:
+        for page in doc:
+            text += page.get_text()
+    os.remove(temp_path)
+    return text[:max_chars]
+
+
+class Command(BaseCommand):
+    help = "PDF 텍스트 추출 시간을 이전 방식(임시 파일 + 전체 페이지 순차 추출)과 현재 방식(메모리 + 페이지 병렬 + 문자 예산)으로 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", help="로컬 PDF 경로")
+        parser.add_argument("--url", help="PDF URL (현재 방식의 메모리 다운로드 사용)")
+        parser.add_argument("--max-chars", type=int, default=settings.PDF_TEXT_MAX_CHARS,
+                            help="문자 예산 (0 이면 문서 전체)")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            with open(options["file"], "rb") as f:
+                pdf_bytes = f.read()
+        elif options["url"]:
+            pdf_bytes = PDFAnalysisService()._download_pdf(options["url"])
+        else:
+            raise CommandError("--file 또는 --url 이 필요합니다.")
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            page_count = doc.page_count
+        max_chars = options["max_chars"] or len(pdf_bytes) * 10
+
+        def run():
+            return extract_pdf_text(pdf_bytes, max_chars, workers=settings.PDF_EXTRACT_WORKERS,
+                                    pages_per_task=settings.PDF_EXTRACT_PAGES_PER_TASK,
+                                    parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES)
+
+        run()  # 워밍업 (프로세스 풀 기동)
+        results = {"pages": page_count, "bytes": len(pdf_bytes), "max_chars": max_chars}
+        for mode, extract in (("legacy", lambda: _legacy_extract(pdf_bytes, max_chars)), ("current", run)):
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                text = extract()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[mode] = {"best_ms": round(min(timings), 1), "chars": len(text)}
+        results["speedup"] = round(results["legacy"]["best_ms"] / max(results["current"]["best_ms"], 0.1), 1)
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _parse_ids(value: str) -> List[int]:
+    ids = []
+    for part in value.split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            ids.extend(range(int(start), int(end) + 1))
+        elif part.strip():
+            ids.append(int(part))
+    return ids
+
+
+class Command(BaseCommand):
+    help = ("실행 중인 서버의 A2A SSE 엔드포인트에 동시 스트림을 단계적으로 늘려 연결하고, "
+            "단계별 성공률/첫 이벤트 지연/완료 시간을 측정합니다. "
+            "서버는 AGENT_DRY_RUN=true 로 띄워 LLM 호출 없이 측정하세요.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v2")
+        parser.add_argument("--lead-ids", required=True,
+                            help="스트림마다 서로 다른 리드를 사용 (리드당 채팅방 하나). 예: 1-500 또는 1,2,3")
+        parser.add_argument("--levels", default="10,50,100,200", help="단계별 동시 스트림 수")
+        parser.add_argument("--views", default="sync,async",
+                            help="비교할 뷰 (sync: 스레드 기반 기존 경로, async: /async 경로)")
+        parser.add_argument("--timeout", type=float, default=120.0, help="스트림 하나의 최대 시간(초)")
+        parser.add_argument("--max-ttfe-ms", type=float, default=5000.0,
+                            help="이 값 이하의 p95 첫 이벤트 지연과 99% 이상 성공이면 감당 가능한 단계로 판단")
+
+    async def _stream(self, client: httpx.AsyncClient, url: str, timeout: float) -> Dict[str, float]:
+        started = time.perf_counter()
+        first_event_ms = None
+        events = 0
+        try:
+            async with client.stream("GET", url, timeout=timeout) as response:
+                if response.status_code != 200:
+                    return {"ok": False, "error": f"HTTP {response.status_code}"}
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    if first_event_ms is None:
+                        first_event_ms = (time.perf_counter() - started) * 1000
+                    events += 1
+                    if '"error"' in line:
+                        return {"ok": False, "error": line[:200]}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": events > 0, "first_event_ms": first_event_ms or 0.0, "events": events,
+                "duration_ms": (time.perf_counter() - started) * 1000}
+
+    async def _run_level(self, base_url: str, view: str, lead_ids: List[int], timeout: float) -> Dict[str, object]:
+        suffix = "/async" if view == "async" else ""
+        limits = httpx.Limits(max_connections=len(lead_ids), max_keepalive_connections=0)
+        async with httpx.AsyncClient(limits=limits) as client:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                self._stream(client, f"{base_url}/leads/{lead_id}/agents/chats{suffix}", timeout)
+                for lead_id in lead_ids
+            ))
+            elapsed = time.perf_counter() - started
+        succeeded = [result for result in results if result["ok"]]
+        errors = sorted({result["error"] for result in results if not result["ok"]})
+        return {
+            "streams": len(results),
+            "succeeded": len(succeeded),
+            "success_rate": round(len(succeeded) / len(results), 3),
+            "first_event_ms_p50": round(_percentile([r["first_event_ms"] for r in succeeded], 50)),
+            "first_event_ms_p95": round(_percentile([r["first_event_ms"] for r in succeeded], 95)),
+            "duration_ms_p95": round(_percentile([r["duration_ms"] for r in succeeded], 95)),
+            "events_per_s": round(sum(r["events"] for r in succeeded) / elapsed, 1),
+            "errors": errors[:5],
+        }
+
+    def handle(self, *args, **options):
+        lead_ids = _parse_ids(options["lead_ids"])
+        levels = [int(level) for level in options["levels"].split(",")]
+        views = [view.strip() for view in options["views"].split(",")]
+        if any(view not in ("sync", "async") for view in views):
+            raise CommandError("--views 는 sync, async 중에서 선택하세요.")
+        if max(levels) > len(lead_ids):
+            raise CommandError(f"동시 스트림 {max(levels)}개에는 리드 {max(levels)}개 이상이 필요합니다.")
+
+        report = {}
+        for view in views:
+            report[view] = {}
+            sustained = 0
+            for level in levels:
+                result = asyncio.run(self._run_level(options["base_url"].rstrip("/"), view, lead_ids[:level],
+                                                     options["timeout"]))
+                report[view][level] = result
+                self.stdout.write(f"[{view}] 동시 {level}: {json.dumps(result, ensure_ascii=False)}")
+                if result["success_rate"] >= 0.99 and result["first_event_ms_p95"] <= options["max_ttfe_ms"]:
+                    sustained = level
+            report[view]["max_sustained_streams"] = sustained
+        self.stdout.write(json.dumps({view: result["max_sustained_streams"] for view, result in report.items()},
+                                     ensure_ascii=False))
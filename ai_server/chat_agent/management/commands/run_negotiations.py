@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_agent.models import ChatRoom, Lead
+from chat_agent.services.embedding_providers import get_embedding_provider
+from chat_agent.services.negotiation_batch import NegotiationCheckpoint, run_negotiation_batch
+from chat_agent.services.stub_llm import build_stub_run_config
+
+
+class Command(BaseCommand):
+    help = "여러 리드의 A2A 협상을 미리 실행합니다. (동시 실행 제한, 체크포인트 기반 재개, 처리량/지연 시간 리포트)"
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--lead-ids", help="쉼표로 구분한 리드 ID 목록 (예: 1,2,3)")
+        target.add_argument("--all", action="store_true", help="채팅방이 없는 모든 리드")
+        parser.add_argument("--limit", type=int, default=None, help="--all 사용 시 최대 리드 수")
+        parser.add_argument("--concurrency", type=int, default=settings.NEGOTIATION_BATCH_CONCURRENCY)
+        parser.add_argument("--checkpoint", default=None,
+                            help=f"체크포인트 파일 경로 (기본: {settings.NEGOTIATION_CHECKPOINT_PATH})")
+        parser.add_argument("--retry-failed", action="store_true", help="체크포인트에 실패로 기록된 리드도 다시 실행")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="로컬 스텁 LLM과 로컬 임베딩으로 실행하고, 생성된 채팅방/채팅은 리드마다 삭제")
+        parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="dry-run 스텁 LLM 호출당 지연 시간")
+
+    def handle(self, *args, **options):
+        if options["lead_ids"]:
+            try:
+                lead_ids = [int(lead_id) for lead_id in options["lead_ids"].split(",") if lead_id.strip()]
+            except ValueError:
+                raise CommandError("--lead-ids 는 쉼표로 구분한 정수여야 합니다.")
+        else:
+            queryset = Lead.objects.exclude(
+                id__in=ChatRoom.objects.filter(lead__isnull=False).values("lead_id")
+            ).order_by("id").values_list("id", flat=True)
+            lead_ids = list(queryset[:options["limit"]] if options["limit"] else queryset)
+
+        dry_run = options["dry_run"]
+        # dry-run 은 별도 지정하지 않으면 체크포인트를 남기지 않음 (실제 실행의 재개 상태와 섞이지 않도록)
+        checkpoint_path = options["checkpoint"] or (None if dry_run else settings.NEGOTIATION_CHECKPOINT_PATH)
+        checkpoint = NegotiationCheckpoint(checkpoint_path)
+
+        self.stdout.write(f"리드 {len(lead_ids)}건, 동시 실행 {options['concurrency']}, "
+                          f"체크포인트 {checkpoint_path or '없음'}{', dry-run' if dry_run else ''}")
+        report = asyncio.run(run_negotiation_batch(
+            lead_ids,
+            concurrency=options["concurrency"],
+            checkpoint=checkpoint,
+            run_config=build_stub_run_config(options["stub_latency_ms"]) if dry_run else None,
+            embedding_provider=get_embedding_provider("local") if dry_run else None,
+            retry_failed=options["retry_failed"],
+            discard_results=dry_run,
+        ))
+        self.stdout.write(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+        if report.failed:
+            self.stdout.write(self.style.WARNING(f"실패 {report.failed}건 (--retry-failed 로 다시 실행)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("완료"))
@@ -1,86 +1,132 @@
 import asyncio
 import logging
-import os
+import time
 import numpy as np
 import faiss  # FAISS 벡터 데이터베이스용
-# openai 라이브러리 임포트 방식 및 사용법이 1.0.0 버전 기준으로 변경됨
-from openai import AsyncOpenAI  # OpenAI 클라이언트
 from dotenv import load_dotenv  # API 키 관리용
 from typing import List, Tuple, Dict, Any, Optional
 
-from agents import Agent, Runner  # 기존 Agent, Runner 사용 가정
+from agents import Agent, RunConfig  # 에이전트 실행은 llm_scheduler.run_agent 를 거침
+from openai.types.responses import ResponseTextDeltaEvent
 from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import close_old_connections
 
 # Django 모델 임포트
-from chat_agent.models import Company, CompanyFile, Lead, Chat, ChatRoom
+from chat_agent.models import Lead, Chat, ChatRoom
+from chat_agent.services.chat_writer import ChatWriter, serialize_chat
+from chat_agent.services.company_cache import CompanyProfile, company_profile_cache
+from chat_agent.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from chat_agent.services.llm_scheduler import run_agent, run_agent_streamed
+from chat_agent.services.memory_store import RoomMemoryStore
+from chat_agent.services.memory_summarizers import (
+    LLMSummarizer, MemorySummarizer, RawSummarizer, build_memory_summarizer,
+)
+from chat_agent.services.token_budget import (
+    ConversationTokenLedger, fit_sections, fit_text, get_prompt_budget, token_counter,
+)
 
 # 환경 변수 로드 (예: OPENAI_API_KEY)
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# --- OpenAI 및 FAISS 설정 ---
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
+# --- RAG 컴포넌트 (임베딩 프로바이더 + FAISS) ---
+# 임베딩 모델/차원과 클라이언트는 EmbeddingProvider 가 관리합니다. (EMBEDDING_PROVIDER 설정: openai / local)
 
-# OpenAI 비동기 클라이언트 초기화 (openai >= 1.0.0 방식)
-# API 키는 환경변수 OPENAI_API_KEY에서 자동으로 로드되거나, 명시적으로 전달할 수 있습니다.
-aclient = AsyncOpenAI(api_key=OPENAI_API_KEY)
-
-# OpenAI 임베딩 모델 설정
-EMBEDDING_MODEL = "text-embedding-3-small"  # 새롭고 비용 효율적인 모델
-EMBEDDING_DIM = 1536  # text-embedding-3-small 기본 출력 차원
-
-
-# --- RAG 컴포넌트 (OpenAI + FAISS) ---
-
-async def get_openai_embedding(text: str, model: str = EMBEDDING_MODEL) -> Optional[np.ndarray]:
-    """
-    OpenAI API를 사용하여 주어진 텍스트에 대한 임베딩을 생성합니다.
-    최신 openai 라이브러리(>=1.0.0)의 비동기 클라이언트를 사용합니다.
-    잠재적인 API 오류를 처리합니다.
-    """
-    text = text.replace("\n", " ")  # OpenAI 권장 사항
-    try:
-        response = await aclient.embeddings.create(input=[text], model=model)
-        embedding_data = response.data[0].embedding  # 필드 접근 방식 변경됨
-        return np.array(embedding_data, dtype=np.float32)
-    except Exception as e:  # 좀 더 일반적인 예외 처리 (OpenAI 라이브러리 자체 오류 포함)
-        logger.error(f"임베딩 생성 중 OpenAI API 오류 발생: {e}")
-    return None
+# 채팅방별 메모리 영속화 저장소 (AGENT_MEMORY_PERSIST 가 켜진 경우 사용)
+room_memory_store = RoomMemoryStore(settings.AGENT_MEMORY_DIR)
 
 
 class ConversationMemory:
     def __init__(self, summarization_agent: Optional[Agent] = None, top_k: int = 3,
-                 faiss_dimension: int = EMBEDDING_DIM):
-        self.faiss_dimension = faiss_dimension
+                 faiss_dimension: Optional[int] = None, chat_room_id: Optional[int] = None,
+                 store: Optional[RoomMemoryStore] = None, pipelined: bool = False,
+                 summarizer: Optional[MemorySummarizer] = None,
+                 embedding_provider: Optional[EmbeddingProvider] = None):
+        # 임베딩 프로바이더 (지정하지 않으면 EMBEDDING_PROVIDER 설정), 인덱스 차원은 프로바이더를 따름
+        self.embedding_provider = embedding_provider or get_embedding_provider()
+        self.faiss_dimension = faiss_dimension or self.embedding_provider.dim
         # 코사인 유사도를 위한 IndexFlatIP 사용 (정규화된 벡터 필요)
-        # OpenAI 임베딩은 미리 정규화되어 있음.
+        # OpenAI 임베딩과 로컬 해싱 임베딩 모두 정규화되어 있음.
         self.index = faiss.IndexFlatIP(self.faiss_dimension)
         self.document_store: List[Dict[str, Any]] = []  # 원본 텍스트 및 메타데이터 저장
         self.summarization_agent = summarization_agent  # 요약에 사용될 Agent
+        # 요약 전략 (raw / extractive / llm / batched). 지정하지 않으면 에이전트 유무에 따라 llm 또는 raw
+        if summarizer is None:
+            summarizer = LLMSummarizer(summarization_agent) if summarization_agent else RawSummarizer()
+        self.summarizer = summarizer
         self.top_k = top_k  # 관련 컨텍스트 검색 시 반환할 상위 K개
         self.turn_count = 0  # 대화 턴 수 또는 고유 ID 부여용
-
-    async def _summarize_text(self, text_to_summarize: str) -> str:
-        """ (선택적) LLM 에이전트를 사용하여 텍스트를 요약합니다. """
-        if not self.summarization_agent:
-            return text_to_summarize
+        # chat_room_id 와 store 가 주어지면 해당 방의 저장된 인덱스를 이어서 사용하고, 새 턴은 증분 저장
+        self.chat_room_id = chat_room_id
+        self.store = store if chat_room_id is not None else None
+        self._loaded = self.store is None
+        self._load_lock = asyncio.Lock()
+        # 파이프라인 모드: 턴 적재(요약+임베딩)를 백그라운드 태스크로 돌려 다음 에이전트 생성과 겹치게 함
+        self.pipelined = pipelined
+        self._ingest_tail: Optional[asyncio.Task] = None  # 가장 최근 적재 태스크 (적재 순서 보장용)
+        self._pending_raw: Dict[int, str] = {}  # 아직 인덱싱되지 않은 턴의 원문 (최근 대화 창)
+        self.turn_timings: Dict[int, Dict[str, float]] = {}  # 턴별 적재 소요/크리티컬 패스 대기 시간(ms)
+
+    async def _ensure_loaded(self):
+        """ 저장된 방 메모리를 처음 사용할 때 한 번만 불러옵니다. (재요약/재임베딩 없이 인덱스 복원) """
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                vectors, docs = await asyncio.to_thread(self.store.load, self.chat_room_id, self.faiss_dimension)
+            except Exception as e:
+                # 다른 프로바이더(차원)로 저장된 방 등: 기존 파일을 덮어쓰지 않도록 이번 대화는 영속화하지 않음
+                logger.error(f"채팅방 {self.chat_room_id} 메모리 로드 실패, 영속화 없이 빈 메모리로 시작합니다: {e}",
+                             exc_info=True)
+                self.store = None
+                docs = []
+            if docs:
+                self.index.add(np.asarray(vectors, dtype=np.float32))
+                self.document_store.extend(docs)
+                self.turn_count = max(doc.get("conversation_turn_count", 0) for doc in docs)
+                logger.debug(f"채팅방 {self.chat_room_id} 메모리 {len(docs)}건 로드")
+            self._loaded = True
+
+    async def resume(self, max_turns: int) -> int:
+        """
+        이어서 실행하는 대화의 저장된 메모리를 불러오고, 다시 적재하지 않아도 되는 턴 수를 반환합니다.
+        저장된 채팅보다 앞선 턴이 있으면(채팅 저장 전에 중단) 메모리를 비우고 0을 반환합니다. (채팅으로 다시 적재)
+        """
+        await self._ensure_loaded()
+        if self.turn_count > max_turns:
+            logger.info(f"채팅방 {self.chat_room_id} 메모리 턴 {self.turn_count}건이 저장된 채팅({max_turns}턴)보다 많아 비웁니다.")
+            self.index.reset()
+            self.document_store = []
+            self.turn_count = 0
+            if self.store is not None:
+                await asyncio.to_thread(self.store.clear, self.chat_room_id)
+        return self.turn_count
+
+    async def _persist(self, embeddings: np.ndarray, docs: List[Dict[str, Any]]):
+        if self.store is None:
+            return
         try:
-            summary_prompt = f"다음 대화 내용을 간결하게 핵심만 요약해줘. 이 요약은 나중에 대화의 맥락을 파악하는 데 사용될 거야.:\n\n{text_to_summarize}\n\n요약:"
-            result = await Runner.run(self.summarization_agent, input=summary_prompt)
-            summary = result.final_output.strip() if result.final_output else text_to_summarize
-            return summary
+            await asyncio.to_thread(self.store.append, self.chat_room_id, embeddings, docs)
         except Exception as e:
-            logger.error(f"요약 중 오류 발생: {e}", exc_info=True)
-            return text_to_summarize  # 요약 실패 시 원본 반환
+            logger.error(f"채팅방 {self.chat_room_id} 메모리 저장 실패: {e}", exc_info=True)
+
+    async def _summarize_text(self, text_to_summarize: str) -> str:
+        """ 설정된 요약 전략으로 텍스트를 요약합니다. (실패 시 원본 반환) """
+        return (await self.summarizer.summarize(text_to_summarize)).text
 
     async def add_conversation_turn(self, speaker: str, message: str, previous_speaker: Optional[str] = None,
                                     previous_message: Optional[str] = None):
-        """ 대화 턴(또는 요약본)을 메모리에 추가합니다. """
+        """
+        대화 턴(또는 요약본)을 메모리에 추가합니다.
+        파이프라인 모드에서는 적재를 백그라운드로 넘기고 즉시 반환합니다. (flush()로 완료 대기)
+        """
+        await self._ensure_loaded()
         self.turn_count += 1
+        turn_number = self.turn_count
 
         # 요약 대상 텍스트 구성
         if previous_message and previous_speaker:
@@ -88,40 +134,153 @@ class ConversationMemory:
         else:
             text_chunk = f"{speaker}: {message}"
 
-        # 요약 기능 사용 시 (self.summarization_agent가 None이 아니므로 이 블록이 실행됩니다)
-        if self.summarization_agent:
-            final_chunk_to_store = await self._summarize_text(text_chunk) # _summarize_text 함수가 호출됨
-            logger.debug(f"RAG를 위해 요약된 대화 턴 저장 중: {final_chunk_to_store[:50]}...")
-        else: # self.summarization_agent가 None일 경우 (이제 이 블록은 실행되지 않습니다)
-            final_chunk_to_store = text_chunk
-            logger.debug(f"RAG를 위해 원본 대화 턴 저장 중: {final_chunk_to_store[:50]}...")
+        if not self.pipelined:
+            started = time.perf_counter()
+            await self._ingest_turn(turn_number, speaker, text_chunk)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.turn_timings[turn_number] = {"ingest_ms": elapsed_ms, "blocked_ms": elapsed_ms}
+            return
+
+        self._pending_raw[turn_number] = text_chunk
+        self.turn_timings[turn_number] = {"ingest_ms": 0.0, "blocked_ms": 0.0}
+        previous_task = self._ingest_tail
+        self._ingest_tail = asyncio.create_task(
+            self._ingest_turn_in_background(turn_number, speaker, text_chunk, previous_task))
 
-        embedding = await get_openai_embedding(final_chunk_to_store)
+    async def _ingest_turn_in_background(self, turn_number: int, speaker: str, text_chunk: str,
+                                         previous_task: Optional[asyncio.Task]):
+        started = time.perf_counter()
+        try:
+            # 요약/임베딩은 이전 턴 적재와 병렬로 진행하고, 인덱스 추가만 턴 순서대로 수행
+            await self._ingest_turn(turn_number, speaker, text_chunk, wait_for=previous_task)
+        except Exception as e:
+            logger.error(f"턴 {turn_number} 백그라운드 메모리 적재 중 오류 발생: {e}", exc_info=True)
+        finally:
+            self._pending_raw.pop(turn_number, None)
+            self.turn_timings[turn_number]["ingest_ms"] = (time.perf_counter() - started) * 1000
+
+    async def _ingest_turn(self, turn_number: int, speaker: str, text_chunk: str,
+                           wait_for: Optional[asyncio.Task] = None):
+        """ 턴 텍스트를 요약하고 임베딩하여 FAISS 인덱스와 document_store 에 추가합니다. """
+        final_chunk_to_store = await self._summarize_text(text_chunk)
+        logger.debug(f"RAG를 위해 대화 턴 저장 중 [{self.summarizer.name}]: {final_chunk_to_store[:50]}...")
+
+        embedding = await self.embedding_provider.embed(final_chunk_to_store)
+        if wait_for is not None:
+            await asyncio.wait([wait_for])  # 이전 턴의 인덱스 추가가 끝난 뒤에 추가 (예외는 이전 태스크에서 처리)
         if embedding is not None:
             # FAISS는 add 시 2D 배열을 기대함
             self.index.add(np.array([embedding]))
             # 원본 텍스트와 메타데이터 저장, FAISS 인덱스와 동기화
-            self.document_store.append({
+            doc = {
                 "text": final_chunk_to_store,
                 "speaker": speaker,
                 "turn_id": self.index.ntotal - 1,  # FAISS 내 ID
-                "conversation_turn_count": self.turn_count  # 전체 대화에서의 턴 번호
-            })
+                "conversation_turn_count": turn_number  # 전체 대화에서의 턴 번호
+            }
+            if self.summarizer.batches_turns:
+                doc["raw"] = True  # 아직 배치 압축되지 않은 원문 턴
+            self.document_store.append(doc)
+            await self._persist(np.array([embedding]), [doc])
+            if self.summarizer.batches_turns:
+                await self._compress_raw_turns()
         else:
             logger.warning(f"다음 텍스트에 대한 임베딩 생성 실패: {final_chunk_to_store[:50]}...")
 
+    async def _compress_raw_turns(self):
+        """
+        배치 요약 전략: 원문 턴이 임계치를 넘으면 가장 오래된 턴들을 한 번의 LLM 호출로 압축하고,
+        해당 턴들을 요약 문서 하나로 교체하여 인덱스를 다시 구성합니다.
+        """
+        raw_positions = [i for i, doc in enumerate(self.document_store) if doc.get("raw")]
+        if len(raw_positions) <= self.summarizer.threshold:
+            return
+        targets = raw_positions[:self.summarizer.batch_size]
+        target_docs = [self.document_store[i] for i in targets]
+        ntotal_before = self.index.ntotal
+
+        result = await self.summarizer.compress([doc["text"] for doc in target_docs])
+        embedding = await self.embedding_provider.embed(result.text)
+        if embedding is None or self.index.ntotal != ntotal_before:
+            logger.warning("배치 요약 결과를 반영하지 못했습니다. (임베딩 실패 또는 인덱스 변경)")
+            return
+
+        first_turn = target_docs[0].get("conversation_turn_count")
+        last_turn = target_docs[-1].get("conversation_turn_count")
+        summary_doc = {
+            "text": result.text,
+            "speaker": "Summary",
+            "conversation_turn_count": last_turn,
+            "turn_range": [first_turn, last_turn],
+        }
+        old_vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        target_set = set(targets)
+        new_docs, new_vectors = [], []
+        for position, doc in enumerate(self.document_store):
+            if position == targets[0]:
+                new_docs.append(summary_doc)
+                new_vectors.append(embedding)
+            if position not in target_set:
+                new_docs.append(doc)
+                new_vectors.append(old_vectors[position])
+        for position, doc in enumerate(new_docs):
+            doc["turn_id"] = position
+
+        vectors = np.vstack(new_vectors).astype(np.float32)
+        self.index.reset()
+        self.index.add(vectors)
+        self.document_store = new_docs
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.rewrite, self.chat_room_id, vectors, new_docs)
+            except Exception as e:
+                logger.error(f"채팅방 {self.chat_room_id} 메모리 재저장 실패: {e}", exc_info=True)
+
+    async def flush(self):
+        """ 진행 중인 백그라운드 적재가 모두 끝날 때까지 기다립니다. 기다린 시간은 크리티컬 패스 대기로 기록합니다. """
+        tail = self._ingest_tail
+        if tail is None or tail.done():
+            return
+        started = time.perf_counter()
+        await asyncio.wait([tail])
+        blocked_ms = (time.perf_counter() - started) * 1000
+        if self.turn_timings:
+            self.turn_timings[max(self.turn_timings)]["blocked_ms"] += blocked_ms
+
+    def _recency_window(self) -> str:
+        """ 아직 인덱싱되지 않은 최근 대화 원문 """
+        return "\n\n".join(
+            f"[직전 대화 (Turn {turn_number}, 원문)]: {text}"
+            for turn_number, text in sorted(self._pending_raw.items())
+        )
+
+    def log_turn_timings(self, label: str):
+        """ 턴별 메모리 적재 시간과 크리티컬 패스에서 절감된 시간을 로그로 남깁니다. """
+        total_saved_ms = 0.0
+        for turn_number, timing in sorted(self.turn_timings.items()):
+            saved_ms = max(0.0, timing["ingest_ms"] - timing["blocked_ms"])
+            total_saved_ms += saved_ms
+            logger.info(f"{label} 턴 {turn_number} 메모리 적재 {timing['ingest_ms']:.0f}ms, "
+                        f"크리티컬 패스 대기 {timing['blocked_ms']:.0f}ms, 절감 {saved_ms:.0f}ms")
+        logger.info(f"{label} 메모리 적재 총 절감 {total_saved_ms:.0f}ms (pipelined={self.pipelined})")
+
     async def get_relevant_context(self, query_message: str, k: Optional[int] = None) -> str:
-        """ 쿼리 메시지와 관련된 과거 대화 컨텍스트를 검색합니다. """
+        """
+        쿼리 메시지와 관련된 과거 대화 컨텍스트를 검색합니다.
+        파이프라인 모드에서는 현재까지 인덱싱된 기록과 아직 적재 중인 최근 대화 원문을 함께 반환합니다.
+        """
+        await self._ensure_loaded()
+        recency_window = self._recency_window()
         if self.index.ntotal == 0:
-            return "관련된 과거 대화 기록이 아직 없습니다."
+            return recency_window or "관련된 과거 대화 기록이 아직 없습니다."
 
         k_to_use = k if k is not None else self.top_k
         k_to_use = min(k_to_use, self.index.ntotal)
 
-        query_embedding = await get_openai_embedding(query_message)
+        query_embedding = await self.embedding_provider.embed(query_message)
         if query_embedding is None:
             logger.warning("RAG 쿼리에 대한 임베딩 생성 실패.")
-            return "쿼리 임베딩 생성에 실패하여 과거 대화 기록을 가져올 수 없습니다."
+            return recency_window or "쿼리 임베딩 생성에 실패하여 과거 대화 기록을 가져올 수 없습니다."
 
         # FAISS search는 거리(D)와 인덱스(I)를 반환.
         # IndexFlatIP의 경우, 점수(내적값)가 높을수록 유사함 (정규화된 벡터의 경우 코사인 유사도).
@@ -133,20 +292,36 @@ class ConversationMemory:
             similarity_score = similarities[0][i]  # 해당 문서와 쿼리 간의 유사도 점수
             if doc_index < len(self.document_store):  # 유효한 인덱스인지 확인
                 doc = self.document_store[doc_index]
-                # 저장된 텍스트는 요약본입니다.
+                # 저장된 텍스트는 요약 전략에 따른 요약본(또는 원문)입니다.
+                turn_label = doc.get('conversation_turn_count', 'N/A')
+                if doc.get("turn_range"):
+                    turn_label = f"{doc['turn_range'][0]}-{doc['turn_range'][1]}"
                 relevant_docs.append(
-                    f"[과거 대화 기록 (Turn {doc.get('conversation_turn_count', 'N/A')}, 유사도 {similarity_score:.2f})]: {doc['text']}"
+                    f"[과거 대화 기록 (Turn {turn_label}, 유사도 {similarity_score:.2f})]: {doc['text']}"
                 )
             else:
                 logger.warning(f"FAISS가 유효하지 않은 인덱스를 반환했습니다: {doc_index}")
 
+        if recency_window:
+            relevant_docs.append(recency_window)
+
         if not relevant_docs:
             return "관련된 과거 대화 기록을 찾지 못했습니다."
 
         return "\n\n".join(relevant_docs)
 
 
-# --- 기존 Django Helper 함수들 (수정 없음) ---
+def get_room_memory(chat_room_id: int, summarization_agent: Optional[Agent] = None,
+                    top_k: int = 3, pipelined: bool = False,
+                    summarizer: Optional[MemorySummarizer] = None,
+                    embedding_provider: Optional[EmbeddingProvider] = None) -> ConversationMemory:
+    """ 채팅방에 저장된 메모리를 이어 쓰는 ConversationMemory 를 생성합니다. (요약/임베딩 재계산 없음) """
+    return ConversationMemory(summarization_agent=summarization_agent, top_k=top_k,
+                              chat_room_id=chat_room_id, store=room_memory_store, pipelined=pipelined,
+                              summarizer=summarizer, embedding_provider=embedding_provider)
+
+
+# --- Django Helper 함수들 (채팅 저장, 채팅방 관리, 대화 부트스트랩) ---
 async def save_chat_and_return(chat_room_id, from_company, to_company, contents) -> dict:
     chat = await Chat.objects.acreate(
         chat_room_id=chat_room_id,
@@ -154,29 +329,97 @@ async def save_chat_and_return(chat_room_id, from_company, to_company, contents)
         to_id=to_company.id,
         contents=contents
     )
-    return {
-        "id": chat.id,
-        "fromId": from_company.id,
-        "toId": to_company.id,
-        "fromCompanyName": from_company.company_name,
-        "toCompanyName": to_company.company_name,
-        "contents": chat.contents,
-        "roomId": chat_room_id,
-        "createdAt": chat.created_at.isoformat(),
-        "updatedAt": chat.updated_at.isoformat(),
-    }
-
-
-async def get_lead(lead_id: int, retries: int = 3, delay: float = 1.0) -> Optional[Lead]:
+    return serialize_chat(chat, from_company, to_company)
+
+
+# 한 번의 대화에서 저장되는 최대 메시지 수: 판매자 첫 제안 + 3턴(구매자, 판매자) + 구매자 최종 요약
+MAX_CONVERSATION_MESSAGES = 1 + 3 * 2 + 1
+
+
+def load_stored_conversation(lead_id: int) -> Optional[Tuple[int, List[dict]]]:
+    """
+    리드의 채팅방 ID와 저장된 채팅(순서대로, SSE 레코드 형식)을 반환합니다. 채팅방이 없으면 None.
+    채팅은 lead 유니크 인덱스로 채팅방을 조인하는 쿼리 한 번으로 가져옵니다. (채팅이 없을 때만 채팅방 조회 추가)
+    """
+    chats = list(Chat.objects.filter(chat_room__lead_id=lead_id)
+                 .select_related('from_field', 'to').order_by('id'))
+    if chats:
+        return chats[0].chat_room_id, [serialize_chat(chat, chat.from_field, chat.to) for chat in chats]
+    chat_room_id = ChatRoom.objects.filter(lead_id=lead_id).values_list('id', flat=True).first()
+    return (chat_room_id, []) if chat_room_id else None
+
+
+def is_conversation_complete(chats: List[dict]) -> bool:
+    """ '종료' 메시지로 끝났거나 최종 요약까지 저장된 대화인지 (중단된 대화는 다시 실행해야 함) """
+    if not chats:
+        return False
+    return "종료" in (chats[-1]["contents"] or "") or len(chats) >= MAX_CONVERSATION_MESSAGES
+
+
+async def create_chat_room(lead_id):
+    try:
+        return await ChatRoom.objects.acreate(lead_id=lead_id)
+    except Exception as e:
+        logger.error(f"리드 {lead_id}에 대한 채팅방 생성 중 오류 발생: {e}", exc_info=True)
+        raise
+
+
+async def reset_chat_room(lead_id: int, chat_room_id: int) -> ChatRoom:
+    """
+    중단된 대화의 채팅방을 재사용합니다. (리드당 채팅방은 하나뿐이므로 새로 만들지 않음)
+    이전 실행에서 저장된 일부 채팅과 채팅방 메모리는 삭제하고 빈 채팅방으로 되돌립니다.
+    """
+    chat_room = await ChatRoom.objects.aget(id=chat_room_id, lead_id=lead_id)
+    deleted, _ = await Chat.objects.filter(chat_room_id=chat_room.id).adelete()
+    await asyncio.to_thread(room_memory_store.clear, chat_room.id)
+    if deleted:
+        logger.info(f"리드 {lead_id} 채팅방 {chat_room.id} 재사용: 이전 채팅 {deleted}건 삭제")
+    return chat_room
+
+
+async def resume_chat_room(lead_id: int, chat_room_id: int) -> ChatRoom:
+    """ 중단된 대화의 채팅방을 저장된 채팅과 채팅방 메모리를 그대로 둔 채 이어서 사용합니다. """
+    return await ChatRoom.objects.aget(id=chat_room_id, lead_id=lead_id)
+
+
+@sync_to_async
+def discard_chat_room(chat_room_id: int):
+    """ dry-run 으로 만든 채팅방과 채팅, 채팅방 메모리를 삭제합니다. """
+    Chat.objects.filter(chat_room_id=chat_room_id).delete()
+    ChatRoom.objects.filter(id=chat_room_id).delete()
+    room_memory_store.clear(chat_room_id)
+
+
+class ConversationBootstrap:
+    """ 대화 시작에 필요한 리드, 양측 회사 프로필(이름 + 최신 CompanyFile 요약) """
+
+    def __init__(self, lead: Lead, buyer_company: Optional[CompanyProfile], seller_company: Optional[CompanyProfile]):
+        self.lead = lead
+        self.buyer_company = buyer_company
+        self.seller_company = seller_company
+        self.buyer_summary = buyer_company.summary if buyer_company else None
+        self.seller_summary = seller_company.summary if seller_company else None
+
+
+async def load_conversation_bootstrap(lead_id: int, retries: int = 3,
+                                      delay: float = 1.0) -> Optional[ConversationBootstrap]:
+    """
+    리드의 회사 ID만 조회한 뒤, 양측 회사 이름/최신 요약은 회사 프로필 캐시에서 가져옵니다.
+    캐시 미스인 회사만 한 번의 쿼리로 함께 조회하므로 최대 두 번의 쿼리로 끝납니다.
+    """
     for attempt in range(1, retries + 1):
         try:
             await sync_to_async(close_old_connections)()
-            return await Lead.objects.select_related('lead_company', 'source_company').aget(id=lead_id)
+            lead = await Lead.objects.only('id', 'lead_company_id', 'source_company_id').aget(id=lead_id)
+            profiles = await company_profile_cache.aget_many([lead.lead_company_id, lead.source_company_id])
+            return ConversationBootstrap(lead, profiles.get(lead.lead_company_id),
+                                         profiles.get(lead.source_company_id))
         except Lead.DoesNotExist:
             logger.warning(f"ID={lead_id}인 리드를 찾을 수 없습니다.")
             return None
         except Exception as e:
-            logger.error(f"리드 {lead_id} 조회 중 오류 발생 (시도 {attempt}): {e}", exc_info=True)
+            # 커넥션 풀(DB_POOL_ENABLED)을 끈 기본 백엔드에서는 끊긴 연결이 그대로 넘어올 수 있으므로 재시도
+            logger.error(f"리드 {lead_id} 초기 데이터 조회 중 오류 발생 (시도 {attempt}): {e}", exc_info=True)
             if attempt < retries:
                 await sync_to_async(close_old_connections)()
                 await asyncio.sleep(delay)  # type: ignore
@@ -184,63 +427,146 @@ async def get_lead(lead_id: int, retries: int = 3, delay: float = 1.0) -> Option
                 raise  # 최대 재시도 후 예외 다시 발생
 
 
-async def get_company(company_id):
-    try:
-        return await Company.objects.aget(id=company_id)
-    except Company.DoesNotExist:
-        logger.warning(f"ID={company_id}인 회사를 찾을 수 없습니다.")
-        return None
-    except Exception as e:
-        logger.error(f"회사 {company_id} 조회 중 오류 발생: {e}", exc_info=True)
-        raise
+def build_seller_instructions(company_name: str, seller_info: Optional[str], buyer_info: Optional[str]) -> str:
+    return f"""
+                    당신은 "{company_name}" 회사 소속 영업 담당자입니다. 상대 회사가 필요로 할만한 제품을 추천하고 매출을 늘릴 수 있도록 설득하고 협상하세요.
+                    대화 중 [과거 대화 기록]이 제공될 수 있습니다. 이를 참고하여 맥락에 맞는 답변을 생성하고, 동일한 제안이나 질문을 반복하지 마세요.
+                    귀사 정보: {seller_info if seller_info else "제공된 요약 없음"}
+                    상대 회사 정보: {buyer_info if buyer_info else "제공된 요약 없음"}
+                    **대화 규칙:**
+                    1. 구체적인 수치는 사실 기반으로, 그 외 효과 및 장점은 자유롭게 답변하세요.
+                    2. 반드시 한국어로 대답하세요.
+                    """
 
 
-async def get_latest_summary(company):
-    try:
-        latest_file = await CompanyFile.objects.filter(company=company).order_by('-created_at').afirst()
-        return latest_file.summary if latest_file else None
-    except Exception as e:
-        logger.error(f"회사 {company.id}의 최신 요약 정보 조회 중 오류 발생: {e}", exc_info=True)
-        return None
+def build_buyer_instructions(company_name: str, buyer_info: Optional[str]) -> str:
+    return f"""
+                    당신은 "{company_name}" 회사 소속 구매 담당자입니다. 상대방의 제안이 적합한지 질문하고 협상하세요.
+                    대화 중 [과거 대화 기록]이 제공될 수 있습니다. 이를 반드시 참고하여 동일한 질문을 반복하지 마세요.
+                    적합하다고 판단되면 구매 의사를 적합성(%)과 함께 "종료"라고 명확히 대답하세요.
+                    귀사 정보: {buyer_info if buyer_info else "제공된 요약 없음"}
+                    **대화 규칙:**
+                    1. [과거 대화 기록]을 참고하여 중복 질문을 피하세요.
+                    2. 상대 제안을 회사 필요와 비교 분석하여 장단점을 평가하세요.
+                    3. 제품 기능 외 가격, 납기, 지원 조건 등 실질적 구매 조건을 확인하세요.
+                    4. 제안이 적합하면, **적합성(0%~100%)과 근거를 밝히고 "종료"** 라고 답변하세요. (예: "제안이 요구사항과 85% 일치하며 가격 경쟁력이 뛰어납니다. 구매 검토하겠습니다. 종료")
+                    5. 적합성은 보수적으로 측정하고, 반드시 한국어로 대답하세요.
+                    """
 
 
-async def create_chat_room(lead_id):
-    try:
-        return await ChatRoom.objects.acreate(lead_id=lead_id)
-    except Exception as e:
-        logger.error(f"리드 {lead_id}에 대한 채팅방 생성 중 오류 발생: {e}", exc_info=True)
-        raise
+class AgentReply:
+    """ 에이전트 응답 생성 결과. 스트리밍 중에는 provisional_id 로 델타 이벤트를 묶습니다. """
+
+    def __init__(self, provisional_id: Optional[str] = None):
+        self.provisional_id = provisional_id
+        self.text: str = ""
+
+
+async def generate_agent_reply(agent: Agent, prompt: str, reply: AgentReply, stream_tokens: bool = False,
+                               run_config: Optional[RunConfig] = None):
+    """
+    에이전트 응답을 생성하여 reply.text 에 담습니다.
+    stream_tokens 가 켜져 있으면 streamed runner 로 실행하며 토큰 델타마다
+    {"type": "delta", "provisionalId", "delta"} 이벤트를 yield 합니다. (꺼져 있으면 아무것도 yield 하지 않음)
+    """
+    if not stream_tokens:
+        result = await run_agent(agent, prompt, run_config=run_config)
+        reply.text = result.final_output.strip() if result.final_output else ""
+        return
+
+    async with run_agent_streamed(agent, prompt, run_config=run_config) as result:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+                yield {"type": "delta", "provisionalId": reply.provisional_id, "delta": event.data.delta}
+    reply.text = result.final_output.strip() if result.final_output else ""
 
 
 # --- RAG가 적용된 메인 대화 함수 (OpenAI + FAISS) ---
-async def run_agent_conversation(lead_id: int):
+async def run_agent_conversation(lead_id: int, stream_tokens: bool = False, chat_room_id: Optional[int] = None,
+                                 run_config: Optional[RunConfig] = None,
+                                 embedding_provider: Optional[EmbeddingProvider] = None, resume: bool = False):
     """
     두 AI 에이전트(판매자, 구매자) 간의 RAG 기반 대화를 비동기적으로 실행하고,
     각 메시지를 데이터베이스에 저장 후 생성된 채팅 정보를 yield 합니다.
     OpenAI 임베딩과 FAISS를 RAG에 사용합니다. (openai >= 1.0.0 호환)
+    stream_tokens 가 켜져 있으면 응답 생성 중 토큰 델타 이벤트를 먼저 yield 하고,
+    완료 후 같은 provisionalId 를 담은 저장된 채팅 정보를 yield 합니다.
+    첫 이벤트까지 걸린 시간(time-to-first-event)을 로그로 남깁니다.
+    chat_room_id 를 주면 새 채팅방을 만들지 않고 해당 채팅방을 비워 재사용합니다. (중단된 배치 실행 재개용)
+    resume 이면 비우지 않고 저장된 채팅을 생성 없이 그대로 yield 한 뒤 다음 메시지부터 이어서 생성합니다.
+    이때 채팅방 메모리(AGENT_MEMORY_PERSIST)가 저장된 채팅과 맞으면 재요약/재임베딩 없이 이어 씁니다.
+    run_config / embedding_provider 를 주면 모든 에이전트 호출과 대화 메모리에 적용합니다. (예: dry-run 스텁 모델)
+    AGENT_CHAT_WRITE_BEHIND 가 켜져 있으면 메시지를 저장(INSERT)을 기다리지 않고 provisionalId 로 먼저 yield 하고,
+    턴 경계와 대화 종료 시 모아서 저장한 뒤 'persisted' 이벤트(provisionalId → id)를 yield 합니다.
+    오류나 연결 종료로 대화가 중단되어도 버퍼에 남은 메시지는 저장합니다.
     """
+    started = time.perf_counter()
+    chat_writer = ChatWriter() if settings.AGENT_CHAT_WRITE_BEHIND else None
+    conversation = _run_agent_conversation(lead_id, stream_tokens, chat_room_id, run_config, embedding_provider,
+                                           chat_writer, resume)
+    first_event = True
+    try:
+        async for event in conversation:
+            if first_event:
+                first_event = False
+                logger.info(f"리드 {lead_id} time-to-first-event {(time.perf_counter() - started) * 1000:.0f}ms")
+            yield event
+    finally:
+        await conversation.aclose()
+        if chat_writer is not None:
+            try:
+                await chat_writer.flush()
+            except Exception as e:
+                logger.error(f"리드 {lead_id} 남은 채팅 {chat_writer.pending}건 저장 중 오류 발생: {e}", exc_info=True)
+            logger.info(f"리드 {lead_id} 채팅 write-behind: {chat_writer.rows}건을 INSERT {chat_writer.flushes}회로 저장")
+
+
+async def _run_agent_conversation(lead_id: int, stream_tokens: bool, chat_room_id: Optional[int],
+                                  run_config: Optional[RunConfig], embedding_provider: Optional[EmbeddingProvider],
+                                  chat_writer: Optional[ChatWriter] = None, resume: bool = False):
     try:
-        lead = await get_lead(lead_id)
-        if not lead:
+        # 리드/회사/최신 요약 로딩 (회사 프로필은 캐시 사용)
+        bootstrap_started = time.perf_counter()
+        bootstrap = await load_conversation_bootstrap(lead_id)
+        if not bootstrap:
             logger.warning(f"ID={lead_id}인 리드를 찾을 수 없습니다.")
             yield {"error": f"리드 정보를 찾을 수 없습니다 (ID: {lead_id})."}
             return
 
-        buyer_company_id = lead.lead_company_id
-        seller_company_id = lead.source_company_id
-
-        # get_company 함수는 ID를 받으므로 기존 코드 유지
-        buyer_company = await get_company(buyer_company_id)
-        seller_company = await get_company(seller_company_id)
-
+        buyer_company = bootstrap.buyer_company
+        seller_company = bootstrap.seller_company
         if not buyer_company or not seller_company:
             logger.error(f"리드 {lead_id}에 대한 구매자 또는 판매자 회사를 찾을 수 없습니다.")
             yield {"error": "구매자 또는 판매자 회사 정보를 찾을 수 없습니다."}
             return
 
-        buyer_summary_from_db = await get_latest_summary(buyer_company)
-        seller_summary_from_db = await get_latest_summary(seller_company)
-        chat_room = await create_chat_room(lead_id)
+        buyer_summary_from_db = bootstrap.buyer_summary
+        seller_summary_from_db = bootstrap.seller_summary
+        logger.debug(f"리드 {lead_id} 초기 데이터 로딩 {(time.perf_counter() - bootstrap_started) * 1000:.0f}ms")
+
+        # 이어서 실행: 저장된 채팅은 다시 생성하지 않고 순서대로 yield
+        resumed_chats: List[dict] = []
+        if chat_room_id and resume:
+            stored = await sync_to_async(load_stored_conversation)(lead_id)
+            if stored is not None and stored[0] == chat_room_id:
+                resumed_chats = stored[1]
+            if is_conversation_complete(resumed_chats):
+                # 이미 끝난 대화는 저장된 채팅만 돌려주고 종료
+                for chat in resumed_chats:
+                    yield chat
+                return
+            logger.info(f"리드 {lead_id} 채팅방 {chat_room_id} 이어서 실행: 저장된 채팅 {len(resumed_chats)}건")
+        # 최종 요약은 메모리에 넣지 않으므로 메모리 턴은 최대 MAX_CONVERSATION_MESSAGES - 1
+        resumed_turns = min(len(resumed_chats), MAX_CONVERSATION_MESSAGES - 1)
+
+        # 채팅방 생성(또는 재사용)은 판매자 첫 메시지 생성과 병렬로 진행 (첫 메시지 저장 직전에 완료 대기)
+        if not chat_room_id:
+            chat_room_coro = create_chat_room(lead_id)
+        elif resume:
+            chat_room_coro = resume_chat_room(lead_id, chat_room_id)
+        else:
+            chat_room_coro = reset_chat_room(lead_id, chat_room_id)
+        chat_room_task = asyncio.create_task(chat_room_coro)
 
     except Exception as e:
         logger.error(f"리드 {lead_id} 초기 데이터 로딩 중 오류 발생: {e}", exc_info=True)
@@ -252,37 +578,34 @@ async def run_agent_conversation(lead_id: int):
         summarizer_agent = Agent(name="SummarizerAgent",
                                  instructions="주어진 대화 내용을 다음 대화 참여자가 맥락을 이해하기 쉽도록 핵심만 간결하게 요약해.")
 
-        # ConversationMemory 초기화 시 summarization_agent 전달
-        conversation_memory = ConversationMemory(summarization_agent=summarizer_agent, top_k=2)
+        # 배포 설정에 따른 요약 전략 (llm / raw / extractive / batched)
+        memory_summarizer = build_memory_summarizer(
+            settings.AGENT_MEMORY_SUMMARY_STRATEGY, summarizer_agent,
+            batch_threshold=settings.AGENT_MEMORY_BATCH_THRESHOLD,
+            batch_size=settings.AGENT_MEMORY_BATCH_SIZE,
+            run_config=run_config,
+        )
+
+        # 회사 요약은 역할별 프롬프트 예산(턴 입력 몫 제외)에 맞게 상대 회사와의 관련도 순으로 압축
+        seller_summary_budget = (get_prompt_budget("seller") - settings.AGENT_PROMPT_INPUT_RESERVE
+                                 - token_counter.count(build_seller_instructions(seller_company.company_name, "", "")))
+        seller_info, buyer_info_for_seller = fit_sections(
+            [(seller_summary_from_db, buyer_summary_from_db), (buyer_summary_from_db, seller_summary_from_db)],
+            seller_summary_budget,
+        )
+        buyer_summary_budget = (get_prompt_budget("buyer") - settings.AGENT_PROMPT_INPUT_RESERVE
+                                - token_counter.count(build_buyer_instructions(buyer_company.company_name, "")))
+        buyer_info = fit_text(buyer_summary_from_db, buyer_summary_budget, query=seller_summary_from_db)
 
         # 판매자 에이전트 초기화
         seller_agent = Agent(
             name="SellerAgent",
-            instructions=f"""
-                    당신은 "{seller_company.company_name}" 회사 소속 영업 담당자입니다. 상대 회사가 필요로 할만한 제품을 추천하고 매출을 늘릴 수 있도록 설득하고 협상하세요.
-                    대화 중 [과거 대화 기록]이 제공될 수 있습니다. 이를 참고하여 맥락에 맞는 답변을 생성하고, 동일한 제안이나 질문을 반복하지 마세요.
-                    귀사 정보: {seller_summary_from_db if seller_summary_from_db else "제공된 요약 없음"}
-                    상대 회사 정보: {buyer_summary_from_db if buyer_summary_from_db else "제공된 요약 없음"}
-                    **대화 규칙:**
-                    1. 구체적인 수치는 사실 기반으로, 그 외 효과 및 장점은 자유롭게 답변하세요.
-                    2. 반드시 한국어로 대답하세요.
-                    """,
+            instructions=build_seller_instructions(seller_company.company_name, seller_info, buyer_info_for_seller),
         )
         # 구매자 에이전트 초기화
         buyer_agent = Agent(
             name="BuyerAgent",
-            instructions=f"""
-                    당신은 "{buyer_company.company_name}" 회사 소속 구매 담당자입니다. 상대방의 제안이 적합한지 질문하고 협상하세요.
-                    대화 중 [과거 대화 기록]이 제공될 수 있습니다. 이를 반드시 참고하여 동일한 질문을 반복하지 마세요.
-                    적합하다고 판단되면 구매 의사를 적합성(%)과 함께 "종료"라고 명확히 대답하세요.
-                    귀사 정보: {buyer_summary_from_db if buyer_summary_from_db else "제공된 요약 없음"}
-                    **대화 규칙:**
-                    1. [과거 대화 기록]을 참고하여 중복 질문을 피하세요.
-                    2. 상대 제안을 회사 필요와 비교 분석하여 장단점을 평가하세요.
-                    3. 제품 기능 외 가격, 납기, 지원 조건 등 실질적 구매 조건을 확인하세요.
-                    4. 제안이 적합하면, **적합성(0%~100%)과 근거를 밝히고 "종료"** 라고 답변하세요. (예: "제안이 요구사항과 85% 일치하며 가격 경쟁력이 뛰어납니다. 구매 검토하겠습니다. 종료")
-                    5. 적합성은 보수적으로 측정하고, 반드시 한국어로 대답하세요.
-                    """,
+            instructions=build_buyer_instructions(buyer_company.company_name, buyer_info),
         )
 
     except Exception as e:
@@ -295,23 +618,110 @@ async def run_agent_conversation(lead_id: int):
     # 이전 메시지 추적 변수 초기화
     previous_seller_message_for_memory = ""
     previous_buyer_message_for_memory = ""
+    message_sequence = 0
+    memory_turns = 0  # 이번 실행에서 메모리에 넣은(또는 이어받은) 턴 수
+    remembered_turns = 0  # 이어받은 메모리에 이미 있는 턴 수
+
+    def take_resumed() -> Optional[dict]:
+        """ 이어받은 채팅이 남아 있으면 다음 메시지로 반환합니다. (생성/저장 생략) """
+        return resumed_chats.pop(0) if resumed_chats else None
+
+    async def remember(**turn):
+        """ 턴을 메모리에 추가합니다. 이어받은 메모리에 이미 있는 턴은 다시 요약/임베딩하지 않습니다. """
+        nonlocal memory_turns
+        memory_turns += 1
+        if memory_turns > remembered_turns:
+            await conversation_memory.add_conversation_turn(**turn)
+
+    def next_reply() -> AgentReply:
+        # 스트리밍 델타와 최종 저장 레코드를 연결하기 위한 임시 메시지 ID
+        nonlocal message_sequence
+        message_sequence += 1
+        return AgentReply(provisional_id=f"{lead_id}-{message_sequence}" if stream_tokens or chat_writer else None)
+
+    def with_provisional_id(chat_data: dict, reply: AgentReply) -> dict:
+        if reply.provisional_id:
+            chat_data["provisionalId"] = reply.provisional_id
+        return chat_data
+
+    async def save_chat(from_company, to_company, contents: str, reply: AgentReply) -> dict:
+        # write-behind 면 버퍼에만 넣고 바로 반환 (저장은 flush_chats 에서)
+        if chat_writer is not None:
+            return chat_writer.add(from_company, to_company, contents, reply.provisional_id)
+        chat_data = await save_chat_and_return(chat_room_id=chat_room.id, from_company=from_company,
+                                               to_company=to_company, contents=contents)
+        return with_provisional_id(chat_data, reply)
+
+    async def flush_chats() -> Optional[dict]:
+        """ 턴 경계에서 write-behind 버퍼를 저장하고 persisted 이벤트(실패 시 error 이벤트)를 반환합니다. """
+        if chat_writer is None:
+            return None
+        try:
+            return await chat_writer.flush()
+        except Exception as e:
+            logger.error(f"리드 {lead_id} 채팅 일괄 저장 중 오류 발생: {e}", exc_info=True)
+            return {"error": "채팅 저장 중 오류가 발생했습니다."}
+
+    # 턴별/대화 전체 토큰 기록
+    token_ledger = ConversationTokenLedger(f"리드 {lead_id}")
+    instruction_tokens = {"seller": token_counter.count(seller_agent.instructions),
+                          "buyer": token_counter.count(buyer_agent.instructions)}
+
+    def build_budgeted_input(role: str, context: str, build_prompt, budget_role: Optional[str] = None) -> Tuple[str, int]:
+        """ 검색된 과거 대화 기록(관련도 순)을 역할별 예산의 남은 몫에 맞게 잘라 프롬프트를 만듭니다. """
+        available = get_prompt_budget(budget_role or role) - instruction_tokens[role] - token_counter.count(build_prompt(""))
+        fitted = fit_text(context, available, ranked=True, separator="\n\n")
+        return build_prompt(fitted), token_counter.count(context) - token_counter.count(fitted)
+
+    def record_tokens(role: str, prompt: str, reply_text: str, trimmed_tokens: int = 0, label: Optional[str] = None):
+        token_ledger.record(label or role, instruction_tokens[role] + token_counter.count(prompt),
+                            token_counter.count(reply_text), trimmed_tokens)
+
+    seller_reply = next_reply()
+    resumed_chat = take_resumed()
+    if resumed_chat is not None:
+        seller_message_content = resumed_chat["contents"]
+    else:
+        try:
+            # 판매자 첫 메시지 생성
+            first_seller_prompt = "상대 회사에게 우리 회사의 제품을 제안하세요."
+            async for delta in generate_agent_reply(seller_agent, first_seller_prompt, seller_reply, stream_tokens,
+                                                    run_config):
+                yield delta
+            seller_message_content = seller_reply.text or "판매자 첫 제안 생성 실패"
+            record_tokens("seller", first_seller_prompt, seller_reply.text)
+        except Exception as e:
+            logger.error(f"리드 {lead_id} 초기 판매자 에이전트 실행 중 오류 발생: {e}", exc_info=True)
+            seller_message_content = "오류로 인해 첫 제안을 생성할 수 없습니다."
 
     try:
-        # 판매자 첫 메시지 생성
-        seller_result = await Runner.run(seller_agent, input="상대 회사에게 우리 회사의 제품을 제안하세요.")
-        seller_message_content = seller_result.final_output.strip() if seller_result.final_output else "판매자 첫 제안 생성 실패"
+        chat_room = await chat_room_task
     except Exception as e:
-        logger.error(f"리드 {lead_id} 초기 판매자 에이전트 실행 중 오류 발생: {e}", exc_info=True)
-        seller_message_content = "오류로 인해 첫 제안을 생성할 수 없습니다."
+        logger.error(f"리드 {lead_id} 초기 데이터 로딩 중 오류 발생: {e}", exc_info=True)
+        yield {"error": "초기 데이터 로딩 중 오류가 발생했습니다."}
+        return
+    if chat_writer is not None:
+        chat_writer.chat_room_id = chat_room.id
+
+    # ConversationMemory 초기화 시 summarization_agent 전달
+    # 영속 모드에서는 같은 채팅방의 저장된 인덱스를 이어서 사용
+    # 파이프라인 모드에서는 턴 적재가 다음 에이전트 생성과 병렬로 진행됨
+    if settings.AGENT_MEMORY_PERSIST:
+        conversation_memory = get_room_memory(chat_room.id, summarization_agent=summarizer_agent, top_k=2,
+                                              pipelined=settings.AGENT_MEMORY_PIPELINED,
+                                              summarizer=memory_summarizer, embedding_provider=embedding_provider)
+    else:
+        conversation_memory = ConversationMemory(summarization_agent=summarizer_agent, top_k=2,
+                                                 pipelined=settings.AGENT_MEMORY_PIPELINED,
+                                                 summarizer=memory_summarizer, embedding_provider=embedding_provider)
+    if resumed_turns:
+        remembered_turns = await conversation_memory.resume(resumed_turns)
+        logger.info(f"리드 {lead_id} 채팅방 {chat_room.id} 메모리 턴 {remembered_turns}/{resumed_turns}건 재사용")
 
     try:
         # 판매자 첫 메시지 저장 및 yield
-        seller_chat_data = await save_chat_and_return(
-            chat_room_id=chat_room.id,
-            from_company=seller_company,
-            to_company=buyer_company,
-            contents=seller_message_content
-        )
+        seller_chat_data = resumed_chat or await save_chat(seller_company, buyer_company, seller_message_content,
+                                                           seller_reply)
         yield seller_chat_data
     except Exception as e:
         logger.error(f"리드 {lead_id} 초기 판매자 채팅 저장 중 오류 발생: {e}", exc_info=True)
@@ -320,7 +730,7 @@ async def run_agent_conversation(lead_id: int):
         return
 
     # 첫 메시지를 메모리에 추가 (이때 요약 기능이 활성화되어 있다면 _summarize_text 호출됨)
-    await conversation_memory.add_conversation_turn(
+    await remember(
         speaker="SellerAgent",
         message=seller_message_content,
         previous_speaker=None, # 첫 턴이므로 이전 메시지 없음
@@ -332,31 +742,37 @@ async def run_agent_conversation(lead_id: int):
     # 원본 코드에 있던 3턴 루프 유지
     for turn in range(3):
         # --- 구매자 턴 ---
-        try:
-            relevant_context_for_buyer = await conversation_memory.get_relevant_context(
-                previous_seller_message_for_memory)
-            buyer_input_prompt = f"{relevant_context_for_buyer}\n\n---\n위의 과거 대화 기록을 참고하여 다음 판매자 메시지에 응답하세요:\nSellerAgent: {previous_seller_message_for_memory}"
-            buyer_result = await Runner.run(buyer_agent, input=buyer_input_prompt)
-            buyer_message_content = buyer_result.final_output.strip() if buyer_result.final_output else "구매자 답변 생성 실패"
-        except Exception as e:
-            logger.error(f"리드 {lead_id} 구매자 에이전트 실행 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
-            buyer_message_content = "오류로 인해 답변할 수 없습니다."
+        buyer_reply = next_reply()
+        resumed_chat = take_resumed()
+        if resumed_chat is not None:
+            buyer_message_content = resumed_chat["contents"]
+        else:
+            try:
+                relevant_context_for_buyer = await conversation_memory.get_relevant_context(
+                    previous_seller_message_for_memory)
+                buyer_input_prompt, trimmed_tokens = build_budgeted_input(
+                    "buyer", relevant_context_for_buyer,
+                    lambda context: f"{context}\n\n---\n위의 과거 대화 기록을 참고하여 다음 판매자 메시지에 응답하세요:\nSellerAgent: {previous_seller_message_for_memory}")
+                async for delta in generate_agent_reply(buyer_agent, buyer_input_prompt, buyer_reply, stream_tokens,
+                                                        run_config):
+                    yield delta
+                buyer_message_content = buyer_reply.text or "구매자 답변 생성 실패"
+                record_tokens("buyer", buyer_input_prompt, buyer_reply.text, trimmed_tokens)
+            except Exception as e:
+                logger.error(f"리드 {lead_id} 구매자 에이전트 실행 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
+                buyer_message_content = "오류로 인해 답변할 수 없습니다."
 
         try:
             # 구매자 메시지 저장 및 yield
-            buyer_chat_data = await save_chat_and_return(
-                chat_room_id=chat_room.id,
-                from_company=buyer_company,
-                to_company=seller_company,
-                contents=buyer_message_content
-            )
+            buyer_chat_data = resumed_chat or await save_chat(buyer_company, seller_company, buyer_message_content,
+                                                              buyer_reply)
             yield buyer_chat_data
         except Exception as e:
             logger.error(f"리드 {lead_id} 구매자 채팅 저장 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
             break # 저장 실패 시 루프 종료
 
         # 현재 턴 (판매자 메시지 + 구매자 메시지)을 메모리에 추가 (이때 요약 기능이 활성화)
-        await conversation_memory.add_conversation_turn(
+        await remember(
             speaker="BuyerAgent",
             message=buyer_message_content,
             previous_speaker="SellerAgent",
@@ -371,31 +787,37 @@ async def run_agent_conversation(lead_id: int):
 
         # --- 판매자 턴 ---
         # (만약 구매자 메시지에 '종료'가 없으면 판매자가 응답)
-        try:
-            relevant_context_for_seller = await conversation_memory.get_relevant_context(
-                previous_buyer_message_for_memory)
-            seller_input_prompt = f"{relevant_context_for_seller}\n\n---\n위의 과거 대화 기록을 참고하여 다음 구매자 메시지에 응답하세요:\nBuyerAgent: {previous_buyer_message_for_memory}"
-            seller_result = await Runner.run(seller_agent, input=seller_input_prompt)
-            seller_message_content = seller_result.final_output.strip() if seller_result.final_output else "판매자 답변 생성 실패"
-        except Exception as e:
-            logger.error(f"리드 {lead_id} 판매자 에이전트 실행 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
-            seller_message_content = "오류로 인해 답변할 수 없습니다."
+        seller_reply = next_reply()
+        resumed_chat = take_resumed()
+        if resumed_chat is not None:
+            seller_message_content = resumed_chat["contents"]
+        else:
+            try:
+                relevant_context_for_seller = await conversation_memory.get_relevant_context(
+                    previous_buyer_message_for_memory)
+                seller_input_prompt, trimmed_tokens = build_budgeted_input(
+                    "seller", relevant_context_for_seller,
+                    lambda context: f"{context}\n\n---\n위의 과거 대화 기록을 참고하여 다음 구매자 메시지에 응답하세요:\nBuyerAgent: {previous_buyer_message_for_memory}")
+                async for delta in generate_agent_reply(seller_agent, seller_input_prompt, seller_reply, stream_tokens,
+                                                        run_config):
+                    yield delta
+                seller_message_content = seller_reply.text or "판매자 답변 생성 실패"
+                record_tokens("seller", seller_input_prompt, seller_reply.text, trimmed_tokens)
+            except Exception as e:
+                logger.error(f"리드 {lead_id} 판매자 에이전트 실행 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
+                seller_message_content = "오류로 인해 답변할 수 없습니다."
 
         try:
             # 판매자 메시지 저장 및 yield
-            seller_chat_data = await save_chat_and_return(
-                chat_room_id=chat_room.id,
-                from_company=seller_company,
-                to_company=buyer_company,
-                contents=seller_message_content
-            )
+            seller_chat_data = resumed_chat or await save_chat(seller_company, buyer_company, seller_message_content,
+                                                               seller_reply)
             yield seller_chat_data
         except Exception as e:
             logger.error(f"리드 {lead_id} 판매자 채팅 저장 중 오류 발생 (턴 {turn + 1}): {e}", exc_info=True)
             break # 저장 실패 시 루프 종료
 
         # 현재 턴 (구매자 메시지 + 판매자 메시지)을 메모리에 추가 (이때 요약 기능이 활성화)
-        await conversation_memory.add_conversation_turn(
+        await remember(
             speaker="SellerAgent",
             message=seller_message_content,
             previous_speaker="BuyerAgent",
@@ -403,11 +825,23 @@ async def run_agent_conversation(lead_id: int):
         )
         previous_seller_message_for_memory = seller_message_content # 다음 턴에서 이전 메시지로 사용
 
+        # 턴 경계: write-behind 버퍼 저장
+        persisted = await flush_chats()
+        if persisted:
+            yield persisted
+            if "error" in persisted:
+                return
+
         # 판매자 메시지에 '종료' 포함 시 대화 종료 (원본 코드 로직 유지)
         if "종료" in seller_message_content:
             conversation_ended = True
             break # 루프 종료
 
+    # 최종 요약 전에 백그라운드 적재를 모두 반영
+    await conversation_memory.flush()
+    conversation_memory.log_turn_timings(f"리드 {lead_id}")
+    logger.info(f"리드 {lead_id} 메모리 요약 통계: {conversation_memory.summarizer.stats()}")
+
     # --- 대화 종료 또는 최대 턴 도달 후 최종 요약 (구매자 관점) ---
     if not conversation_ended:
         final_summary_context_query = buyer_message_content
@@ -416,30 +850,41 @@ async def run_agent_conversation(lead_id: int):
 
         relevant_context_for_final_summary = await conversation_memory.get_relevant_context(final_summary_context_query,
                                                                                             k=5)
-        summary_request_input = (
-            f"{relevant_context_for_final_summary}\n\n---\n"
-            f"위의 과거 대화 기록과 현재까지의 논의를 종합하여, 우리 회사({buyer_company.company_name}) 입장에서의 "
-            f"최종 적합성(0% ~ 100%)과 그 판단 근거를 명확하게 밝혀주세요. "
-            f"만약 추가 정보가 필요하다면 어떤 정보가 필요한지도 언급해주세요."
-            f"적합성은 최대한 보수적으로 측정하세요."
+        summary_request_input, final_trimmed_tokens = build_budgeted_input(
+            "buyer", relevant_context_for_final_summary,
+            lambda context: (
+                f"{context}\n\n---\n"
+                f"위의 과거 대화 기록과 현재까지의 논의를 종합하여, 우리 회사({buyer_company.company_name}) 입장에서의 "
+                f"최종 적합성(0% ~ 100%)과 그 판단 근거를 명확하게 밝혀주세요. "
+                f"만약 추가 정보가 필요하다면 어떤 정보가 필요한지도 언급해주세요."
+                f"적합성은 최대한 보수적으로 측정하세요."
+            ),
+            budget_role="final",
         )
         logger.debug(f"리드 {lead_id} 최종 요약 입력 프롬프트:\n{summary_request_input[:500]}...")
 
+        final_reply = next_reply()
         try:
-            final_summary_result = await Runner.run(buyer_agent, input=summary_request_input)
-            final_summary_message = final_summary_result.final_output.strip() if final_summary_result.final_output else "최종 요약 생성 실패"
+            async for delta in generate_agent_reply(buyer_agent, summary_request_input, final_reply, stream_tokens,
+                                                    run_config):
+                yield delta
+            final_summary_message = final_reply.text or "최종 요약 생성 실패"
+            record_tokens("buyer", summary_request_input, final_reply.text, final_trimmed_tokens, label="final")
         except Exception as e:
             logger.error(f"리드 {lead_id} 최종 요약 에이전트 실행 중 오류 발생: {e}", exc_info=True)
             final_summary_message = "오류로 인해 대화 요약을 생성할 수 없습니다."
 
         try:
-            final_chat_data = await save_chat_and_return(
-                chat_room_id=chat_room.id,
-                from_company=buyer_company,
-                to_company=seller_company,
-                contents=final_summary_message
-            )
+            final_chat_data = await save_chat(buyer_company, seller_company, final_summary_message, final_reply)
             yield final_chat_data
         except Exception as e:
             logger.error(f"리드 {lead_id} 최종 요약 채팅 저장 중 오류 발생: {e}", exc_info=True)
-            yield {"error": "최종 요약 저장 중 오류가 발생했습니다."}
\ No newline at end of file
+            yield {"error": "최종 요약 저장 중 오류가 발생했습니다."}
+
+    # '종료'로 일찍 끝난 대화도 대화 전체 토큰 사용량을 남김
+    token_ledger.log_summary()
+
+    # 대화 종료: 남은 write-behind 버퍼 저장
+    persisted = await flush_chats()
+    if persisted:
+        yield persisted
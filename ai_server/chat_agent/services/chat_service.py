@@ -1,22 +1,21 @@
-from openai import OpenAI
-from ..models import ChatRoom, Company, CompanyFile, Chat
-from django.conf import settings
+from ..models import ChatRoom, Chat
+
+from .clients import clients
+from .company_cache import company_profile_cache
+from .llm_scheduler import PRIORITY_INTERACTIVE, completion_usage, llm_scheduler
 
 
 class ChatService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = clients.openai()
 
     def send_message(self, company_id, contents, room_id = None):
-        # company_id 기반 Company 객체 가져오기
-        try:
-            company = Company.objects.get(id=company_id)
-        except Company.DoesNotExist:
+        # company_id 기반 회사 프로필(이름 + 최신 CompanyFile summary) 가져오기 (캐시)
+        company = company_profile_cache.get(company_id)
+        if company is None:
             raise ValueError(f"Company with ID {company_id} does not exist")
 
-        # CompanyFile에서 summary 가져오기
-        summary = CompanyFile.objects.filter(company=company).order_by('-created_at').first()
-        summary_text = summary.summary if summary else "No summary available."
+        summary_text = company.summary if company.summary else "No summary available."
 
         # room_id가 없는 경우 새로운 ChatRoom 생성
         if room_id is None:
@@ -29,20 +28,25 @@ class ChatService:
             except ChatRoom.DoesNotExist:
                 raise ValueError(f"ChatRoom with ID {room_id} does not exist")
 
-        # GPT-4o 호출
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"너는 B2B 세일즈를 도와주는 AI야 회사 요약 정보를 바탕으로 적절한 대답을 해줘. 다음은 회사 요약 정보야:\n\n{summary_text}"
-                },
-                {
-                    "role": "user",
-                    "content": contents
-                }
-            ],
-            temperature=0.7,
+        # GPT-4o 호출 (스케줄러 경유, 사용자 대기 요청이므로 interactive)
+        system_prompt = f"너는 B2B 세일즈를 도와주는 AI야 회사 요약 정보를 바탕으로 적절한 대답을 해줘. 다음은 회사 요약 정보야:\n\n{summary_text}"
+        response = llm_scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt
+                    },
+                    {
+                        "role": "user",
+                        "content": contents
+                    }
+                ],
+                temperature=0.7,
+            ),
+            model="gpt-4o", tokens=llm_scheduler.estimate_tokens(system_prompt, contents),
+            priority=PRIORITY_INTERACTIVE, usage=completion_usage,
         )
 
         ai_reply = response.choices[0].message.content.strip()
@@ -1,33 +1,96 @@
+import asyncio
+import logging
+import time
+
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, Q
 
-from chat_agent.agents.chat_summary_agent import chat_summary
+from chat_agent.agents.chat_summary_agent import chat_summary, reduce_chat_chunks, update_chat_summary
 from chat_agent.models import ChatRoom, Lead, Chat
+from chat_agent.services.company_cache import company_profile_cache
+from chat_agent.services.file_store import JsonFileStore
+from chat_agent.services.token_budget import pack_chunks
+
+logger = logging.getLogger(__name__)
+
+# 리드/채팅방별 롤링 요약: {"last_chat_id", "chat_count", "summary", "updated_at"}
+# summary 는 last_chat_id 까지의 대화를 반영한 보고서
+chat_summary_store = JsonFileStore(settings.CHAT_SUMMARY_DIR)
+
+
+def _summary_key(lead_id, chat_room_id) -> str:
+    return f"{lead_id}-{chat_room_id}"
 
 
 async def create_chat_summary(chat_room_id, lead_id):
-    chats = await get_chats(chat_room_id)
-    source_company = await get_chat_room_source_company(lead_id)
-    lead_company = await get_chat_room_lead_company(lead_id)
+    """
+    채팅방 요약 보고서를 롤링 방식으로 만듭니다. (요약은 리드와 채팅방 쌍별로 저장)
+    - 저장된 요약 이후 채팅이 없으면 저장된 요약을 바로 반환 (LLM 호출 없음)
+    - 새 채팅이 있으면 새 채팅만 (예산을 넘으면 map-reduce 로 줄여) 이전 보고서에 반영
+      → 호출 비용은 방 전체가 아니라 보고서 길이 + 새 채팅 수에 비례
+    - 이전 요약이 다루던 채팅이 지워지거나 바뀌었으면 (채팅방 재사용 등) 처음부터 다시 요약
+    """
+    key = _summary_key(lead_id, chat_room_id)
+    # 파일 읽기/교체는 이벤트 루프를 막지 않도록 스레드에서 실행
+    stored = await asyncio.to_thread(chat_summary_store.get, key)
+    covered_up_to = (stored["last_chat_id"] or 0) if stored else 0
+    chat_count, last_chat_id, covered_count = await get_chat_room_state(chat_room_id, covered_up_to)
+    if stored and stored["last_chat_id"] == last_chat_id and stored["chat_count"] == chat_count:
+        return {
+            "summary": stored["summary"],
+        }
 
-    agent_result = await chat_summary(chats, source_company, lead_company)
+    incremental = bool(stored) and covered_count == stored["chat_count"]
+    after_id = covered_up_to if incremental else 0
+
+    started = time.perf_counter()
+    source_company, lead_company = await get_chat_room_companies(lead_id)
+    chunks = await get_chat_chunks(chat_room_id, source_company, lead_company, settings.CHAT_SUMMARY_CHUNK_TOKENS,
+                                   after_id=after_id)
+    digest = await reduce_chat_chunks(chunks, source_company, lead_company,
+                                      chunk_tokens=settings.CHAT_SUMMARY_CHUNK_TOKENS,
+                                      concurrency=settings.CHAT_SUMMARY_CONCURRENCY)
+    if incremental:
+        agent_result = await update_chat_summary(stored["summary"], digest, source_company, lead_company)
+    else:
+        agent_result = await chat_summary([digest], source_company, lead_company)
+
+    await asyncio.to_thread(chat_summary_store.set, key, {
+        "last_chat_id": last_chat_id,
+        "chat_count": chat_count,
+        "summary": agent_result,
+        "updated_at": time.time(),
+    })
+    new_chats = chat_count - (stored["chat_count"] if incremental else 0)
+    logger.info(f"채팅방 {chat_room_id} 요약 {'갱신' if incremental else '생성'}: 새 채팅 {new_chats}건, "
+                f"청크 {len(chunks)}개, {(time.perf_counter() - started) * 1000:.0f}ms")
 
     return {
         "summary": agent_result,
     }
 
 @sync_to_async
-def get_chats(chat_room_id):
-    chats = Chat.objects.filter(chat_room_id=chat_room_id)
-    chat_list = []
-    for chat in chats:
-        chat_list.append(chat.contents)
-
-    return chat_list
+def get_chat_room_state(chat_room_id, covered_up_to):
+    """ (채팅 수, 마지막 채팅 id, covered_up_to 이하 채팅 수) 를 쿼리 한 번으로 조회합니다. """
+    state = Chat.objects.filter(chat_room_id=chat_room_id).aggregate(
+        count=Count('id'), last_id=Max('id'), covered=Count('id', filter=Q(id__lte=covered_up_to)))
+    return state["count"], state["last_id"], state["covered"]
 
 @sync_to_async
-def get_chat_room_source_company(lead_id):
-    return Lead.objects.get(id=lead_id).source_company
+def get_chat_chunks(chat_room_id, source_company, lead_company, max_tokens, after_id=0):
+    """
+    채팅방의 after_id 이후 채팅을 id 순서대로 (발신 회사, 내용) 값만 스트리밍으로 읽어 max_tokens 이하의 청크로 묶습니다.
+    (ORM 객체를 만들지 않고, 서버 측 커서로 나눠 읽음)
+    """
+    names = {source_company.id: source_company.company_name, lead_company.id: lead_company.company_name}
+    rows = (Chat.objects.filter(chat_room_id=chat_room_id, id__gt=after_id).order_by('id')
+            .values_list('from_field_id', 'contents').iterator(chunk_size=500))
+    lines = (f"{names.get(from_id, '알 수 없음')}: {contents}" for from_id, contents in rows if contents)
+    return list(pack_chunks(lines, max_tokens))
 
-@sync_to_async
-def get_chat_room_lead_company(lead_id):
-    return Lead.objects.get(id=lead_id).lead_company
\ No newline at end of file
+async def get_chat_room_companies(lead_id):
+    """ 리드의 (source_company, lead_company) 프로필을 회사 프로필 캐시에서 가져옵니다. """
+    lead = await Lead.objects.only('id', 'source_company_id', 'lead_company_id').aget(id=lead_id)
+    profiles = await company_profile_cache.aget_many([lead.source_company_id, lead.lead_company_id])
+    return profiles[lead.source_company_id], profiles[lead.lead_company_id]
\ No newline at end of file
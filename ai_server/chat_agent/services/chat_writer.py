@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.utils import timezone
+
+from chat_agent.models import Chat
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_chat(chat: Chat, from_company, to_company) -> dict:
+    """ SSE 로 보내는 채팅 레코드 형식 (생성 직후 저장본과 재생 시 조회본이 같은 형식) """
+    return {
+        "id": chat.id,
+        "fromId": from_company.id if from_company else None,
+        "toId": to_company.id,
+        "fromCompanyName": from_company.company_name if from_company else None,
+        "toCompanyName": to_company.company_name,
+        "contents": chat.contents,
+        "roomId": chat.chat_room_id,
+        "createdAt": chat.created_at.isoformat(),
+        "updatedAt": chat.updated_at.isoformat(),
+    }
+
+
+def _first_inserted_id(count: int) -> int:
+    """ 현재 연결에서 방금 실행한 여러 행 INSERT 의 첫 번째 자동 증가 ID """
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute("SELECT LAST_INSERT_ID()")  # 여러 행 INSERT 에서는 첫 행의 ID
+            return int(cursor.fetchone()[0])
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT last_insert_rowid()")  # 마지막 행의 ID
+            return int(cursor.fetchone()[0]) - count + 1
+    raise NotImplementedError(f"{connection.vendor} 에서는 bulk_create 로 저장한 채팅 ID 를 알 수 없습니다.")
+
+
+class ChatWriter:
+    """
+    채팅방 하나의 write-behind 채팅 저장.
+    add() 는 INSERT 없이 메시지를 버퍼에 넣고 임시 ID(provisionalId)를 담은 레코드를 바로 반환하고,
+    flush() 가 버퍼를 bulk_create 한 번으로 저장한 뒤 임시 ID → 실제 ID 매핑('persisted' 이벤트)을 반환합니다.
+    bulk_create 가 pk 를 돌려주지 않는 DB(MySQL)에서는 같은 연결에서 LAST_INSERT_ID()(여러 행 INSERT 의 첫 ID)를 조회해
+    행 수만큼 이어지는 ID 로 매핑합니다. 행 수가 정해진 INSERT 는 InnoDB 가 연속된 ID 를 한 번에 할당하므로,
+    같은 채팅방에 다른 작성자가 동시에 쓰더라도 매핑이 섞이지 않습니다.
+    """
+
+    def __init__(self, chat_room_id: Optional[int] = None):
+        self.chat_room_id = chat_room_id
+        self._pending: List[Tuple[Chat, Optional[str]]] = []
+        self._lock = asyncio.Lock()
+        self.rows = 0
+        self.flushes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, from_company, to_company, contents: str, provisional_id: Optional[str]) -> dict:
+        now = timezone.now()
+        chat = Chat(chat_room_id=self.chat_room_id, from_field_id=from_company.id, to_id=to_company.id,
+                    contents=contents, created_at=now, updated_at=now)
+        self._pending.append((chat, provisional_id))
+        chat_data = serialize_chat(chat, from_company, to_company)
+        chat_data["provisionalId"] = provisional_id
+        return chat_data
+
+    def _insert(self, chats: List[Chat]) -> List[int]:
+        with transaction.atomic():
+            # batch_size 없이 INSERT 한 문장으로 저장해야 ID 가 연속으로 할당됨
+            created = Chat.objects.bulk_create(chats)
+            if all(chat.pk for chat in created):
+                return [chat.pk for chat in created]
+            first_id = _first_inserted_id(len(chats))
+            ids = list(range(first_id, first_id + len(chats)))
+            for chat, chat_id in zip(chats, ids):
+                chat.pk = chat_id
+            return ids
+
+    async def flush(self) -> Optional[dict]:
+        """
+        버퍼의 메시지를 한 번에 저장하고 'persisted' 이벤트를 반환합니다. (버퍼가 비어 있으면 None)
+        저장에 실패하면 메시지를 버퍼에 되돌려 다음 flush 에서 다시 시도하고 예외를 그대로 올립니다.
+        """
+        async with self._lock:
+            if not self._pending:
+                return None
+            pending, self._pending = self._pending, []
+            chats = [chat for chat, _ in pending]
+            try:
+                await sync_to_async(self._insert)(chats)
+            except Exception:
+                self._pending = pending + self._pending
+                raise
+            self.rows += len(chats)
+            self.flushes += 1
+        return {
+            "type": "persisted",
+            "roomId": self.chat_room_id,
+            "chats": [{"provisionalId": provisional_id, "id": chat.pk, "createdAt": chat.created_at.isoformat()}
+                      for chat, provisional_id in pending],
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from agents import OpenAIProvider, RunConfig
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientStats:
+    """
+    호스트별 HTTP 호출 지연 시간(요청 전송 → 응답 헤더 수신) 통계.
+    최근 window 건으로 p50/p95 를 계산하고 log_every 건마다 로그로 남깁니다.
+    """
+
+    def __init__(self, window: int = 1000, log_every: int = 200):
+        self.window = window
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._total = 0
+
+    def record(self, host: str, latency_ms: float):
+        with self._lock:
+            self._latencies.setdefault(host, deque(maxlen=self.window)).append(latency_ms)
+            self._counts[host] = self._counts.get(host, 0) + 1
+            self._total += 1
+            should_log = self.log_every and self._total % self.log_every == 0
+        if should_log:
+            logger.info(f"HTTP 클라이언트 지연 시간: {self.snapshot()}")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for host, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                result[host] = {
+                    "calls": self._counts[host],
+                    "p50_ms": round(ordered[len(ordered) // 2], 1),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                }
+            return result
+
+
+http_client_stats = HTTPClientStats(log_every=settings.HTTP_CLIENT_STATS_LOG_EVERY)
+
+
+def _on_request(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+
+
+def _on_response(response: httpx.Response):
+    started_at = response.request.extensions.get("started_at")
+    if started_at is not None:
+        http_client_stats.record(response.request.url.host, (time.perf_counter() - started_at) * 1000)
+
+
+async def _on_request_async(request: httpx.Request):
+    _on_request(request)
+
+
+async def _on_response_async(response: httpx.Response):
+    _on_response(response)
+
+
+def _on_session_response(response: requests.Response, *args, **kwargs):
+    http_client_stats.record(urlsplit(response.url).hostname or "", response.elapsed.total_seconds() * 1000)
+
+
+class ClientRegistry:
+    """
+    프로세스 공용 HTTP 클라이언트 레지스트리.
+    - openai()        : 동기 OpenAI 클라이언트 하나를 모든 스레드가 공유 (httpx 커넥션 풀, keep-alive)
+    - async_openai()  : 이벤트 루프별 AsyncOpenAI (httpx.AsyncClient 커넥션은 생성한 루프에서만 쓸 수 있음)
+    - agents_run_config() : Agents SDK 가 현재 루프의 AsyncOpenAI 를 쓰도록 하는 RunConfig
+    - http_session()  : Tavily 등 외부 API 용 requests.Session (HTTPAdapter 커넥션 풀)
+    모든 클라이언트에 연결/읽기 타임아웃을 지정하고, 호출 지연 시간을 http_client_stats 에 기록합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._openai: Optional[OpenAI] = None
+        self._async_openai: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = \
+            weakref.WeakKeyDictionary()
+        self._session: Optional[requests.Session] = None
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.OPENAI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(settings.OPENAI_READ_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+    def openai(self) -> OpenAI:
+        with self._lock:
+            if self._openai is None:
+                http_client = httpx.Client(
+                    limits=self._limits(), timeout=self._timeout(),
+                    event_hooks={"request": [_on_request], "response": [_on_response]},
+                )
+                # 429 재시도는 llm_scheduler 가 헤더 기반 backoff 로 처리하므로 SDK 자체 재시도는 끔
+                self._openai = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client,
+                                      timeout=self._timeout(), max_retries=0)
+            return self._openai
+
+    def async_openai(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_openai.get(loop)
+            if client is None:
+                http_client = httpx.AsyncClient(
+                    limits=self._limits(), timeout=self._timeout(),
+                    event_hooks={"request": [_on_request_async], "response": [_on_response_async]},
+                )
+                client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client,
+                                     timeout=self._timeout(), max_retries=0)
+                self._async_openai[loop] = client
+            return client
+
+    def agents_run_config(self) -> RunConfig:
+        return RunConfig(model_provider=OpenAIProvider(openai_client=self.async_openai()))
+
+    def http_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.EXTERNAL_HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.hooks["response"].append(_on_session_response)
+                self._session = session
+            return self._session
+
+    @property
+    def http_timeout(self):
+        """ requests 호출용 (연결, 읽기) 타임아웃 """
+        return settings.EXTERNAL_HTTP_CONNECT_TIMEOUT, settings.EXTERNAL_HTTP_READ_TIMEOUT
+
+
+clients = ClientRegistry()
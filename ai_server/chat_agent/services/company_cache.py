@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from chat_agent.models import Company, CompanyFile
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyProfile:
+    """ 대화/요약에 필요한 회사 정보 (Company 와 동일하게 id, company_name 속성 제공) """
+
+    def __init__(self, id: int, company_name: str, summary: Optional[str]):
+        self.id = id
+        self.company_name = company_name
+        self.summary = summary  # 최신 CompanyFile.summary
+
+    def __repr__(self):
+        return f"CompanyProfile(id={self.id}, company_name={self.company_name!r})"
+
+
+def _fetch_profiles(company_ids: Iterable[int]) -> Dict[int, CompanyProfile]:
+    """ 회사 이름과 최신 요약을 한 번의 쿼리로 조회합니다. """
+    latest_summary = Subquery(
+        CompanyFile.objects.filter(company_id=OuterRef('id')).order_by('-created_at').values('summary')[:1]
+    )
+    rows = Company.objects.filter(id__in=list(company_ids)).annotate(
+        latest_summary=latest_summary
+    ).values_list('id', 'company_name', 'latest_summary')
+    return {company_id: CompanyProfile(company_id, name, summary) for company_id, name, summary in rows}
+
+
+class CompanyProfileCache:
+    """
+    프로세스 전역 회사 프로필 캐시 (크기 제한 LRU + TTL).
+    같은 프로세스에서 PDF 분석으로 요약이 갱신되면 커밋 직후 refresh()로 즉시 반영하고,
+    다른 워커 프로세스는 TTL 만료 후 다시 읽습니다.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[float, CompanyProfile]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cached(self, company_id: int) -> Optional[CompanyProfile]:
+        with self._lock:
+            entry = self._entries.get(company_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, profile = entry
+            if expires_at < time.monotonic():
+                del self._entries[company_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(company_id)
+            self.hits += 1
+            return profile
+
+    def _put(self, profile: CompanyProfile):
+        with self._lock:
+            self._entries[profile.id] = (time.monotonic() + self.ttl_seconds, profile)
+            self._entries.move_to_end(profile.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _split(self, company_ids: Iterable[int]) -> Tuple[Dict[int, CompanyProfile], list]:
+        profiles: Dict[int, CompanyProfile] = {}
+        missing = []
+        for company_id in dict.fromkeys(company_ids):
+            profile = self._get_cached(company_id)
+            if profile is None:
+                missing.append(company_id)
+            else:
+                profiles[company_id] = profile
+        return profiles, missing
+
+    def _load(self, company_ids: list) -> Dict[int, CompanyProfile]:
+        fetched = _fetch_profiles(company_ids)
+        for profile in fetched.values():
+            self._put(profile)
+        return fetched
+
+    def get_many(self, company_ids: Iterable[int]) -> Dict[int, CompanyProfile]:
+        """ 캐시에 없는 회사만 한 번의 쿼리로 조회합니다. 존재하지 않는 회사는 결과에서 빠집니다. """
+        profiles, missing = self._split(company_ids)
+        if missing:
+            profiles.update(self._load(missing))
+        return profiles
+
+    def get(self, company_id: int) -> Optional[CompanyProfile]:
+        return self.get_many([company_id]).get(company_id)
+
+    async def aget_many(self, company_ids: Iterable[int]) -> Dict[int, CompanyProfile]:
+        profiles, missing = self._split(company_ids)
+        if missing:
+            profiles.update(await sync_to_async(self._load)(missing))
+        return profiles
+
+    async def aget(self, company_id: int) -> Optional[CompanyProfile]:
+        return (await self.aget_many([company_id])).get(company_id)
+
+    def invalidate(self, company_id: int):
+        with self._lock:
+            self._entries.pop(company_id, None)
+
+    def refresh(self, company_id: int):
+        """ DB에서 다시 읽어 캐시를 즉시 갱신합니다. (PDF 분석 커밋 직후 호출) """
+        self.invalidate(company_id)
+        try:
+            profile = _fetch_profiles([company_id]).get(company_id)
+        except Exception as e:
+            logger.error(f"회사 {company_id} 프로필 캐시 갱신 실패: {e}", exc_info=True)
+            return
+        if profile is not None:
+            self._put(profile)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+company_profile_cache = CompanyProfileCache(
+    max_entries=settings.COMPANY_PROFILE_CACHE_SIZE,
+    ttl_seconds=settings.COMPANY_PROFILE_CACHE_TTL,
+)
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# MySQL 잠금 이름 최대 길이
+MAX_LOCK_NAME_LENGTH = 64
+
+
+class NamedDBLock:
+    """
+    MySQL GET_LOCK 기반의 프로세스(워커, 서버) 간 잠금.
+    잠금은 이 객체 전용 DB 연결에 묶이므로 요청 스레드의 연결 정리(close_old_connections)와 무관하고,
+    잠금을 잡은 프로세스가 죽으면 연결이 끊기면서 MySQL 이 잠금을 풀어줍니다.
+    MySQL 이 아닌 DB(SQLite 개발/테스트 환경)에서는 잠그지 않고 항상 획득한 것으로 취급합니다. (단일 프로세스 가정)
+    """
+
+    def __init__(self, name: str, alias: str = DEFAULT_DB_ALIAS):
+        database = connections.settings[alias].get("NAME") or ""
+        self.name = f"{database}:{name}"[-MAX_LOCK_NAME_LENGTH:]
+        self.alias = alias
+        self.held = False
+        self._connection = None
+
+    def _acquire(self, timeout: float) -> bool:
+        if self._connection is None:
+            connection = connections.create_connection(self.alias)
+            if connection.vendor != "mysql":
+                self.held = True
+                return True
+            # asyncio.to_thread 로 매번 다른 스레드에서 쓰므로 스레드 간 공유 허용
+            connection.inc_thread_sharing()
+            self._connection = connection
+        with self._connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", [self.name, timeout])
+            self.held = cursor.fetchone()[0] == 1
+        return self.held
+
+    def _release(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            self.held = False
+            return
+        try:
+            if self.held:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", [self.name])
+        except Exception as e:
+            # 연결을 닫으면 MySQL 이 잠금을 풀어주므로 로그만 남김
+            logger.warning(f"DB 잠금 {self.name} 해제 중 오류: {e}")
+        finally:
+            self.held = False
+            connection.close()
+            connection.dec_thread_sharing()
+
+    async def acquire(self, timeout: float = 0) -> bool:
+        """ 잠금을 시도합니다. 다른 프로세스가 잡고 있으면 최대 timeout 초 기다린 뒤 False 를 반환합니다. """
+        return await asyncio.to_thread(self._acquire, timeout)
+
+    async def release(self):
+        """ 잠금을 풀고 전용 연결을 닫습니다. (획득하지 못했어도 호출해 연결을 정리) """
+        await asyncio.to_thread(self._release)
+
+
+def lead_run_lock(lead_id: int) -> NamedDBLock:
+    """ 리드 하나의 협상 실행 잠금 (같은 리드의 대화를 여러 프로세스가 동시에 생성하지 않도록) """
+    return NamedDBLock(f"negotiation:{lead_id}")
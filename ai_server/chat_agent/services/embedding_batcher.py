@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (texts, model) -> 입력 순서와 동일한 순서의 임베딩 리스트
+EmbedBatchFn = Callable[[List[str], str], Awaitable[Sequence[Sequence[float]]]]
+
+
+class BatcherStats:
+    """
+    배치 크기와 대기 시간 통계를 모읍니다.
+    이벤트 루프별 배처들이 하나의 인스턴스를 공유하므로 스레드 안전하게 동작합니다.
+    """
+
+    def __init__(self, log_every: int = 100):
+        self._lock = threading.Lock()
+        self.log_every = log_every
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_size = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.batch_size_histogram: Dict[int, int] = {}
+
+    def record(self, batch_size: int, waits: List[float]):
+        with self._lock:
+            self.batches += 1
+            self.requests += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.total_wait_s += sum(waits)
+            self.max_wait_s = max([self.max_wait_s, *waits])
+            self.batch_size_histogram[batch_size] = self.batch_size_histogram.get(batch_size, 0) + 1
+            should_log = self.log_every and self.batches % self.log_every == 0
+        if should_log:
+            logger.info(f"임베딩 배치 통계: {self.snapshot()}")
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "avg_wait_ms": round(self.total_wait_s * 1000 / self.requests, 2) if self.requests else 0.0,
+                "max_wait_ms": round(self.max_wait_s * 1000, 2),
+                "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            }
+
+
+class EmbeddingBatcher:
+    """
+    짧은 시간 창(window) 동안 동시에 들어온 임베딩 요청을 모아 하나의 multi-input 호출로 전송하고,
+    각 호출자에게 자신의 텍스트에 해당하는 벡터를 돌려줍니다.
+    asyncio 이벤트 루프에 묶여 동작하므로 루프마다 별도의 인스턴스를 사용해야 합니다.
+    """
+
+    def __init__(self, embed_fn: EmbedBatchFn, window_ms: float = 10.0, max_batch_size: int = 64,
+                 stats: Optional[BatcherStats] = None):
+        self._embed_fn = embed_fn
+        self.window_s = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.stats = stats or BatcherStats()
+        # 모델별 대기열: (텍스트, future, 대기열 진입 시각)
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future, float]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: set = set()  # 전송 중인 태스크 참조 유지용
+
+    async def embed(self, text: str, model: str) -> np.ndarray:
+        """ 텍스트 하나를 대기열에 넣고, 배치 전송 결과 중 자신의 벡터를 기다립니다. """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(model, [])
+        queue.append((text, future, time.perf_counter()))
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.window_s, self._flush, model)
+
+        return await future
+
+    def _flush(self, model: str):
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model, [])
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(model, batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, model: str, batch: List[Tuple[str, asyncio.Future, float]]):
+        sent_at = time.perf_counter()
+        # 같은 배치 안의 동일 텍스트는 한 번만 전송
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = await self._embed_fn(unique_texts, model)
+            if len(vectors) != len(unique_texts):
+                raise ValueError(f"임베딩 응답 개수 불일치: 요청 {len(unique_texts)}개, 응답 {len(vectors)}개")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats.record(len(batch), [sent_at - queued_at for _, _, queued_at in batch])
+        by_text = {text: np.asarray(vector, dtype=np.float32) for text, vector in zip(unique_texts, vectors)}
+        for text, future, _ in batch:
+            if not future.done():  # 호출자가 취소한 경우 건너뜀
+                future.set_result(by_text[text])
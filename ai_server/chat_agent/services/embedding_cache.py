@@ -0,0 +1,320 @@
+import asyncio
+import atexit
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SIZE = 32  # sha256
+
+
+def normalize_text(text: str) -> str:
+    """ 캐시 키 계산용 정규화: 유니코드 NFC, 공백 축약, 앞뒤 공백 제거 """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_cache_key(model: str, text: str) -> bytes:
+    """ (모델, 정규화된 텍스트) 의 sha256 다이제스트를 캐시 키로 사용합니다. """
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class _MemoryTier:
+    """ 프로세스 내 LRU 캐시 (항목 수 제한) """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: bytes, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _DiskTier:
+    """
+    모델(namespace)별 영구 캐시.
+    - {namespace}.vectors.f32 : (capacity, dim) float32 memmap
+    - {namespace}.keys        : (capacity, 32) 슬롯별 키 다이제스트 memmap
+    - {namespace}.meta        : [dim, capacity, write_count] int64 memmap
+    슬롯은 write_count % capacity 순서로 순환하며 덮어씁니다 (용량 기반 FIFO 축출).
+    여러 워커 프로세스가 같은 파일을 공유하며, flock으로 읽기/쓰기를 직렬화합니다.
+    공유 memmap 이라 기록은 바로 다른 프로세스에 보이므로 쓰기마다 msync 하지 않고,
+    디스크 반영은 OS write-back 과 주기적/종료 시 flush() 에 맡깁니다.
+    """
+
+    def __init__(self, directory: Path, namespace: str, dim: int, max_bytes: int):
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4 + DIGEST_SIZE))
+        base = directory / namespace
+        self._lock_path = f"{base}.lock"
+        self._thread_lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with self._file_lock(fcntl.LOCK_EX):
+            meta_path = f"{base}.meta"
+            if os.path.exists(meta_path):
+                meta = np.memmap(meta_path, dtype=np.int64, mode="r+", shape=(3,))
+                if int(meta[0]) != dim:
+                    raise ValueError(f"디스크 캐시 차원 불일치 ({namespace}): 저장 {int(meta[0])}, 요청 {dim}")
+                self.capacity = int(meta[1])
+            else:
+                meta = np.memmap(meta_path, dtype=np.int64, mode="w+", shape=(3,))
+                meta[:] = (dim, self.capacity, 0)
+                meta.flush()
+            self._meta = meta
+            self._vectors = self._open_array(f"{base}.vectors.f32", np.float32, (self.capacity, dim))
+            self._keys = self._open_array(f"{base}.keys", np.uint8, (self.capacity, DIGEST_SIZE))
+
+        self._slots: Dict[bytes, int] = {}
+        self._seen_writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _open_array(path: str, dtype, shape) -> np.memmap:
+        mode = "r+" if os.path.exists(path) else "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    @contextmanager
+    def _file_lock(self, operation: int):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh_slots(self):
+        """ 다른 프로세스가 기록한 슬롯만 증분으로 키 인덱스에 반영합니다. """
+        write_count = int(self._meta[2])
+        if write_count == self._seen_writes:
+            return
+        if write_count - self._seen_writes >= self.capacity or write_count < self._seen_writes:
+            self._slots = {bytes(self._keys[slot]): slot for slot in range(min(write_count, self.capacity))}
+        else:
+            for n in range(self._seen_writes, write_count):
+                slot = n % self.capacity
+                self._slots[bytes(self._keys[slot])] = slot
+        self._seen_writes = write_count
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._thread_lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh_slots()
+            slot = self._slots.get(key)
+            # 다른 프로세스가 해당 슬롯을 덮어쓴 경우를 대비해 키를 다시 확인
+            if slot is None or bytes(self._keys[slot]) != key:
+                return None
+            return np.array(self._vectors[slot], dtype=np.float32)
+
+    def put(self, key: bytes, vector: np.ndarray):
+        if vector.shape != (self.dim,):
+            return
+        with self._thread_lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh_slots()
+            if key in self._slots and bytes(self._keys[self._slots[key]]) == key:
+                return
+            write_count = int(self._meta[2])
+            slot = write_count % self.capacity
+            if write_count >= self.capacity:
+                self._slots.pop(bytes(self._keys[slot]), None)
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._meta[2] = write_count + 1
+            self._slots[key] = slot
+            self._seen_writes = write_count + 1
+
+    def flush(self):
+        """ memmap 변경분을 디스크에 기록합니다. (msync) """
+        with self._thread_lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._meta.flush()
+
+    def __len__(self):
+        return min(int(self._meta[2]), self.capacity)
+
+
+class EmbeddingCache:
+    """
+    내용 기반(content-addressed) 임베딩 캐시.
+    1차: 프로세스 내 LRU, 2차: memmap float32 파일 기반 영구 캐시 (재시작 후에도 유지, 워커 간 공유)
+    디스크 쓰기는 전용 스레드 하나가 순서대로 처리하고(write-behind), flush_interval 초마다와 프로세스 종료 시 msync 합니다.
+    비동기 호출부는 aget() 을 사용해 디스크 조회가 이벤트 루프를 막지 않게 합니다.
+    조회 log_every 번마다 적중률 등 캐시 통계를 로그로 남깁니다. (0 이면 끔)
+    """
+
+    def __init__(self, memory_max_entries: int = 10000, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024, flush_interval: float = 30.0, log_every: int = 1000):
+        self._memory = _MemoryTier(memory_max_entries)
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk_max_bytes = disk_max_bytes
+        self._disk_tiers: Dict[str, Optional[_DiskTier]] = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.log_every = log_every
+        self._last_flush = time.monotonic()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_tier(self, model: str, dim: Optional[int] = None) -> Optional[_DiskTier]:
+        """ 모델별 디스크 캐시를 반환합니다. 차원을 모르는 상태(첫 조회)면 기존 파일에서 읽어옵니다. """
+        if self._disk_dir is None:
+            return None
+        namespace = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        with self._lock:
+            if namespace in self._disk_tiers:
+                return self._disk_tiers[namespace]
+            meta_path = self._disk_dir / f"{namespace}.meta"
+            if dim is None:
+                if not meta_path.exists():
+                    return None
+                dim = int(np.memmap(meta_path, dtype=np.int64, mode="r", shape=(3,))[0])
+            try:
+                tier = _DiskTier(self._disk_dir, namespace, dim, self._disk_max_bytes)
+            except Exception as e:
+                logger.error(f"임베딩 디스크 캐시 초기화 실패 ({namespace}): {e}", exc_info=True)
+                tier = None
+            self._disk_tiers[namespace] = tier
+            return tier
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            should_log = self.log_every and lookups % self.log_every == 0
+        if should_log:
+            logger.info(f"임베딩 캐시 통계: {self.stats()}")
+
+    def _get_memory(self, key: bytes) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._count("memory_hits")
+        return vector
+
+    def _get_disk(self, model: str, key: bytes) -> Optional[np.ndarray]:
+        disk = self._disk_tier(model)
+        vector = None
+        if disk is not None:
+            try:
+                vector = disk.get(key)
+            except Exception as e:
+                logger.warning(f"임베딩 디스크 캐시 조회 실패: {e}")
+        if vector is None:
+            self._count("misses")
+            return None
+        vector.setflags(write=False)
+        self._memory.put(key, vector)
+        self._count("disk_hits")
+        return vector
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = make_cache_key(model, text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        return self._get_disk(model, key)
+
+    async def aget(self, model: str, text: str) -> Optional[np.ndarray]:
+        """ get() 의 비동기 버전. 메모리에 없을 때의 디스크 조회(파일 락, memmap 읽기)는 스레드에서 실행합니다. """
+        key = make_cache_key(model, text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        if self._disk_dir is None:
+            self._count("misses")
+            return None
+        return await asyncio.to_thread(self._get_disk, model, key)
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        """ 메모리 캐시에 바로 넣고, 디스크 기록은 쓰기 스레드에 맡깁니다. (호출자를 막지 않음) """
+        key = make_cache_key(model, text)
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)  # 캐시된 벡터는 공유되므로 읽기 전용
+        self._memory.put(key, vector)
+        if self._disk_dir is not None:
+            self._get_writer().submit(self._put_disk, model, key, vector)
+
+    def _get_writer(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+                atexit.register(self._flush_disk)
+            return self._writer
+
+    def _put_disk(self, model: str, key: bytes, vector: np.ndarray):
+        disk = self._disk_tier(model, dim=vector.shape[0])
+        if disk is None:
+            return
+        try:
+            disk.put(key, vector)
+        except Exception as e:
+            logger.warning(f"임베딩 디스크 캐시 저장 실패: {e}")
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush_disk()
+
+    def _flush_disk(self):
+        self._last_flush = time.monotonic()
+        for tier in list(self._disk_tiers.values()):
+            if tier is None:
+                continue
+            try:
+                tier.flush()
+            except Exception as e:
+                logger.warning(f"임베딩 디스크 캐시 flush 실패: {e}")
+
+    def flush(self):
+        """ 대기 중인 디스크 쓰기를 마친 뒤 디스크에 기록합니다. """
+        writer = self._writer
+        if writer is not None:
+            writer.submit(self._flush_disk).result()
+        else:
+            self._flush_disk()
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            memory_hits, disk_hits, misses = self.memory_hits, self.disk_hits, self.misses
+        lookups = memory_hits + disk_hits + misses
+        return {
+            "memory_hits": memory_hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": round((memory_hits + disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_evictions": self._memory.evictions,
+            "disk_entries": {name: len(tier) for name, tier in self._disk_tiers.items() if tier is not None},
+            "disk_evictions": sum(tier.evictions for tier in self._disk_tiers.values() if tier is not None),
+        }
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import re
+import unicodedata
+import weakref
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from openai import AsyncOpenAI
+
+from chat_agent.services.clients import clients
+from chat_agent.services.embedding_batcher import BatcherStats, EmbeddingBatcher
+from chat_agent.services.embedding_cache import EmbeddingCache
+from chat_agent.services.llm_scheduler import completion_usage, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PROVIDERS = ("openai", "local")
+
+# 배처 통계와 캐시는 프로바이더 인스턴스와 무관하게 프로세스 전체에서 공유
+embedding_batch_stats = BatcherStats(log_every=settings.EMBEDDING_BATCH_STATS_LOG_EVERY)
+
+# (모델, 정규화된 텍스트) 기준 임베딩 캐시: 프로세스 내 LRU + 워커 간 공유되는 디스크 캐시
+embedding_cache = EmbeddingCache(
+    memory_max_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+    disk_dir=settings.EMBEDDING_CACHE_DIR,
+    disk_max_bytes=settings.EMBEDDING_CACHE_DISK_MAX_MB * 1024 * 1024,
+    flush_interval=settings.EMBEDDING_CACHE_FLUSH_SECONDS,
+    log_every=settings.EMBEDDING_CACHE_STATS_LOG_EVERY,
+)
+
+
+class EmbeddingProvider:
+    """
+    ConversationMemory 등 벡터 소비자가 의존하는 임베딩 프로바이더 인터페이스.
+    반환 벡터는 L2 정규화된 float32 이며, FAISS 인덱스 차원은 dim 을 따릅니다.
+    """
+    name = "base"
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """ 텍스트 하나를 임베딩합니다. 실패 시 None 을 반환합니다. """
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI 임베딩 API 프로바이더.
+    캐시에 있으면 API를 호출하지 않고, 없으면 EmbeddingBatcher가 동시 요청을 모아 하나의 multi-input 호출로 전송합니다.
+    """
+    name = "openai"
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 1536):
+        super().__init__(model, dim)
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
+        # 이벤트 루프별 배처 (요청마다 별도 루프를 쓰는 경우에도 루프 간 future가 섞이지 않도록)
+        self._batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, EmbeddingBatcher]" = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # 현재 이벤트 루프의 공용 클라이언트 (커넥션 풀 재사용)
+        return clients.async_openai()
+
+    async def _create_embeddings(self, texts: List[str], model: str) -> List[List[float]]:
+        """ 여러 텍스트를 한 번의 embeddings.create 호출로 임베딩합니다. 응답은 입력 순서대로 정렬합니다. """
+        response = await llm_scheduler.acall(
+            lambda: self.client.embeddings.create(input=texts, model=model),
+            model=model, tokens=llm_scheduler.estimate_tokens(*texts, output_tokens=0), usage=completion_usage,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def get_batcher(self) -> EmbeddingBatcher:
+        """ 현재 실행 중인 이벤트 루프에 묶인 임베딩 배처를 반환합니다. """
+        loop = asyncio.get_running_loop()
+        batcher = self._batchers.get(loop)
+        if batcher is None:
+            batcher = EmbeddingBatcher(
+                self._create_embeddings,
+                window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                stats=embedding_batch_stats,
+            )
+            self._batchers[loop] = batcher
+        return batcher
+
+    async def embed(self, text: str, model: Optional[str] = None) -> Optional[np.ndarray]:
+        model = model or self.model
+        text = text.replace("\n", " ")  # OpenAI 권장 사항
+        cached = await embedding_cache.aget(model, text)
+        if cached is not None:
+            return cached
+        try:
+            embedding = await self.get_batcher().embed(text, model)
+            embedding_cache.put(model, text, embedding)
+            return embedding
+        except Exception as e:  # 좀 더 일반적인 예외 처리 (OpenAI 라이브러리 자체 오류 포함)
+            logger.error(f"임베딩 생성 중 OpenAI API 오류 발생: {e}")
+        return None
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    네트워크 없이 CPU에서 동작하는 로컬 임베딩.
+    단어 유니그램과 문자 n-gram(공백 포함)을 crc32 로 dim 차원에 해싱(부호 해싱)하고,
+    로그 스케일 TF 가중치를 NumPy 로 한 번에 누적한 뒤 L2 정규화합니다.
+    해시가 프로세스와 무관하게 고정되므로 워커 간/재시작 후에도 같은 벡터가 나옵니다.
+    """
+    name = "local"
+    _word = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 512, ngram_range=(2, 4)):
+        super().__init__(model=f"local-hashing-{dim}", dim=dim)
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        normalized = unicodedata.normalize("NFC", text).lower()
+        words = self._word.findall(normalized)
+        features = [f"w:{word}" for word in words]
+        joined = f" {' '.join(words)} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.extend(f"c{n}:{joined[i:i + n]}" for i in range(len(joined) - n + 1))
+        return features
+
+    def vectorize(self, text: str) -> np.ndarray:
+        features = self._features(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        unique, counts = np.unique(np.array(features), return_counts=True)
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in unique),
+                             dtype=np.uint32, count=len(unique))
+        indices = (hashes % self.dim).astype(np.int64)
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, indices, signs * (1.0 + np.log(counts.astype(np.float32))))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            return self.vectorize(text)
+        except Exception as e:
+            logger.error(f"로컬 임베딩 생성 중 오류 발생: {e}", exc_info=True)
+            return None
+
+
+_providers = {}
+
+
+def get_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """ 설정(EMBEDDING_PROVIDER)에 따른 프로세스 공용 임베딩 프로바이더를 반환합니다. """
+    name = name or settings.EMBEDDING_PROVIDER
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"알 수 없는 임베딩 프로바이더: {name} (가능: {', '.join(EMBEDDING_PROVIDERS)})")
+    provider = _providers.get(name)
+    if provider is None:
+        if name == "local":
+            provider = HashingEmbeddingProvider(dim=settings.LOCAL_EMBEDDING_DIM)
+        else:
+            provider = OpenAIEmbeddingProvider(model=settings.OPENAI_EMBEDDING_MODEL,
+                                               dim=settings.OPENAI_EMBEDDING_DIM)
+        _providers[name] = provider
+    return provider
@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_unsafe_key = re.compile(r"[^0-9A-Za-z_.-]")
+
+
+class JsonFileStore:
+    """
+    키 하나당 JSON 파일 하나를 base_dir 아래에 저장하는 간단한 영속 저장소.
+    쓰기는 임시 파일에 쓴 뒤 os.replace 로 교체하므로 중간에 실패해도 이전 값이 그대로 남습니다.
+    (읽기 실패나 손상된 파일은 값이 없는 것으로 취급)
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+    def _path(self, key: Any) -> Path:
+        return self.base_dir / f"{_unsafe_key.sub('_', str(key))}.json"
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"{path} 읽기 실패, 저장된 값을 무시합니다: {e}")
+            return None
+
+    def set(self, key: Any, value: Dict[str, Any]):
+        path = self._path(key)
+        with self._lock:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            # 임시 파일 이름은 프로세스/스레드와 무관하게 고유하므로 여러 워커가 같은 키를 써도 충돌하지 않음
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.base_dir, prefix=f"{path.name}.",
+                                             suffix=".tmp", delete=False) as f:
+                tmp_path = f.name
+                try:
+                    json.dump(value, f, ensure_ascii=False)
+                except BaseException:
+                    f.close()
+                    os.unlink(tmp_path)
+                    raise
+            os.replace(tmp_path, path)
+
+    def delete(self, key: Any):
+        with self._lock:
+            self._path(key).unlink(missing_ok=True)
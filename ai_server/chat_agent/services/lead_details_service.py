@@ -1,16 +1,18 @@
 import json
 import logging
 
-import requests
 from django.conf import settings
-from openai import OpenAI
+
+from chat_agent.services.clients import clients
+from chat_agent.services.llm_scheduler import PRIORITY_INTERACTIVE, completion_usage, llm_scheduler
 
 logger = logging.getLogger('scout_agent')
 
 
 class LeadDetailsService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = clients.openai()
+        self.session = clients.http_session()
         self.tavily_api_key = settings.TAVILY_API_KEY
 
     def generate_queries(self, company_name):
@@ -42,7 +44,7 @@ class LeadDetailsService:
             "search_depth": "basic"
         }
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.session.post(url, headers=headers, json=payload, timeout=clients.http_timeout)
             response.raise_for_status()
             results = response.json().get("results", [])[:num_results]
             return [
@@ -66,7 +68,7 @@ class LeadDetailsService:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.session.post(url, headers=headers, json=payload, timeout=clients.http_timeout)
             response.raise_for_status()
             results = response.json().get("results", [])[:count]
             return [
@@ -129,14 +131,18 @@ class LeadDetailsService:
             """
 
             try:
-                completion = self.client.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a structured data extractor."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    response_format={"type": "json_object"}
+                completion = llm_scheduler.call(
+                    lambda: self.client.chat.completions.create(
+                        model="gpt-4.1-mini",
+                        messages=[
+                            {"role": "system", "content": "You are a structured data extractor."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.3,
+                        response_format={"type": "json_object"}
+                    ),
+                    model="gpt-4.1-mini", tokens=llm_scheduler.estimate_tokens(prompt),
+                    priority=PRIORITY_INTERACTIVE, usage=completion_usage,
                 )
                 field_result = json.loads(completion.choices[0].message.content)
                 extracted_info[field] = field_result[field]
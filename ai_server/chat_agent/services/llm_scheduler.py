@@ -0,0 +1,537 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+from agents import Agent, RunConfig, Runner
+from agents.models.multi_provider import MultiProvider
+from agents.models.openai_provider import DEFAULT_MODEL as DEFAULT_AGENT_MODEL, OpenAIProvider
+from django.conf import settings
+
+from chat_agent.services.clients import clients
+from chat_agent.services.token_budget import token_counter
+
+logger = logging.getLogger(__name__)
+
+# 우선순위 클래스 (숫자가 작을수록 먼저 처리)
+PRIORITY_INTERACTIVE = 0  # 사용자가 응답을 기다리는 요청 (채팅, A2A 스트림, 리드 상세, 대화 요약)
+PRIORITY_BACKGROUND = 1  # 사용자가 직접 기다리지 않는 요청 (PDF 분석)
+PRIORITY_BATCH = 2  # 대량 배치 (run_negotiations)
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background", PRIORITY_BATCH: "batch"}
+
+# 호출 지점에서 우선순위를 지정하지 않으면 현재 컨텍스트의 우선순위를 사용 (asyncio 태스크로 전파됨)
+current_llm_priority: ContextVar[int] = ContextVar("current_llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """ 블록 안에서 발생하는 LLM/임베딩 호출의 기본 우선순위를 지정합니다. """
+    token = current_llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_llm_priority.reset(token)
+
+
+class LLMSchedulerTimeout(Exception):
+    """ 최대 대기 시간 안에 호출 허가를 받지 못했습니다. """
+
+
+_duration_part = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_duration_units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """ OpenAI 리셋 헤더 형식("20ms", "1s", "6m0s")이나 초 단위 숫자를 초로 변환합니다. """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _duration_part.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _duration_units[unit] for amount, unit in parts)
+
+
+def retry_delay_from_headers(headers) -> Optional[float]:
+    """ 429 응답 헤더(retry-after-ms, retry-after, x-ratelimit-reset-*)에서 다시 시도할 때까지의 초를 구합니다. """
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    delay = _parse_duration(headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    resets = [_parse_duration(headers.get(name))
+              for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return isinstance(error, openai.RateLimitError) or getattr(error, "status_code", None) == 429
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """ 연결 오류/타임아웃/5xx (클라이언트의 SDK 자체 재시도는 꺼져 있으므로 스케줄러가 재시도) """
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+def transient_retry_delay(attempt: int) -> float:
+    return min(8.0, 0.5 * 2 ** attempt) * random.uniform(1.0, 1.25)
+
+
+class _ModelLimiter:
+    """
+    모델별 요청 수(RPM)·토큰 수(TPM) 토큰 버킷.
+    429를 받으면 헤더가 알려준 시간만큼 멈추고 허용 속도를 절반으로 낮추며(backoff),
+    이후 성공할 때마다 조금씩 원래 속도로 회복합니다. (AIMD)
+    """
+
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self.rpm = max(1, rpm)
+        self.tpm = max(1, tpm)
+        self.request_tokens = float(self.rpm)
+        self.token_tokens = float(self.tpm)
+        self.rate_factor = 1.0
+        self.backoff_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.rate_limited_count = 0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        if elapsed <= 0:
+            return
+        self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60 * self.rate_factor)
+        self.token_tokens = min(self.tpm, self.token_tokens + elapsed * self.tpm / 60 * self.rate_factor)
+
+    def try_take(self, now: float, tokens: int) -> float:
+        """ 허가되면 버킷에서 차감하고 0을, 아니면 다시 확인할 때까지의 초를 반환합니다. """
+        if now < self.backoff_until:
+            return self.backoff_until - now
+        tokens = min(tokens, self.tpm)  # 버킷보다 큰 요청도 가득 찼을 때는 통과
+        if self.request_tokens >= 1 and self.token_tokens >= tokens:
+            self.request_tokens -= 1
+            self.token_tokens -= tokens
+            return 0.0
+        request_wait = max(0.0, 1 - self.request_tokens) / (self.rpm / 60 * self.rate_factor)
+        token_wait = max(0.0, tokens - self.token_tokens) / (self.tpm / 60 * self.rate_factor)
+        return max(request_wait, token_wait, 0.001)
+
+    def refund(self, tokens: int):
+        """ 예상보다 적게 쓴 토큰은 돌려주고, 더 쓴 토큰은 빚(음수)으로 남깁니다. """
+        self.token_tokens = min(self.tpm, self.token_tokens + tokens)
+
+    def on_success(self):
+        self.consecutive_rate_limits = 0
+        self.rate_factor = min(1.0, self.rate_factor + 0.05)
+
+    def on_rate_limited(self, now: float, delay: Optional[float]):
+        self.consecutive_rate_limits += 1
+        self.rate_limited_count += 1
+        self.rate_factor = max(0.1, self.rate_factor * 0.5)
+        if delay is None:
+            delay = min(30.0, 2 ** (self.consecutive_rate_limits - 1)) * random.uniform(1.0, 1.25)
+        self.backoff_until = max(self.backoff_until, now + delay)
+        return delay
+
+
+class _Waiter:
+    __slots__ = ("model", "tokens", "priority", "enqueued", "notify", "granted", "cancelled")
+
+    def __init__(self, model: str, tokens: int, priority: int, notify: Callable[[], None]):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+
+
+class LLMGrant:
+    """ 호출 허가. 호출이 끝나면 complete() 또는 rate_limited() 로 실제 사용량을 알려야 합니다. """
+
+    def __init__(self, model: str, tokens: int, priority: int, wait_ms: float):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.wait_ms = wait_ms
+
+
+class _WaitStats:
+    def __init__(self):
+        self.granted = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float):
+        self.granted += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "granted": self.granted,
+            "avg_wait_ms": round(self.total_wait_ms / self.granted, 1) if self.granted else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
+
+
+class LLMScheduler:
+    """
+    프로세스 전역 LLM/임베딩 호출 스케줄러.
+    - 모델별 토큰 버킷(RPM, TPM)으로 호출을 허가하고, 대기열은 우선순위 → 도착 순으로 처리합니다.
+      (한 모델의 대기열 맨 앞이 허가될 때까지 뒤의 낮은 우선순위 요청은 추월하지 않음)
+    - 동기 호출은 threading.Event, 비동기 호출은 해당 이벤트 루프의 future 로 허가를 전달하므로
+      요청마다 다른 스레드/이벤트 루프에서 호출해도 하나의 한도를 공유합니다.
+    - 429 응답의 rate-limit 헤더에 맞춰 모델별로 일시 정지 후 속도를 낮췄다가 점진적으로 회복합니다.
+    - 대기열 길이, 우선순위별 대기 시간, 429 횟수를 stats() 로 제공하고 log_every 건마다 로그로 남깁니다.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, int]], default_limit: Dict[str, int],
+                 expected_output_tokens: int = 512, max_retries: int = 3, max_wait_seconds: float = 120.0,
+                 log_every: int = 100, enabled: bool = True):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+        self.max_wait_seconds = max_wait_seconds
+        self.log_every = log_every
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._queues: Dict[str, List] = {}
+        self._sequence = itertools.count()
+        self._wait_stats = {priority: _WaitStats() for priority in PRIORITY_NAMES}
+        self._granted_total = 0
+        self._dispatcher: Optional[threading.Thread] = None
+
+    # --- 허가 ---
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limit = self.limits.get(model, self.default_limit)
+            limiter = self._limiters[model] = _ModelLimiter(model, limit["rpm"], limit["tpm"])
+        return limiter
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_forever, name="llm-scheduler", daemon=True)
+            self._dispatcher.start()
+
+    def _enqueue(self, model: str, tokens: int, priority: int, notify: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(model, tokens, priority, notify)
+        with self._cond:
+            queue = self._queues.setdefault(model, [])
+            limiter = self._limiter(model)
+            if not queue:
+                # 기다리는 요청이 없고 여유가 있으면 디스패처를 거치지 않고 바로 허가
+                now = time.monotonic()
+                limiter.refill(now)
+                if limiter.try_take(now, tokens) == 0:
+                    waiter.granted = True
+                    return waiter
+            heapq.heappush(queue, (priority, next(self._sequence), waiter))
+            self._ensure_dispatcher()
+            self._cond.notify_all()
+        return waiter
+
+    def _dispatch_forever(self):
+        with self._cond:
+            while True:
+                self._cond.wait(self._dispatch_locked())
+
+    def _dispatch_locked(self) -> Optional[float]:
+        """ 허가 가능한 대기 요청을 모두 허가하고, 다음에 다시 확인할 때까지의 초를 반환합니다. """
+        now = time.monotonic()
+        next_check = None
+        for model, queue in self._queues.items():
+            limiter = self._limiters[model]
+            limiter.refill(now)
+            while queue:
+                waiter = queue[0][2]
+                if waiter.cancelled:
+                    heapq.heappop(queue)
+                    continue
+                wait = limiter.try_take(now, waiter.tokens)
+                if wait > 0:
+                    next_check = wait if next_check is None else min(next_check, wait)
+                    break
+                heapq.heappop(queue)
+                waiter.granted = True
+                try:
+                    waiter.notify()
+                except Exception as e:  # 이벤트 루프가 이미 닫힌 경우 등
+                    logger.warning(f"LLM 호출 허가 전달 실패 ({model}): {e}")
+                    limiter.refund(waiter.tokens)
+        return next_check
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """ 대기를 취소합니다. 이미 허가된 경우 False 를 반환합니다. """
+        with self._cond:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            return True
+
+    def _granted(self, waiter: _Waiter) -> LLMGrant:
+        wait_ms = (time.monotonic() - waiter.enqueued) * 1000
+        with self._cond:
+            self._wait_stats[waiter.priority].record(wait_ms)
+            self._granted_total += 1
+            should_log = self.log_every and self._granted_total % self.log_every == 0
+        if should_log:
+            logger.info(f"LLM 스케줄러 통계: {self.stats()}")
+        return LLMGrant(waiter.model, waiter.tokens, waiter.priority, wait_ms)
+
+    def _resolve_priority(self, priority: Optional[int]) -> int:
+        return current_llm_priority.get() if priority is None else priority
+
+    def acquire(self, model: str, tokens: int, priority: Optional[int] = None,
+                timeout: Optional[float] = None) -> LLMGrant:
+        """ 동기 호출 허가를 받을 때까지 기다립니다. """
+        priority = self._resolve_priority(priority)
+        if not self.enabled:
+            return LLMGrant(model, tokens, priority, 0.0)
+        event = threading.Event()
+        waiter = self._enqueue(model, tokens, priority, event.set)
+        if not waiter.granted and not event.wait(timeout or self.max_wait_seconds):
+            if self._cancel(waiter):
+                raise LLMSchedulerTimeout(f"{model} 호출 허가 대기 시간 초과 ({PRIORITY_NAMES[priority]})")
+        return self._granted(waiter)
+
+    async def acquire_async(self, model: str, tokens: int, priority: Optional[int] = None,
+                            timeout: Optional[float] = None) -> LLMGrant:
+        """ 비동기 호출 허가를 받을 때까지 기다립니다. (현재 이벤트 루프를 막지 않음) """
+        priority = self._resolve_priority(priority)
+        if not self.enabled:
+            return LLMGrant(model, tokens, priority, 0.0)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._enqueue(model, tokens, priority, lambda: loop.call_soon_threadsafe(resolve))
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(future, timeout or self.max_wait_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if self._cancel(waiter):
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    raise LLMSchedulerTimeout(f"{model} 호출 허가 대기 시간 초과 ({PRIORITY_NAMES[priority]})")
+                # 취소와 허가가 엇갈린 경우: 허가받은 몫을 돌려주고 원래 예외를 전달
+                self.failed(self._granted(waiter))
+                raise
+        return self._granted(waiter)
+
+    # --- 호출 결과 반영 ---
+
+    def complete(self, grant: LLMGrant, actual_tokens: Optional[int] = None):
+        """ 호출 성공. 실제 사용 토큰을 알면 예상치와의 차이를 버킷에 반영합니다. """
+        if not self.enabled:
+            return
+        with self._cond:
+            limiter = self._limiter(grant.model)
+            if actual_tokens is not None:
+                limiter.refund(grant.tokens - actual_tokens)
+            limiter.on_success()
+            self._cond.notify_all()
+
+    def failed(self, grant: LLMGrant):
+        """ 429 가 아닌 호출 실패. 토큰은 돌려주되 성공으로 세지 않아 속도 배율을 올리지 않습니다. """
+        if not self.enabled:
+            return
+        with self._cond:
+            self._limiter(grant.model).refund(grant.tokens)
+            self._cond.notify_all()
+
+    def rate_limited(self, grant: LLMGrant, error: BaseException) -> float:
+        """ 429 응답. 헤더가 알려준 시간(없으면 지수 backoff)만큼 해당 모델 호출을 멈춥니다. """
+        response = getattr(error, "response", None)
+        header_delay = retry_delay_from_headers(getattr(response, "headers", None))
+        with self._cond:
+            limiter = self._limiter(grant.model)
+            limiter.refund(grant.tokens)  # 거절된 요청은 토큰을 쓰지 않음
+            delay = limiter.on_rate_limited(time.monotonic(), header_delay)
+            self._cond.notify_all()
+        logger.warning(f"{grant.model} 429 응답: {delay:.2f}s 대기 후 속도 {limiter.rate_factor:.2f}배로 재개 "
+                       f"({PRIORITY_NAMES[grant.priority]})")
+        return delay
+
+    def finish(self, grant: LLMGrant, error: BaseException):
+        """ 호출 실패. 429 면 rate_limited(), 그 외 오류는 failed() 로 토큰만 돌려주고 허가를 마칩니다. """
+        if is_rate_limit_error(error):
+            self.rate_limited(grant, error)
+        else:
+            self.failed(grant)
+
+    def call(self, fn: Callable[[], Any], *, model: str, tokens: int, priority: Optional[int] = None,
+             usage: Optional[Callable[[Any], Optional[int]]] = None):
+        """
+        동기 호출을 허가 → 실행 → 사용량 반영 순으로 감쌉니다.
+        429 는 backoff 후, 연결 오류/5xx 는 잠시 쉰 뒤 max_retries 까지 재시도합니다.
+        """
+        for attempt in range(self.max_retries + 1):
+            grant = self.acquire(model, tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                self.finish(grant, e)
+                if attempt < self.max_retries and (is_rate_limit_error(e) or is_transient_error(e)):
+                    # 429 는 다음 허가가 backoff 를 기다림 (스케줄러가 꺼져 있으면 여기서 대기)
+                    if not (is_rate_limit_error(e) and self.enabled):
+                        time.sleep(transient_retry_delay(attempt))
+                    continue
+                raise
+            self.complete(grant, usage(result) if usage else None)
+            return result
+
+    async def acall(self, fn: Callable[[], Any], *, model: str, tokens: int, priority: Optional[int] = None,
+                    usage: Optional[Callable[[Any], Optional[int]]] = None):
+        """ call() 의 비동기 버전. fn 은 awaitable 을 반환하는 함수입니다. """
+        for attempt in range(self.max_retries + 1):
+            grant = await self.acquire_async(model, tokens, priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                self.finish(grant, e)
+                if attempt < self.max_retries and (is_rate_limit_error(e) or is_transient_error(e)):
+                    # 429 는 다음 허가가 backoff 를 기다림 (스케줄러가 꺼져 있으면 여기서 대기)
+                    if not (is_rate_limit_error(e) and self.enabled):
+                        await asyncio.sleep(transient_retry_delay(attempt))
+                    continue
+                raise
+            self.complete(grant, usage(result) if usage else None)
+            return result
+
+    def estimate_tokens(self, *texts: Optional[str], output_tokens: Optional[int] = None) -> int:
+        """ 입력 텍스트 토큰 수 + 예상 출력 토큰 수 """
+        expected_output = self.expected_output_tokens if output_tokens is None else output_tokens
+        return sum(token_counter.count(text) for text in texts) + expected_output
+
+    # --- 지표 ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queue_depth": {
+                    PRIORITY_NAMES[priority]: sum(
+                        1 for queue in self._queues.values() for entry in queue
+                        if entry[0] == priority and not entry[2].cancelled)
+                    for priority in PRIORITY_NAMES
+                },
+                "wait": {PRIORITY_NAMES[priority]: stats.snapshot() for priority, stats in self._wait_stats.items()},
+                "models": {
+                    model: {
+                        "queued": sum(1 for entry in self._queues.get(model, []) if not entry[2].cancelled),
+                        "rate_factor": round(limiter.rate_factor, 2),
+                        "rate_limited": limiter.rate_limited_count,
+                        "backoff_remaining_s": round(max(0.0, limiter.backoff_until - now), 2),
+                    }
+                    for model, limiter in self._limiters.items()
+                },
+            }
+
+
+llm_scheduler = LLMScheduler(
+    limits=settings.LLM_RATE_LIMITS,
+    default_limit=settings.LLM_DEFAULT_RATE_LIMIT,
+    expected_output_tokens=settings.LLM_SCHEDULER_EXPECTED_OUTPUT_TOKENS,
+    max_retries=settings.LLM_SCHEDULER_MAX_RETRIES,
+    max_wait_seconds=settings.LLM_SCHEDULER_MAX_WAIT_SECONDS,
+    log_every=settings.LLM_SCHEDULER_STATS_LOG_EVERY,
+    enabled=settings.LLM_SCHEDULER_ENABLED,
+)
+
+
+# --- 호출 지점용 래퍼 ---
+
+def completion_usage(response) -> Optional[int]:
+    """ chat.completions / embeddings 응답의 총 토큰 수 """
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage else None
+
+
+def runner_usage(result) -> int:
+    """ Runner 실행 결과의 모델 호출별 사용량 합계 """
+    return sum(response.usage.input_tokens + response.usage.output_tokens for response in result.raw_responses)
+
+
+def _agent_model(agent: Agent, run_config: Optional[RunConfig]) -> str:
+    if run_config is not None and isinstance(run_config.model, str):
+        return run_config.model
+    return agent.model if isinstance(agent.model, str) and agent.model else DEFAULT_AGENT_MODEL
+
+
+def _uses_openai(run_config: RunConfig) -> bool:
+    """ OpenAI 로 실제 요청을 보내는 provider 인지 (스텁 등 다른 provider 는 OpenAI 한도를 쓰지 않으므로 스케줄링하지 않음) """
+    return isinstance(run_config.model_provider, (OpenAIProvider, MultiProvider))
+
+
+def _agent_tokens(agent: Agent, prompt: str) -> int:
+    instructions = agent.instructions if isinstance(agent.instructions, str) else None
+    return llm_scheduler.estimate_tokens(instructions, prompt)
+
+
+async def run_agent(agent: Agent, prompt: str, run_config: Optional[RunConfig] = None,
+                    priority: Optional[int] = None):
+    """
+    스케줄러를 거쳐 Runner.run 을 실행합니다. run_config 가 없으면 현재 루프의 공용 클라이언트를 사용합니다.
+    스텁 등 OpenAI 가 아닌 provider 는 스케줄러를 거치지 않습니다. (dry-run/부하 측정이 실제 한도를 기다리거나 소모하지 않음)
+    """
+    run_config = run_config or clients.agents_run_config()
+    if not _uses_openai(run_config):
+        return await Runner.run(agent, input=prompt, run_config=run_config)
+    return await llm_scheduler.acall(
+        lambda: Runner.run(agent, input=prompt, run_config=run_config),
+        model=_agent_model(agent, run_config), tokens=_agent_tokens(agent, prompt),
+        priority=priority, usage=runner_usage,
+    )
+
+
+@asynccontextmanager
+async def run_agent_streamed(agent: Agent, prompt: str, run_config: Optional[RunConfig] = None,
+                             priority: Optional[int] = None):
+    """
+    스케줄러 허가를 받은 뒤 Runner.run_streamed 결과를 넘겨줍니다. 블록을 벗어날 때 사용량을 반영합니다.
+    이미 델타가 전송됐을 수 있으므로 스트리밍 중 429는 재시도하지 않고 backoff 만 반영합니다.
+    """
+    run_config = run_config or clients.agents_run_config()
+    if not _uses_openai(run_config):
+        yield Runner.run_streamed(agent, input=prompt, run_config=run_config)
+        return
+    grant = await llm_scheduler.acquire_async(_agent_model(agent, run_config), _agent_tokens(agent, prompt),
+                                              priority)
+    result = Runner.run_streamed(agent, input=prompt, run_config=run_config)
+    try:
+        yield result
+    except BaseException as e:
+        llm_scheduler.finish(grant, e)
+        raise
+    llm_scheduler.complete(grant, runner_usage(result))
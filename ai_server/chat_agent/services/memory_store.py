@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPE = np.float16  # 코사인 검색에는 충분한 정밀도, 디스크 사용량은 float32의 절반
+
+
+class RoomMemoryStore:
+    """
+    chat_room_id별 ConversationMemory 를 디스크에 저장합니다.
+    - {room_id}/vectors.f16 : (n, dim) float16 벡터, append-only
+    - {room_id}/docs.jsonl  : document_store 항목, 한 줄에 하나
+    - {room_id}/meta.json   : {"dim", "count", "docs_bytes"} — count 건(docs.jsonl 은 docs_bytes 바이트)까지만
+      유효한 데이터로 간주 (중간 실패 시 꼬리 무시)
+    로드 시 유효한 부분만 읽어 float32 인덱스로 복원합니다. (채팅방당 턴 수가 적어 전체를 읽어도 작음)
+    파일 I/O 는 동기이므로 이벤트 루프에서는 asyncio.to_thread 로 호출합니다.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+    def _room_dir(self, chat_room_id: int) -> Path:
+        return self.base_dir / str(int(chat_room_id))
+
+    def _read_meta(self, room_dir: Path) -> Optional[Dict[str, int]]:
+        meta_path = room_dir / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, room_dir: Path, dim: int, count: int, docs_bytes: int):
+        tmp_path = room_dir / "meta.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "count": count, "docs_bytes": docs_bytes}, f)
+        os.replace(tmp_path, room_dir / "meta.json")
+
+    def exists(self, chat_room_id: int) -> bool:
+        return (self._room_dir(chat_room_id) / "meta.json").exists()
+
+    def load(self, chat_room_id: int, dim: int) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """ 저장된 벡터와 문서 목록을 반환합니다. 저장된 것이 없으면 빈 결과를 반환합니다. """
+        room_dir = self._room_dir(chat_room_id)
+        meta = self._read_meta(room_dir)
+        if not meta or meta["count"] == 0:
+            return np.empty((0, dim), dtype=VECTOR_DTYPE), []
+        if meta["dim"] != dim:
+            raise ValueError(f"채팅방 {chat_room_id} 메모리 차원 불일치: 저장 {meta['dim']}, 요청 {dim}")
+
+        count = meta["count"]
+        vectors = np.fromfile(room_dir / "vectors.f16", dtype=VECTOR_DTYPE, count=count * dim).reshape(count, dim)
+        with open(room_dir / "docs.jsonl", "rb") as f:
+            lines = f.read(meta["docs_bytes"]).decode("utf-8").splitlines()
+        return vectors, [json.loads(line) for line in lines[:count]]
+
+    def append(self, chat_room_id: int, vectors: np.ndarray, docs: List[Dict[str, Any]]):
+        """ 새로 추가된 턴만 파일 끝에 이어 씁니다. """
+        if len(docs) == 0:
+            return
+        room_dir = self._room_dir(chat_room_id)
+        with self._lock:
+            room_dir.mkdir(parents=True, exist_ok=True)
+            meta = self._read_meta(room_dir) or {"dim": vectors.shape[1], "count": 0, "docs_bytes": 0}
+            # meta 에 반영되지 않은 꼬리(이전 실패 잔여물)는 잘라낸 뒤 이어 씀
+            self._truncate(room_dir, meta)
+            payload = self._encode_docs(docs)
+            with open(room_dir / "vectors.f16", "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes())
+            with open(room_dir / "docs.jsonl", "ab") as f:
+                f.write(payload)
+            self._write_meta(room_dir, meta["dim"], meta["count"] + len(docs), meta["docs_bytes"] + len(payload))
+
+    def rewrite(self, chat_room_id: int, vectors: np.ndarray, docs: List[Dict[str, Any]]):
+        """ 저장 내용을 통째로 교체합니다. (문서 병합/압축 후 사용) """
+        room_dir = self._room_dir(chat_room_id)
+        with self._lock:
+            room_dir.mkdir(parents=True, exist_ok=True)
+            self._write_meta(room_dir, vectors.shape[1], 0, 0)
+            payload = self._encode_docs(docs)
+            with open(room_dir / "vectors.f16", "wb") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes())
+            with open(room_dir / "docs.jsonl", "wb") as f:
+                f.write(payload)
+            self._write_meta(room_dir, vectors.shape[1], len(docs), len(payload))
+
+    def clear(self, chat_room_id: int):
+        """ 채팅방 메모리를 삭제합니다. (채팅방을 비우고 대화를 다시 시작할 때) """
+        with self._lock:
+            shutil.rmtree(self._room_dir(chat_room_id), ignore_errors=True)
+
+    @staticmethod
+    def _encode_docs(docs: List[Dict[str, Any]]) -> bytes:
+        return "".join(json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n" for doc in docs).encode("utf-8")
+
+    @staticmethod
+    def _truncate(room_dir: Path, meta: Dict[str, int]):
+        """ 파일 크기만 비교해 유효 길이를 넘는 꼬리를 잘라냅니다. (기존 내용은 읽지 않음) """
+        expected = {
+            "vectors.f16": meta["count"] * meta["dim"] * np.dtype(VECTOR_DTYPE).itemsize,
+            "docs.jsonl": meta["docs_bytes"],
+        }
+        for name, size in expected.items():
+            path = room_dir / name
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
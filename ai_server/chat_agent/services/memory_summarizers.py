@@ -0,0 +1,194 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from agents import Agent, RunConfig
+
+from chat_agent.services.llm_scheduler import run_agent
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_STRATEGIES = ("llm", "raw", "extractive", "batched")
+
+
+@dataclass
+class SummaryResult:
+    text: str
+    latency_ms: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+class MemorySummarizer:
+    """
+    ConversationMemory 에 저장할 턴 텍스트를 만드는 요약 전략의 기본 클래스.
+    전략별 누적 지연 시간과 토큰 사용량을 집계하고 호출마다 로그로 남깁니다.
+    """
+    name = "base"
+    # True 이면 턴은 원문으로 저장하고, 메모리가 임계치를 넘을 때 compress()로 여러 턴을 한 번에 압축
+    batches_turns = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_latency_ms = 0.0
+        self.total_input_tokens = 0
+        self.total_output_tokens = 0
+
+    async def summarize(self, text: str) -> SummaryResult:
+        started = time.perf_counter()
+        result = await self._summarize(text)
+        result.latency_ms = (time.perf_counter() - started) * 1000
+        self._record(result, turns=1)
+        return result
+
+    async def _summarize(self, text: str) -> SummaryResult:
+        raise NotImplementedError
+
+    def _record(self, result: SummaryResult, turns: int):
+        with self._lock:
+            self.calls += 1
+            self.total_latency_ms += result.latency_ms
+            self.total_input_tokens += result.input_tokens
+            self.total_output_tokens += result.output_tokens
+        logger.info(f"메모리 요약 [{self.name}] 턴 {turns}개, {result.latency_ms:.0f}ms, "
+                    f"토큰 입력 {result.input_tokens} / 출력 {result.output_tokens}")
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "strategy": self.name,
+                "calls": self.calls,
+                "avg_latency_ms": round(self.total_latency_ms / self.calls, 1) if self.calls else 0.0,
+                "input_tokens": self.total_input_tokens,
+                "output_tokens": self.total_output_tokens,
+            }
+
+
+class RawSummarizer(MemorySummarizer):
+    """ 요약 없이 원문 청크를 그대로 저장합니다. """
+    name = "raw"
+
+    async def _summarize(self, text: str) -> SummaryResult:
+        return SummaryResult(text=text)
+
+
+class ExtractiveSummarizer(MemorySummarizer):
+    """
+    네트워크 호출 없는 추출 요약.
+    화자별 메시지를 문장 단위로 나누고, 메시지 내 단어 빈도 합으로 문장을 점수화해
+    상위 문장만 원래 순서대로 남깁니다. (첫 문장에는 가산점)
+    """
+    name = "extractive"
+    _sentence_split = re.compile(r"(?<=[.!?。])\s+|\n+")
+    _word = re.compile(r"\w{2,}")
+    _speaker_line = re.compile(r"^(\w+Agent):\s*(.*)$")
+
+    def __init__(self, max_sentences: int = 2):
+        super().__init__()
+        self.max_sentences = max_sentences
+
+    async def _summarize(self, text: str) -> SummaryResult:
+        lines = []
+        for line in text.split("\n"):
+            match = self._speaker_line.match(line)
+            if match:
+                lines.append([match.group(1), match.group(2)])
+            elif lines:
+                lines[-1][1] += "\n" + line  # 여러 줄 메시지는 직전 화자에 이어 붙임
+            else:
+                lines.append([None, line])
+        summarized = []
+        for speaker, message in lines:
+            extract = self.extract(message)
+            summarized.append(f"{speaker}: {extract}" if speaker else extract)
+        return SummaryResult(text="\n".join(summarized))
+
+    def extract(self, message: str) -> str:
+        sentences = [s.strip() for s in self._sentence_split.split(message) if s and s.strip()]
+        if len(sentences) <= self.max_sentences:
+            return " ".join(sentences)
+        frequencies = Counter(word.lower() for word in self._word.findall(message))
+
+        def score(position: int, sentence: str) -> float:
+            words = [word.lower() for word in self._word.findall(sentence)]
+            if not words:
+                return 0.0
+            base = sum(frequencies[word] for word in words) / len(words) ** 0.5
+            return base * (1.5 if position == 0 else 1.0)
+
+        ranked = sorted(range(len(sentences)), key=lambda i: score(i, sentences[i]), reverse=True)
+        keep = sorted(ranked[:self.max_sentences])
+        return " ".join(sentences[i] for i in keep)
+
+
+class LLMSummarizer(MemorySummarizer):
+    """ 턴마다 요약 에이전트(LLM)를 한 번씩 호출합니다. (기존 동작) """
+    name = "llm"
+    prompt_template = "다음 대화 내용을 간결하게 핵심만 요약해줘. 이 요약은 나중에 대화의 맥락을 파악하는 데 사용될 거야.:\n\n{text}\n\n요약:"
+
+    def __init__(self, agent: Agent, run_config: Optional[RunConfig] = None):
+        super().__init__()
+        self.agent = agent
+        self.run_config = run_config
+
+    async def _run(self, prompt: str, fallback: str) -> SummaryResult:
+        try:
+            result = await run_agent(self.agent, prompt, run_config=self.run_config)
+            summary = result.final_output.strip() if result.final_output else fallback
+            # 모델 호출별 사용량 합계 (raw_responses 는 호출마다 하나)
+            return SummaryResult(text=summary,
+                                 input_tokens=sum(response.usage.input_tokens for response in result.raw_responses),
+                                 output_tokens=sum(response.usage.output_tokens for response in result.raw_responses))
+        except Exception as e:
+            logger.error(f"요약 중 오류 발생: {e}", exc_info=True)
+            return SummaryResult(text=fallback)  # 요약 실패 시 원본 반환
+
+    async def _summarize(self, text: str) -> SummaryResult:
+        return await self._run(self.prompt_template.format(text=text), fallback=text)
+
+
+class BatchedLLMSummarizer(LLMSummarizer):
+    """
+    턴은 원문으로 저장하고, 원문 턴이 threshold 개를 넘으면 가장 오래된 batch_size 개 턴을
+    한 번의 LLM 호출로 압축합니다.
+    """
+    name = "batched"
+    batches_turns = True
+    batch_prompt_template = ("다음은 연속된 여러 대화 턴이야. 이후 대화의 맥락 파악에 필요한 제안, 질문, 조건, 합의 사항을 "
+                             "빠뜨리지 말고 하나의 간결한 요약으로 정리해줘.:\n\n{text}\n\n요약:")
+
+    def __init__(self, agent: Agent, threshold: int = 6, batch_size: int = 4,
+                 run_config: Optional[RunConfig] = None):
+        super().__init__(agent, run_config)
+        self.threshold = max(2, threshold)
+        self.batch_size = max(2, min(batch_size, self.threshold))
+
+    async def _summarize(self, text: str) -> SummaryResult:
+        return SummaryResult(text=text)
+
+    async def compress(self, texts: List[str]) -> SummaryResult:
+        started = time.perf_counter()
+        joined = "\n---\n".join(texts)
+        result = await self._run(self.batch_prompt_template.format(text=joined), fallback=joined)
+        result.latency_ms = (time.perf_counter() - started) * 1000
+        self._record(result, turns=len(texts))
+        return result
+
+
+def build_memory_summarizer(strategy: str, agent: Optional[Agent] = None, batch_threshold: int = 6,
+                            batch_size: int = 4, run_config: Optional[RunConfig] = None) -> MemorySummarizer:
+    """ 설정된 전략 이름으로 요약기를 생성합니다. LLM 전략인데 에이전트가 없으면 원문 저장으로 대체합니다. """
+    if strategy not in SUMMARY_STRATEGIES:
+        raise ValueError(f"알 수 없는 메모리 요약 전략: {strategy} (가능: {', '.join(SUMMARY_STRATEGIES)})")
+    if strategy == "extractive":
+        return ExtractiveSummarizer()
+    if strategy == "raw" or agent is None:
+        return RawSummarizer()
+    if strategy == "batched":
+        return BatchedLLMSummarizer(agent, threshold=batch_threshold, batch_size=batch_size, run_config=run_config)
+    return LLMSummarizer(agent, run_config=run_config)
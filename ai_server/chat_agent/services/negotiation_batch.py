@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from agents import RunConfig
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from chat_agent.models import ChatRoom
+from chat_agent.services.agent_chat_service import discard_chat_room, run_agent_conversation
+from chat_agent.services.embedding_providers import EmbeddingProvider
+from chat_agent.services.llm_scheduler import PRIORITY_BATCH, llm_priority
+
+logger = logging.getLogger(__name__)
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class NegotiationCheckpoint:
+    """
+    리드별 배치 진행 상태를 JSONL 파일에 append-only 로 기록합니다.
+    한 줄이 하나의 상태 변경이며, 로드 시 리드별 마지막 줄이 현재 상태입니다.
+    (수천 건을 처리해도 상태 변경마다 파일 전체를 다시 쓰지 않음, 비정상 종료로 잘린 마지막 줄은 무시)
+    path 가 None 이면 메모리에만 기록합니다.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self._file = None
+        if self.path and self.path.exists():
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"체크포인트 {self.path} 의 손상된 줄을 무시합니다.")
+                    continue
+                self.entries[int(entry["lead_id"])] = entry
+
+    def get(self, lead_id: int) -> Optional[Dict[str, Any]]:
+        return self.entries.get(lead_id)
+
+    def status(self, lead_id: int) -> Optional[str]:
+        entry = self.entries.get(lead_id)
+        return entry["status"] if entry else None
+
+    def mark(self, lead_id: int, status: str, **fields):
+        entry = {"lead_id": lead_id, "status": status, "updated_at": time.time(), **fields}
+        self.entries[lead_id] = entry
+        if self.path is None:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class NegotiationBatchReport:
+    """ 배치 실행 결과 집계 (처리량, 리드별 지연 시간 분포) """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started = time.perf_counter()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.messages = 0
+        self.latencies_ms: List[float] = []
+        self.first_event_ms: List[float] = []
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        processed = self.done + self.failed
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "resumed": self.resumed,
+            "elapsed_s": round(elapsed, 1),
+            "leads_per_min": round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "messages_per_s": round(self.messages / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(self.latencies_ms, 50)),
+                "p95": round(_percentile(self.latencies_ms, 95)),
+                "max": round(max(self.latencies_ms, default=0.0)),
+            },
+            "first_event_ms_p50": round(_percentile(self.first_event_ms, 50)),
+        }
+
+
+def _existing_rooms(lead_ids: List[int]) -> Dict[int, int]:
+    return dict(ChatRoom.objects.filter(lead_id__in=lead_ids).values_list("lead_id", "id"))
+
+
+async def run_negotiation_batch(lead_ids: Iterable[int], concurrency: int = 4,
+                                checkpoint: Optional[NegotiationCheckpoint] = None,
+                                run_config: Optional[RunConfig] = None,
+                                embedding_provider: Optional[EmbeddingProvider] = None,
+                                retry_failed: bool = False, discard_results: bool = False,
+                                progress_every: int = 10) -> NegotiationBatchReport:
+    """
+    여러 리드의 A2A 협상을 최대 concurrency 개씩 동시에 실행합니다.
+    - 체크포인트에 완료(done)로 기록된 리드는 건너뜁니다. (retry_failed 가 아니면 실패한 리드도 건너뜀)
+    - 채팅방이 이미 있는 리드는, 이 배치가 시작했다가 중단된 경우(체크포인트 기록 있음)만 채팅방을 비우고 재사용하고
+      (AGENT_MEMORY_PERSIST 면 비우지 않고 저장된 채팅과 채팅방 메모리에 이어서 실행),
+      그 외(브라우저에서 이미 진행된 협상)는 건너뜁니다. → 재실행해도 ChatRoom 이 중복 생성되지 않음
+    - discard_results 가 켜져 있으면 리드별 실행 후 생성된 채팅방/채팅을 삭제합니다. (dry-run)
+    """
+    checkpoint = checkpoint or NegotiationCheckpoint(None)
+    lead_ids = list(dict.fromkeys(int(lead_id) for lead_id in lead_ids))
+    report = NegotiationBatchReport(total=len(lead_ids))
+    existing_rooms = await sync_to_async(_existing_rooms)(lead_ids)
+
+    pending = []
+    for lead_id in lead_ids:
+        status = checkpoint.status(lead_id)
+        if status == STATUS_DONE or (status == STATUS_FAILED and not retry_failed):
+            report.skipped += 1
+        elif lead_id in existing_rooms and status is None:
+            logger.info(f"리드 {lead_id}: 이미 채팅방 {existing_rooms[lead_id]} 이 있어 건너뜁니다.")
+            report.skipped += 1
+        else:
+            pending.append(lead_id)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(lead_id: int):
+        async with semaphore:
+            chat_room_id = existing_rooms.get(lead_id)
+            if chat_room_id:
+                report.resumed += 1
+            checkpoint.mark(lead_id, STATUS_RUNNING, chat_room_id=chat_room_id)
+            started = time.perf_counter()
+            first_event_ms = None
+            messages = 0
+            error = None
+            try:
+                async for event in run_agent_conversation(lead_id, chat_room_id=chat_room_id, run_config=run_config,
+                                                          embedding_provider=embedding_provider,
+                                                          resume=settings.AGENT_MEMORY_PERSIST):
+                    if first_event_ms is None:
+                        first_event_ms = (time.perf_counter() - started) * 1000
+                    if "error" in event:
+                        error = event["error"]
+                        break
+                    chat_room_id = event.get("roomId", chat_room_id)
+                    if event.get("type") != "persisted":
+                        messages += 1
+            except Exception as e:
+                logger.error(f"리드 {lead_id} 배치 협상 중 오류 발생: {e}", exc_info=True)
+                error = str(e)
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            report.latencies_ms.append(latency_ms)
+            if first_event_ms is not None:
+                report.first_event_ms.append(first_event_ms)
+            report.messages += messages
+            if error is None:
+                report.done += 1
+                checkpoint.mark(lead_id, STATUS_DONE, chat_room_id=chat_room_id, messages=messages,
+                                latency_ms=round(latency_ms))
+            else:
+                report.failed += 1
+                checkpoint.mark(lead_id, STATUS_FAILED, chat_room_id=chat_room_id, error=error,
+                                latency_ms=round(latency_ms))
+            if discard_results and chat_room_id:
+                await discard_chat_room(chat_room_id)
+
+            processed = report.done + report.failed
+            if progress_every and processed % progress_every == 0:
+                logger.info(f"배치 협상 진행 {processed}/{len(pending)}: {report.as_dict()}")
+
+    try:
+        # 배치 협상의 LLM/임베딩 호출은 batch 우선순위 (같은 프로세스의 interactive 요청에 양보)
+        with llm_priority(PRIORITY_BATCH):
+            await asyncio.gather(*(run_one(lead_id) for lead_id in pending))
+    finally:
+        checkpoint.close()
+    logger.info(f"배치 협상 완료: {report.as_dict()}")
+    return report
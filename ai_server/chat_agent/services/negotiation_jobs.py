@@ -0,0 +1,426 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from chat_agent.services.agent_chat_service import (discard_chat_room, is_conversation_complete,
+                                                    load_stored_conversation, run_agent_conversation)
+from chat_agent.services.db_lock import lead_run_lock
+from chat_agent.services.embedding_providers import get_embedding_provider
+from chat_agent.services.stub_llm import build_stub_run_config
+
+logger = logging.getLogger(__name__)
+
+# (SSE 이벤트 id, 이벤트) — 모든 이벤트(토큰 델타, 오류 포함)가 "<작업 key>-<순번>-<채팅 id>" 형식의 id 를 가짐
+# 순번은 작업 안에서 1부터 증가하고, 채팅 id 는 그 이벤트까지 전달된 저장 채팅 id 중 가장 큰 값 (없으면 0)
+JobEvent = Tuple[str, dict]
+
+
+@dataclass(frozen=True)
+class EventPosition:
+    """ 재연결 위치: 마지막으로 받은 이벤트의 작업 key, 작업 안의 순번, 그때까지 받은 가장 큰 채팅 id """
+    source: str = ""
+    seq: int = 0
+    chat_id: int = 0
+
+
+def format_event_id(source: str, seq: int, chat_id: int) -> str:
+    return f"{source}-{seq}-{chat_id}"
+
+
+def parse_event_id(value: Optional[str]) -> EventPosition:
+    """
+    Last-Event-ID 를 재연결 위치로 바꿉니다. 숫자 하나뿐인 id(이전 형식)는 채팅 id 로 취급하고,
+    형식이 맞지 않으면 처음부터(EventPosition()) 보냅니다.
+    """
+    parts = (value or "").strip().split("-")
+    try:
+        if len(parts) == 3:
+            return EventPosition(parts[0], max(0, int(parts[1])), max(0, int(parts[2])))
+        if len(parts) == 1 and parts[0]:
+            return EventPosition(chat_id=max(0, int(parts[0])))
+    except ValueError:
+        pass
+    return EventPosition()
+
+
+def chat_id_of(event: dict) -> Optional[int]:
+    """ 채팅 레코드는 채팅 id, write-behind 저장 완료('persisted')는 저장된 채팅 중 가장 큰 id, 그 외는 None """
+    if event.get("type") == "persisted":
+        return max((chat["id"] for chat in event["chats"]), default=None)
+    if event.get("type") or "error" in event:
+        return None
+    return event.get("id")
+
+
+def events_after(events: List[JobEvent], source: str, position: EventPosition) -> List[JobEvent]:
+    """
+    position 다음부터의 이벤트.
+    - 같은 작업(source)의 id 면 순번으로 정확히 이어서 보냄 (메시지 도중 끊긴 토큰 델타도 빠뜨리거나 중복하지 않음)
+    - 다른 작업(끝난 뒤 새로 실행, 다른 워커, 재생)의 id 면 채팅 id 가 position.chat_id 이하인 마지막 채팅 다음부터
+      (채팅 id 는 채팅방에서 증가하므로 채팅방을 비우고 다시 실행한 작업이면 새 채팅을 빠뜨리지 않음)
+    """
+    if position.source and position.source == source:
+        return events[position.seq:]
+    start = 0
+    for index, (_, event) in enumerate(events):
+        chat_id = chat_id_of(event)
+        if chat_id is not None and chat_id <= position.chat_id:
+            start = index + 1
+    return events[start:]
+
+
+class EventLog:
+    """ 이벤트 목록과 id 부여: 순번은 추가할 때마다 1씩, 채팅 id 는 지금까지의 최댓값을 유지 """
+
+    def __init__(self):
+        self.source = uuid.uuid4().hex[:12]
+        self.events: List[JobEvent] = []
+        self._chat_id = 0
+
+    def append(self, event: dict) -> JobEvent:
+        self._chat_id = max(self._chat_id, chat_id_of(event) or 0)
+        item = (format_event_id(self.source, len(self.events) + 1, self._chat_id), event)
+        self.events.append(item)
+        return item
+
+    def after(self, position: EventPosition) -> List[JobEvent]:
+        return events_after(self.events, self.source, position)
+
+
+def conversation_events(lead_id: int, stream_tokens: bool, chat_room_id: Optional[int] = None,
+                        resume: bool = False):
+    """
+    리드의 에이전트 대화 이벤트 스트림. chat_room_id 가 있으면 그 채팅방을 비우고 재사용합니다.
+    (resume 이면 비우지 않고 저장된 채팅에 이어서 실행)
+    AGENT_DRY_RUN 이면 스텁 LLM과 로컬 임베딩으로 실행하고 끝난 뒤 채팅방을 삭제합니다. (부하 테스트용)
+    """
+    if not settings.AGENT_DRY_RUN:
+        return run_agent_conversation(lead_id, stream_tokens=stream_tokens, chat_room_id=chat_room_id,
+                                      resume=resume)
+
+    async def dry_run_events():
+        chat_room_id = None
+        try:
+            async for chat in run_agent_conversation(
+                    lead_id, stream_tokens=stream_tokens,
+                    run_config=build_stub_run_config(settings.AGENT_DRY_RUN_LATENCY_MS),
+                    embedding_provider=get_embedding_provider("local")):
+                chat_room_id = chat.get("roomId", chat_room_id)
+                yield chat
+        finally:
+            if chat_room_id:
+                await discard_chat_room(chat_room_id)
+
+    return dry_run_events()
+
+
+class NegotiationJob:
+    """
+    리드 하나의 협상 실행. HTTP 요청과 분리된 태스크로 실행됩니다.
+    (ASGI 에서는 작업을 시작한 요청의 이벤트 루프, WSGI 에서는 NegotiationJobRegistry 의 백그라운드 루프)
+    발생한 이벤트는 id 와 함께 모두 보관하므로, 구독자는 언제 붙든 재연결 위치 이후 이벤트부터 받을 수 있습니다.
+    (재연결한 브라우저는 Last-Event-ID 이후 놓친 이벤트만, 같은 리드를 보는 여러 구독자는 같은 실행을 공유)
+
+    같은 리드의 작업이 여러 프로세스(워커, 서버)에서 동시에 시작되면 리드 실행 잠금(MySQL GET_LOCK)을 잡은 작업만
+    대화를 생성하고, 나머지는 그 실행이 저장하는 채팅을 폴링해 전달합니다. (채팅방 중복 생성으로 인한 IntegrityError 방지)
+    잠금을 잡은 작업이 끝나지 않은 대화를 남기고 사라지면 폴링하던 작업이 잠금을 넘겨받아 저장된 채팅에 이어서 실행합니다.
+    """
+
+    def __init__(self, lead_id: int, stream_tokens: bool, chat_room_id: Optional[int] = None,
+                 resume: bool = False):
+        self.lead_id = lead_id
+        self.stream_tokens = stream_tokens
+        self.chat_room_id = chat_room_id
+        self.resume = resume
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.log = EventLog()
+        self._published_chat_ids = set()
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Optional[JobEvent]], None]] = []
+        self._task = None  # 실행 중인 태스크(또는 future) 참조 유지
+
+    @property
+    def events(self) -> List[JobEvent]:
+        return self.log.events
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.events) and "error" in self.events[-1][1]
+
+    def _publish(self, event: dict):
+        # 이어서 실행한 대화는 저장된 채팅을 다시 내보내므로, 이미 전달한 채팅은 건너뜀
+        chat_id = None if event.get("type") else event.get("id")
+        if chat_id is not None:
+            if chat_id in self._published_chat_ids:
+                return
+            self._published_chat_ids.add(chat_id)
+        with self._lock:
+            item = self.log.append(event)
+            for callback in self._subscribers:
+                callback(item)
+
+    def _finish(self):
+        with self._lock:
+            self.finished_at = time.time()
+            for callback in self._subscribers:
+                callback(None)
+            self._subscribers.clear()
+
+    async def _publish_stored(self) -> bool:
+        """ 저장된 채팅 중 아직 전달하지 않은 것을 전달합니다. 대화가 완료되었으면 True """
+        stored = await sync_to_async(load_stored_conversation)(self.lead_id)
+        if stored is None:
+            return False
+        self.chat_room_id, chats = stored
+        for chat in chats:
+            self._publish(chat)
+        return is_conversation_complete(chats)
+
+    async def _follow(self, run_lock) -> bool:
+        """
+        다른 프로세스가 이 리드의 대화를 생성 중일 때: 저장되는 채팅을 폴링해 전달합니다.
+        대화가 완료되면 False, 잠금을 넘겨받아 직접 이어서 실행해야 하면 True 를 반환합니다.
+        """
+        logger.info(f"리드 {self.lead_id}: 다른 프로세스가 협상을 실행 중이므로 저장되는 채팅을 따라갑니다.")
+        while True:
+            if await self._publish_stored():
+                return False
+            # 잠금 대기로 스레드를 붙잡지 않도록 이벤트 루프에서 기다린 뒤 즉시 반환 모드로 다시 시도
+            await asyncio.sleep(settings.NEGOTIATION_FOLLOW_POLL_SECONDS)
+            if await run_lock.acquire():
+                break
+        # 잠금을 넘겨받음: 그 사이 완료되었는지 확인하고, 아니면 저장된 채팅에 이어서 실행
+        # (dry-run 은 끝난 채팅방을 삭제하므로 채팅방이 없으면 새로 실행)
+        if await self._publish_stored():
+            return False
+        self.resume = self.chat_room_id is not None
+        logger.info(f"리드 {self.lead_id}: 중단된 협상을 넘겨받아 이어서 실행합니다. (채팅방 {self.chat_room_id})")
+        return True
+
+    async def run(self):
+        run_lock = lead_run_lock(self.lead_id)
+        try:
+            if await run_lock.acquire() or await self._follow(run_lock):
+                async for chat in conversation_events(self.lead_id, self.stream_tokens, self.chat_room_id,
+                                                      self.resume):
+                    self.chat_room_id = chat.get("roomId", self.chat_room_id)
+                    self._publish(chat)
+        except Exception as e:
+            logger.error(f"리드 {self.lead_id} 협상 작업 중 오류: {e}", exc_info=True)
+            self._publish({"error": str(e)})
+        finally:
+            try:
+                await run_lock.release()
+            finally:
+                await sync_to_async(close_old_connections)()
+                self._finish()
+            logger.info(f"리드 {self.lead_id} 협상 작업 종료: 이벤트 {len(self.events)}건, "
+                        f"{self.finished_at - self.started_at:.1f}초")
+
+    def subscribe(self, callback: Callable[[Optional[JobEvent]], None],
+                  position: EventPosition = EventPosition()) -> List[Optional[JobEvent]]:
+        """
+        position 이후의 지난 이벤트를 반환하고, 이후 이벤트는 callback 으로 전달합니다. (종료 시 None)
+        지난 이벤트 조회와 등록을 같은 잠금 안에서 하므로 이벤트가 빠지거나 중복되지 않습니다.
+        이미 끝난 작업이면 등록하지 않고 지난 이벤트 끝에 None 을 붙여 반환합니다.
+        """
+        with self._lock:
+            backlog: List[Optional[JobEvent]] = self.log.after(position)
+            if self.finished:
+                backlog.append(None)
+            else:
+                self._subscribers.append(callback)
+            return backlog
+
+    def unsubscribe(self, callback: Callable[[Optional[JobEvent]], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def iter_events(self, position: EventPosition = EventPosition()) -> Iterator[JobEvent]:
+        """ 동기(WSGI) 구독: 스레드 큐로 이벤트를 받습니다. """
+        q: "queue.Queue[Optional[JobEvent]]" = queue.Queue()
+        backlog = self.subscribe(q.put, position)
+        try:
+            for item in backlog:
+                if item is None:
+                    return
+                yield item
+            while True:
+                item = q.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.unsubscribe(q.put)
+
+    async def aiter_events(self, position: EventPosition = EventPosition()) -> AsyncIterator[JobEvent]:
+        """
+        비동기(ASGI) 구독: 구독자 루프의 asyncio.Queue 로 이벤트를 넘깁니다.
+        (작업이 다른 요청의 루프나 WSGI 전용 스레드 루프에서 실행 중이어도 call_soon_threadsafe 로 안전하게 전달)
+        """
+        loop = asyncio.get_running_loop()
+        q: "asyncio.Queue[Optional[JobEvent]]" = asyncio.Queue()
+
+        def callback(item: Optional[JobEvent]):
+            loop.call_soon_threadsafe(q.put_nowait, item)
+
+        backlog = self.subscribe(callback, position)
+        try:
+            for item in backlog:
+                if item is None:
+                    return
+                yield item
+            while True:
+                item = await q.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.unsubscribe(callback)
+
+
+class ReplayedConversation:
+    """
+    완료된 채팅방의 저장된 채팅을 순서대로 재생합니다. (LLM 호출 없음)
+    재생할 때마다 새 작업 key 를 쓰므로, 재연결은 이벤트 id 의 채팅 id 를 기준으로 이어집니다.
+    """
+
+    def __init__(self, lead_id: int, chats: List[dict]):
+        self.lead_id = lead_id
+        self.log = EventLog()
+        for chat in chats:
+            self.log.append(chat)
+
+    def iter_events(self, position: EventPosition = EventPosition()) -> Iterator[JobEvent]:
+        yield from self.log.after(position)
+
+    async def aiter_events(self, position: EventPosition = EventPosition()) -> AsyncIterator[JobEvent]:
+        for item in self.log.after(position):
+            yield item
+
+
+class NegotiationJobRegistry:
+    """
+    리드별 협상 작업 레지스트리.
+    작업은 요청과 분리된 태스크라 요청(연결)이 끊겨도 중단되지 않고, 같은 리드에 대한 요청은 실행 중이거나
+    ttl 안에 끝난 작업을 공유합니다.
+    - ASGI(aopen): 작업을 시작한 요청의 이벤트 루프에 태스크로 올림 → 보조 스레드 없이 서버 루프(워커)마다 실행
+    - WSGI(open): 실행 중인 루프가 없으므로 전용 스레드의 이벤트 루프 하나에서 실행
+    (ttl 이 지났거나 오류로 끝난 작업은 다음 요청에서 새로 시작하며, 오류로 끝난 작업의 채팅방은 비우고 재사용)
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, NegotiationJob] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _start(self, job: NegotiationJob):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            job._task = loop.create_task(job.run())
+        else:
+            job._task = asyncio.run_coroutine_threadsafe(job.run(), self._ensure_loop())
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="negotiation-jobs", daemon=True)
+            thread.start()
+            self._loop = loop
+        return self._loop
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [lead_id for lead_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for lead_id in expired:
+            del self._jobs[lead_id]
+
+    def get(self, lead_id: int) -> Optional[NegotiationJob]:
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(lead_id)
+
+    def get_or_start(self, lead_id: int, stream_tokens: bool = False, chat_room_id: Optional[int] = None,
+                     restart: bool = False) -> NegotiationJob:
+        """
+        리드의 작업을 반환하고, 없으면 시작합니다. 실행 중인 작업은 restart 여도 그대로 공유합니다.
+        이벤트 루프 스레드에서 호출하면 그 루프에서, 아니면 전용 스레드의 루프에서 실행합니다.
+        토큰 델타 포함 여부는 작업을 시작한 요청을 따릅니다. (나중에 붙은 구독자가 델타를 원해도 채팅 레코드만 받음)
+        chat_room_id 를 주면 (또는 이전 작업의 채팅방이 있으면) 새로 만들지 않고 비워서 재사용합니다.
+        AGENT_MEMORY_PERSIST 가 켜져 있고 restart 가 아니면 비우지 않고 저장된 채팅과 채팅방 메모리에 이어서 실행합니다.
+        """
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(lead_id)
+            if job is not None and not (job.finished and (job.failed or restart)):
+                return job
+            # dry-run 작업의 채팅방은 종료 시 삭제되므로 재사용하지 않음
+            if job is not None and chat_room_id is None and not settings.AGENT_DRY_RUN:
+                chat_room_id = job.chat_room_id
+            resume = settings.AGENT_MEMORY_PERSIST and not restart and chat_room_id is not None
+            job = NegotiationJob(lead_id, stream_tokens, chat_room_id, resume=resume)
+            self._jobs[lead_id] = job
+            self._start(job)
+            return job
+
+    def _reusable(self, lead_id: int, regenerate: bool) -> Optional[NegotiationJob]:
+        job = self.get(lead_id)
+        if job is not None and not (job.finished and (job.failed or regenerate)):
+            return job
+        return None
+
+    def _open_stored(self, lead_id: int, stream_tokens: bool, regenerate: bool,
+                     stored: Optional[Tuple[int, List[dict]]]):
+        if stored is not None and not regenerate and is_conversation_complete(stored[1]):
+            logger.info(f"리드 {lead_id}: 완료된 채팅방 {stored[0]} 의 채팅 {len(stored[1])}건을 재생합니다.")
+            return ReplayedConversation(lead_id, stored[1])
+        return self.get_or_start(lead_id, stream_tokens, chat_room_id=stored[0] if stored else None,
+                                 restart=regenerate)
+
+    def open(self, lead_id: int, stream_tokens: bool = False, regenerate: bool = False):
+        """
+        리드의 대화 이벤트 소스를 반환합니다. (동기 함수, DB 조회 포함)
+        - 실행 중이거나 보관 중인 작업이 있으면 그 작업 (regenerate 면 끝난 작업 대신 새 실행)
+        - 완료된 채팅방이 있으면 저장된 채팅 재생 (regenerate 면 채팅방을 비우고 새 실행)
+        - 그 외(채팅방 없음, 중단된 대화)는 새 작업 시작 (AGENT_MEMORY_PERSIST 면 중단된 대화에 이어서)
+        """
+        job = self._reusable(lead_id, regenerate)
+        if job is not None:
+            return job
+        return self._open_stored(lead_id, stream_tokens, regenerate, load_stored_conversation(lead_id))
+
+    async def aopen(self, lead_id: int, stream_tokens: bool = False, regenerate: bool = False):
+        """ open() 의 비동기 버전. 새 작업은 호출한 이벤트 루프(ASGI 서버 루프)에서 실행합니다. """
+        job = self._reusable(lead_id, regenerate)
+        if job is not None:
+            return job
+        stored = await sync_to_async(load_stored_conversation)(lead_id)
+        return self._open_stored(lead_id, stream_tokens, regenerate, stored)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if not job.finished)
+            return {"running": running, "retained": len(self._jobs) - running}
+
+
+negotiation_jobs = NegotiationJobRegistry(ttl=settings.NEGOTIATION_JOB_TTL_SECONDS)
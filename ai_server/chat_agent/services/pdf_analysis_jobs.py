@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from chat_agent.models import CompanyFile
+from chat_agent.services.pdf_service import PDFAnalysisService
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class PDFAnalysisJob:
+    """ 여러 PDF 파일을 분석하는 작업 하나의 파일별 진행 상태 """
+
+    def __init__(self, file_ids: List[int]):
+        self.job_id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.files: Dict[int, Dict[str, Any]] = {file_id: {"status": STATUS_PENDING} for file_id in file_ids}
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def mark(self, file_id: int, status: str, **fields) -> bool:
+        """ 파일 상태를 기록하고, 이 기록으로 작업의 모든 파일이 끝났으면 True """
+        with self._lock:
+            self.files[file_id] = {"status": status, **fields}
+            if self.finished_at is None and all(entry["status"] in (STATUS_DONE, STATUS_FAILED)
+                                                for entry in self.files.values()):
+                self.finished_at = time.time()
+                return True
+            return False
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            files = [{"fileId": file_id, **entry} for file_id, entry in self.files.items()]
+            finished_at = self.finished_at
+        counts = {status: 0 for status in (STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)}
+        for entry in files:
+            counts[entry["status"]] += 1
+        return {
+            "jobId": self.job_id,
+            "status": STATUS_DONE if finished_at is not None else STATUS_RUNNING,
+            "total": len(files),
+            **counts,
+            "elapsedMs": round(((finished_at or time.time()) - self.created_at) * 1000),
+            "files": files,
+        }
+
+
+class PDFAnalysisJobManager:
+    """
+    여러 PDF 파일을 백그라운드에서 분석하는 작업 관리자.
+    모든 작업의 파일이 workers 개 스레드의 공용 풀에서 처리되므로 동시 분석 수는 요청 수와 관계없이 workers 로 제한되고,
+    각 파일의 요약은 끝나는 즉시 CompanyFile 에 커밋됩니다. 끝난 작업은 ttl 동안 조회할 수 있습니다.
+    """
+
+    def __init__(self, workers: int, ttl: float):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, PDFAnalysisJob] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-analysis")
+        return self._executor
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[PDFAnalysisJob]:
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def submit(self, file_ids: Iterable[int]) -> PDFAnalysisJob:
+        """ 파일들을 분석 대기열에 넣고 작업을 반환합니다. (동기 함수, DB 조회 포함) 없는 파일은 바로 실패 처리 """
+        file_ids = list(dict.fromkeys(int(file_id) for file_id in file_ids))
+        existing = set(CompanyFile.objects.filter(id__in=file_ids).values_list("id", flat=True))
+        job = PDFAnalysisJob(file_ids)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.job_id] = job
+            executor = self._ensure_executor()
+        for file_id in file_ids:
+            if file_id in existing:
+                executor.submit(self._run_one, job, file_id)
+            else:
+                job.mark(file_id, STATUS_FAILED, error="file not found")
+        logger.info(f"PDF 일괄 분석 작업 {job.job_id}: 파일 {len(file_ids)}개 (분석 대상 {len(existing)}개)")
+        return job
+
+    def _run_one(self, job: PDFAnalysisJob, file_id: int):
+        job.mark(file_id, STATUS_RUNNING)
+        started = time.perf_counter()
+        try:
+            result = PDFAnalysisService().analyze(file_id)
+            elapsed_ms = round((time.perf_counter() - started) * 1000)
+            if result["summary"]:
+                finished = job.mark(file_id, STATUS_DONE, cacheHit=result["cache_hit"], elapsedMs=elapsed_ms)
+            else:
+                finished = job.mark(file_id, STATUS_FAILED, error="Failed to analyze PDF", elapsedMs=elapsed_ms)
+        except Exception as e:
+            logger.error(f"PDF 일괄 분석 작업 {job.job_id} 파일 {file_id} 오류: {e}", exc_info=True)
+            finished = job.mark(file_id, STATUS_FAILED, error=str(e),
+                                elapsedMs=round((time.perf_counter() - started) * 1000))
+        finally:
+            # 풀 스레드는 요청 주기 밖이므로 직접 오래된 연결을 정리
+            close_old_connections()
+        if finished:
+            logger.info(f"PDF 일괄 분석 작업 {job.job_id} 완료: {job.as_dict()['done']}/{len(job.files)}")
+
+
+pdf_analysis_jobs = PDFAnalysisJobManager(settings.PDF_ANALYSIS_WORKERS, settings.PDF_ANALYSIS_JOB_TTL_SECONDS)
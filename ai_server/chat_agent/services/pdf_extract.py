@@ -0,0 +1,114 @@
+"""
+메모리에 올린 PDF 바이트에서 텍스트를 추출합니다.
+
+PyMuPDF 는 페이지 처리 중 GIL 을 잡고 있어 스레드로는 병렬화되지 않으므로, 페이지 범위를 프로세스 풀에 나눠 맡깁니다.
+워커 프로세스가 이 모듈만 import 하도록 Django/OpenAI 의존성 없이 fitz 만 사용합니다.
+PDF 바이트는 작업마다 피클로 보내지 않고 임시 파일 하나에 한 번 쓴 뒤 경로만 넘기며,
+워커는 같은 경로의 문서를 한 번만 열어 이후 범위에서 재사용합니다.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+# 워커 프로세스에서 마지막으로 연 문서 (경로, 문서). 다른 문서의 범위를 받으면 닫고 새로 엶
+_worker_doc: Optional[Tuple[str, fitz.Document]] = None
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    # 스레드가 여러 개인 서버 프로세스에서 fork 하지 않도록 spawn 으로 워커를 띄우고, 프로세스 수명 동안 재사용
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executors[workers] = executor
+        return executor
+
+
+def _extract_range(doc: fitz.Document, start: int, stop: int, max_chars: int) -> List[str]:
+    """ [start, stop) 페이지의 텍스트 목록. 합계가 max_chars 를 넘으면 거기서 멈춤 """
+    texts: List[str] = []
+    total = 0
+    for page_number in range(start, min(stop, doc.page_count)):
+        text = doc[page_number].get_text()
+        texts.append(text)
+        total += len(text)
+        if total >= max_chars:
+            break
+    return texts
+
+
+def extract_page_range(path: str, start: int, stop: int, max_chars: int) -> List[str]:
+    """ 워커 프로세스 작업: path 의 PDF 에서 [start, stop) 페이지 텍스트를 추출합니다. (같은 문서는 한 번만 열기) """
+    global _worker_doc
+    if _worker_doc is None or _worker_doc[0] != path:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+        _worker_doc = (path, fitz.open(path))
+    return _extract_range(_worker_doc[1], start, stop, max_chars)
+
+
+def extract_pdf_pages(data: bytes, max_chars: int, workers: int = 4, pages_per_task: int = 32,
+                      parallel_min_pages: int = 16) -> List[str]:
+    """
+    PDF 바이트에서 앞쪽 페이지부터 합계 max_chars 자가 찰 때까지 페이지별 텍스트를 추출합니다.
+    - parallel_min_pages 보다 짧은 문서는 현재 프로세스에서 순서대로 추출
+    - 긴 문서는 임시 파일에 한 번 쓰고 pages_per_task 페이지씩 나눠 최대 workers 개 범위를 동시에 추출하며,
+      앞에서부터 결과를 모아 문자 예산이 차면 남은 범위는 제출하지 않음 (뒤쪽 페이지는 읽지 않음)
+    """
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < parallel_min_pages:
+            return _extract_range(doc, 0, page_count, max_chars)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+        temp_file.write(data)
+        path = temp_file.name
+    try:
+        pages = _extract_pages_in_workers(path, page_count, max_chars, workers, pages_per_task)
+    finally:
+        # 워커가 연 문서는 다음 문서를 받을 때 닫히며, 그 전에 지워도 열린 핸들로는 계속 읽을 수 있음
+        os.remove(path)
+    logger.info(f"PDF 텍스트 추출: {page_count}페이지 중 {len(pages)}페이지, "
+                f"{min(sum(len(text) for text in pages), max_chars)}자")
+    return pages
+
+
+def _extract_pages_in_workers(path: str, page_count: int, max_chars: int, workers: int,
+                              pages_per_task: int) -> List[str]:
+    executor = _get_executor(workers)
+    ranges = deque((start, min(start + pages_per_task, page_count))
+                   for start in range(0, page_count, pages_per_task))
+    in_flight: Deque[Future] = deque()
+    pages: List[str] = []
+    total = 0
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers:
+                start, stop = ranges.popleft()
+                in_flight.append(executor.submit(extract_page_range, path, start, stop, max_chars))
+            range_pages = in_flight.popleft().result()
+            pages.extend(range_pages)
+            total += sum(len(text) for text in range_pages)
+            if total >= max_chars:
+                break
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return pages
+
+
+def extract_pdf_text(data: bytes, max_chars: int, **options) -> str:
+    """ extract_pdf_pages 의 페이지 텍스트를 한 번에 join 해 max_chars 자로 자릅니다. """
+    return "".join(extract_pdf_pages(data, max_chars, **options))[:max_chars]
@@ -1,18 +1,110 @@
-import urllib.request
-import fitz  # PyMuPDF
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from django.db import transaction
-from openai import OpenAI
-import tempfile
-import os
+from django.utils import timezone
 
 from chat_agent.models import CompanyFile
+from chat_agent.services.clients import clients
+from chat_agent.services.company_cache import company_profile_cache
+from chat_agent.services.embedding_cache import normalize_text
+from chat_agent.services.file_store import JsonFileStore
+from chat_agent.services.llm_scheduler import PRIORITY_BACKGROUND, completion_usage, llm_scheduler
+from chat_agent.services.pdf_extract import extract_pdf_pages
+from chat_agent.services.token_budget import pack_chunks, token_counter
+
+ANALYSIS_SYSTEM_PROMPT = "You are a company analysis expert that extracts structured information from PDF documents."
+
+# 프롬프트/요약 형식이 바뀌면 올려서 이전 캐시 결과를 무효화
+PDF_ANALYSIS_CACHE_VERSION = 1
+
+# 회사별 (분석 방식, PDF 바이트 또는 정규화 텍스트의 sha256) → 분석 결과
+pdf_analysis_cache = JsonFileStore(settings.PDF_ANALYSIS_CACHE_DIR)
+
+
+def _cache_key(company_id, mode, kind, digest):
+    return f"v{PDF_ANALYSIS_CACHE_VERSION}-{company_id}-{mode}-{kind}-{digest}"
+
+
+# 회사별 최신 파일의 페이지 해시와 구간별 사실/통합 결과 (증분 재분석용)
+# 구간별 사실 저장 형식이 바뀌면 올려서 이전 결과를 무효화
+PDF_PAGE_FACTS_VERSION = 2
+pdf_page_facts_store = JsonFileStore(settings.PDF_PAGE_FACTS_DIR)
+
+_page_ref = re.compile(r"(p\.\s*)(\d+)")
+
+
+def _page_facts_key(company_id):
+    return f"v{PDF_ANALYSIS_CACHE_VERSION}.{PDF_PAGE_FACTS_VERSION}-{company_id}"
+
+
+def _remap_page_refs(facts, old_pages, new_pages):
+    """
+    재사용하는 구간 사실의 [p.N] 페이지 번호를 이번 문서의 페이지 번호로 바꿉니다.
+    구간 키가 같으면 페이지 내용과 순서가 같으므로 구간 안의 위치끼리 대응시킵니다. (대응이 없는 번호는 그대로)
+    """
+    mapping = {old: new for old, new in zip(old_pages, new_pages) if old != new}
+    if not mapping:
+        return facts
+    return _page_ref.sub(lambda m: m.group(1) + str(mapping.get(int(m.group(2)), m.group(2))), facts)
+
+
+def _page_runs(pages, max_tokens, boundary_pages):
+    """
+    텍스트가 있는 페이지를 max_tokens 이하의 연속 구간으로 묶습니다.
+    구간 경계는 토큰 예산 외에 페이지 내용 해시로도 정해져(평균 boundary_pages 페이지마다) 앞쪽 페이지가 추가/삭제되어도
+    뒤쪽 구간이 그대로 유지되므로, 개정판에서는 바뀐 페이지가 속한 구간만 키가 달라집니다.
+    키에는 페이지 번호가 들어가지 않으므로, 재사용하는 사실의 [p.N] 은 pages 로 _remap_page_refs() 해서 씁니다.
+
+    Returns:
+        list: [{"key": 구간 페이지 해시들의 sha256, "pageHashes": [...], "pages": [페이지 번호...],
+                "text": "[p.N] 이 붙은 구간 텍스트"}]
+    """
+    runs = []
+    texts, page_hashes, page_numbers, used = [], [], [], 0
+
+    def close_run():
+        key = hashlib.sha256("".join(page_hashes).encode("ascii")).hexdigest()
+        runs.append({"key": key, "pageHashes": list(page_hashes), "pages": list(page_numbers),
+                     "text": "\n".join(texts)})
+        texts.clear()
+        page_hashes.clear()
+        page_numbers.clear()
+
+    for page_number, text in enumerate(pages, start=1):
+        normalized = normalize_text(text)
+        if not normalized:
+            continue
+        page_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        page_text = f"[p.{page_number}]\n{text}"
+        cost = token_counter.count(page_text)
+        if cost > max_tokens:
+            page_text, cost = token_counter.truncate(page_text, max_tokens), max_tokens
+        if texts and used + cost > max_tokens:
+            close_run()
+            used = 0
+        texts.append(page_text)
+        page_hashes.append(page_hash)
+        page_numbers.append(page_number)
+        used += cost
+        if int(page_hash[:8], 16) % max(1, boundary_pages) == 0:
+            close_run()
+            used = 0
+    if texts:
+        close_run()
+    return runs
+
+
+class PDFDownloadError(Exception):
+    pass
 
 
 class PDFAnalysisService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = clients.openai()
 
     def analyze_company_pdf(self, file_id):
         """
@@ -21,71 +113,125 @@ class PDFAnalysisService:
         Returns:
             dict: 추출된 회사 정보
         """
+        return self.analyze(file_id)["summary"]
+
+    def analyze(self, file_id):
+        """
+        analyze_company_pdf 와 같지만 분석 결과 캐시 적중 여부를 함께 반환합니다.
+        같은 회사에 같은 PDF(바이트 지문) 또는 같은 내용(정규화 텍스트 지문)이 다시 올라오면
+        다운로드/추출 외의 LLM 호출 없이 저장된 요약을 CompanyFile.summary 에 바로 채웁니다.
+
+        Returns:
+            dict: {"summary": 추출된 회사 정보 (실패 시 {}), "cache_hit": bool}
+        """
         try:
             company_file = CompanyFile.objects.get(id=file_id)
-            # PDF 텍스트 추출
-            extracted_text = self._extract_text_from_pdf(company_file.url)
-            if not extracted_text:
+            company_name = company_file.company.company_name
+            mode = settings.PDF_ANALYSIS_MODE
+            pdf_bytes = self._download_pdf(company_file.url)
+
+            bytes_key = _cache_key(company_file.company_id, mode, "bytes", hashlib.sha256(pdf_bytes).hexdigest())
+            cached = pdf_analysis_cache.get(bytes_key)
+            if cached:
+                print(f"PDF 분석 캐시 적중 (바이트 지문): file_id={file_id}")
+                self._save_summary(company_file, cached["summary"])
+                return {"summary": cached["summary"], "cache_hit": True}
+
+            if mode == "chunked":
+                # 문서 전체를 청크로 나눠 사실 추출(map) 후 통합(reduce)
+                pages = self._extract_pages_from_pdf(pdf_bytes, settings.PDF_CHUNKED_MAX_CHARS)
+                text = "\n".join(pages)
+            else:
+                # PDF 텍스트 추출 (문자 예산은 OpenAI API 제한 고려)
+                pages = self._extract_pages_from_pdf(pdf_bytes, settings.PDF_TEXT_MAX_CHARS)
+                text = "".join(pages)[:settings.PDF_TEXT_MAX_CHARS]
+            if not text.strip():
                 print("PDF에서 텍스트를 추출할 수 없습니다.")
-                return {}
+                return {"summary": {}, "cache_hit": False}
 
-            # OpenAI를 사용하여 텍스트에서 회사 정보 추출
-            company_info = self._extract_company_info_with_ai(extracted_text, company_file.company.company_name)
+            text_digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+            text_key = _cache_key(company_file.company_id, mode, "text", text_digest)
+            cached = pdf_analysis_cache.get(text_key)
+            if cached:
+                # 다시 내보낸 PDF 등 바이트만 다르고 내용이 같은 경우
+                print(f"PDF 분석 캐시 적중 (텍스트 지문): file_id={file_id}")
+                self._store_analysis(bytes_key, cached)
+                self._save_summary(company_file, cached["summary"])
+                return {"summary": cached["summary"], "cache_hit": True}
 
-            with transaction.atomic():
-                CompanyFile.objects.update_or_create(
-                    id=file_id,
-                    defaults={
-                        "summary": company_info
-                    }
-                )
+            if mode == "chunked":
+                company_info = self._extract_company_info_chunked(pages, company_name, company_file.company_id, file_id)
+            else:
+                # OpenAI를 사용하여 텍스트에서 회사 정보 추출
+                company_info = self._extract_company_info_with_ai(text, company_name)
+            if not company_info:
+                return {"summary": {}, "cache_hit": False}
 
-            return company_info
+            entry = {"summary": company_info, "mode": mode, "fileId": file_id, "textSha256": text_digest,
+                     "createdAt": timezone.now().isoformat()}
+            self._store_analysis(text_key, entry)
+            self._store_analysis(bytes_key, entry)
+            self._save_summary(company_file, company_info)
+            return {"summary": company_info, "cache_hit": False}
 
         except Exception as e:
             print(f"PDF 분석 중 오류 발생: {e}")
-            return {}
+            return {"summary": {}, "cache_hit": False}
+
+    def _save_summary(self, company_file, company_info):
+        with transaction.atomic():
+            CompanyFile.objects.update_or_create(
+                id=company_file.id,
+                defaults={
+                    "summary": company_info
+                }
+            )
+            # 커밋 직후 회사 프로필 캐시를 새 요약으로 갱신
+            company_id = company_file.company_id
+            if company_id is not None:
+                transaction.on_commit(lambda: company_profile_cache.refresh(company_id))
+
+    def _store_analysis(self, key, entry):
+        # 캐시 저장 실패는 분석 결과에 영향을 주지 않음
+        try:
+            pdf_analysis_cache.set(key, entry)
+        except OSError as e:
+            print(f"PDF 분석 캐시 저장 오류: {e}")
 
-    def _extract_text_from_pdf(self, pdf_path):
+    def _extract_pages_from_pdf(self, pdf_bytes, max_chars):
         """
-        PyMuPDF를 사용하여 PDF에서 텍스트를 추출합니다.
+        메모리에 내려받은 PDF 에서 PyMuPDF 로 페이지별 텍스트를 추출합니다.
+        긴 문서는 워커들이 함께 읽는 임시 파일 하나를 두고 페이지 범위를 프로세스 풀에서 병렬로 추출하며, 문자 예산이 차면 멈춥니다.
         """
         try:
-            downloaded_path = self._download_pdf(pdf_path)
-            text = ""
-            # PDF 파일 열기
-            with fitz.open(downloaded_path) as doc:
-                # 각 페이지의 텍스트 추출
-                for page in doc:
-                    text += page.get_text()
-
-            # 텍스트가 너무 길면 잘라내기 (OpenAI API 제한 고려)
-            max_length = 15000
-            if len(text) > max_length:
-                print(f"PDF 텍스트가 너무 길어 {max_length}자로 제한합니다.")
-                text = text[:max_length]
-
-            os.remove(downloaded_path)
-
-            return text
+            return extract_pdf_pages(
+                pdf_bytes, max_chars,
+                workers=settings.PDF_EXTRACT_WORKERS,
+                pages_per_task=settings.PDF_EXTRACT_PAGES_PER_TASK,
+                parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+            )
         except Exception as e:
             print(f"PDF 텍스트 추출 오류: {e}")
-            return ""
+            return []
 
     def _download_pdf(self, url):
-        """URL에서 PDF 파일을 다운로드하고 임시 파일 경로를 반환합니다."""
-        try:
-            # 임시 파일 생성
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_path = temp_file.name
-
-            # PDF 다운로드
-            urllib.request.urlretrieve(url, temp_path)
-            print(f"PDF 다운로드 완료: {url}")
-            return temp_path
-        except Exception as e:
-            print(f"PDF 다운로드 오류: {e}")
-            return None
+        """ URL 의 PDF 를 크기 제한(PDF_MAX_DOWNLOAD_BYTES)과 전체 시간 제한 안에서 메모리로 내려받습니다. """
+        deadline = time.monotonic() + settings.PDF_DOWNLOAD_TIMEOUT
+        max_bytes = settings.PDF_MAX_DOWNLOAD_BYTES
+        with clients.http_session().get(url, stream=True, timeout=clients.http_timeout) as response:
+            response.raise_for_status()
+            content_length = int(response.headers.get("Content-Length") or 0)
+            if content_length > max_bytes:
+                raise PDFDownloadError(f"PDF 크기 제한 초과: {content_length} > {max_bytes} bytes")
+            buffer = bytearray()
+            for block in response.iter_content(chunk_size=64 * 1024):
+                buffer.extend(block)
+                if len(buffer) > max_bytes:
+                    raise PDFDownloadError(f"PDF 크기 제한 초과: {max_bytes} bytes")
+                if time.monotonic() > deadline:
+                    raise PDFDownloadError(f"PDF 다운로드 시간 초과 ({settings.PDF_DOWNLOAD_TIMEOUT}초)")
+        print(f"PDF 다운로드 완료: {url} ({len(buffer)} bytes)")
+        return bytes(buffer)
 
     def _extract_company_info_with_ai(self, text, company_name):
         """
@@ -105,22 +251,158 @@ class PDFAnalysisService:
 
                 """
 
-            # GPT-4 API 호출
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
+            # GPT-4 API 호출 (스케줄러 경유, 채팅보다 낮은 background 우선순위)
+            return self._complete("gpt-4o", prompt)
+
+        except Exception as e:
+            print(f"AI를 사용한 정보 추출 오류: {e}")
+            return {}
+
+    def _complete(self, model, prompt, temperature=0.3):
+        response = llm_scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model=model,
                 messages=[
-                    {"role": "system",
-                     "content": "You are a company analysis expert that extracts structured information from PDF documents."},
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-            )
+                temperature=temperature,
+            ),
+            model=model, tokens=llm_scheduler.estimate_tokens(prompt),
+            priority=PRIORITY_BACKGROUND, usage=completion_usage,
+        )
+        return response.choices[0].message.content.strip()
+
+    def _extract_company_info_chunked(self, pages, company_name, company_id=None, file_id=None):
+        """
+        문서 전체를 페이지 구간(토큰 제한 청크)으로 나눠 분석합니다. (map-reduce)
+        - map   : 구간별 사실 추출을 저렴한 모델(PDF_MAP_MODEL)로 동시에 실행
+        - reduce: 사실 목록이 PDF_REDUCE_MAX_TOKENS 를 넘으면 묶음별로 통합하는 단계를 반복한 뒤,
+                  최종 요약은 PDF_REDUCE_MODEL 로 작성 (단일 호출 모드와 같은 요약 기준)
+        company_id 가 있으면 회사의 이전 분석에서 저장한 구간별 사실/통합 결과 중 페이지 내용이 같은 것은 재사용하고,
+        새로 생기거나 바뀐 페이지의 구간만 다시 추출합니다. (PDF_INCREMENTAL_ANALYSIS)
+        재사용한 사실의 페이지 번호는 이번 문서에서의 위치로 바꿔 씁니다.
+        구간이 하나뿐이면 단일 호출 모드와 같은 방식으로 분석합니다.
+        """
+        runs = _page_runs(pages, settings.PDF_CHUNK_TOKENS, settings.PDF_CHUNK_BOUNDARY_PAGES)
+        if len(runs) <= 1:
+            return self._extract_company_info_with_ai("".join(run["text"] for run in runs), company_name)
 
-            # JSON 응답 추출 및 파싱
-            result = response.choices[0].message.content.strip()
+        started = time.perf_counter()
+        incremental = company_id is not None and settings.PDF_INCREMENTAL_ANALYSIS
+        previous = (pdf_page_facts_store.get(_page_facts_key(company_id)) if incremental else None) or {}
+        cached_chunks = previous.get("chunks", {})
+        cached_merges = previous.get("merges", {})
+        page_hashes = [page_hash for run in runs for page_hash in run["pageHashes"]]
+        changed_pages = len(set(page_hashes) - set(previous.get("pageHashes", [])))
 
-            return result
+        with ThreadPoolExecutor(max_workers=settings.PDF_ANALYSIS_CONCURRENCY) as executor:
+            # 구간 키 → {"facts": 사실 목록, "pages": 사실을 추출할 때의 페이지 번호}
+            chunks = {}
+            for run in runs:
+                cached = cached_chunks.get(run["key"])
+                if cached is not None:
+                    chunks[run["key"]] = {"facts": _remap_page_refs(cached["facts"], cached["pages"], run["pages"]),
+                                          "pages": run["pages"]}
+            missing = [run for run in runs if run["key"] not in chunks]
+            extracted = executor.map(lambda run: self._extract_chunk_facts(run["text"], company_name), missing)
+            for run, fact in zip(missing, extracted):
+                if fact is not None:
+                    chunks[run["key"]] = {"facts": fact, "pages": run["pages"]}
+            facts = [chunks[run["key"]]["facts"] for run in runs if chunks.get(run["key"], {}).get("facts")]
+            if not facts:
+                print("PDF 청크에서 정보를 추출하지 못했습니다.")
+                return {}
+
+            merges = {}
+
+            def merge(group):
+                group_key = hashlib.sha256(group.encode("utf-8")).hexdigest()
+                merged = merges.get(group_key) or cached_merges.get(group_key)
+                if merged is None:
+                    merged = self._merge_facts(group, company_name)
+                    if merged is None:
+                        return group
+                merges[group_key] = merged
+                return merged
+
+            separator = "\n\n"
+            groups = list(pack_chunks(facts, settings.PDF_REDUCE_MAX_TOKENS, separator=separator))
+            levels = 1
+            while len(groups) > 1:
+                merged = [fact for fact in executor.map(merge, groups) if fact]
+                levels += 1
+                next_groups = list(pack_chunks(merged, settings.PDF_REDUCE_MAX_TOKENS, separator=separator))
+                if len(next_groups) >= len(groups):
+                    # 통합해도 줄어들지 않으면 두 개씩 강제로 묶어 진행
+                    next_groups = [separator.join(merged[i:i + 2]) for i in range(0, len(merged), 2)]
+                groups = next_groups
+
+        if incremental:
+            # 회사의 최신 파일 기준으로 교체 (이번 문서에 없는 구간의 사실은 버림)
+            self._store_page_facts(company_id, {
+                "fileId": file_id, "pageHashes": page_hashes, "chunks": chunks, "merges": merges,
+                "updatedAt": timezone.now().isoformat(),
+            })
 
+        try:
+            company_info = self._complete(settings.PDF_REDUCE_MODEL, self._final_summary_prompt(groups[0], company_name))
         except Exception as e:
-            print(f"AI를 사용한 정보 추출 오류: {e}")
+            print(f"AI를 사용한 정보 통합 오류: {e}")
             return {}
+        print(f"PDF 청크 분석 완료: {len(pages)}페이지 (변경 {changed_pages}), 청크 {len(runs)}개 "
+              f"(추출 {len(missing)}, 재사용 {len(runs) - len(missing)}), 통합 {levels}단계, "
+              f"{time.perf_counter() - started:.1f}초")
+        return company_info
+
+    def _store_page_facts(self, company_id, entry):
+        try:
+            pdf_page_facts_store.set(_page_facts_key(company_id), entry)
+        except OSError as e:
+            print(f"PDF 페이지 사실 저장 오류: {e}")
+
+    def _extract_chunk_facts(self, chunk, company_name):
+        """ 구간의 사실 목록 (관련 정보가 없으면 빈 문자열, 호출 실패 시 None) """
+        prompt = f"""
+            아래는 "{company_name}" 회사 관련 PDF 의 일부입니다. ([p.N] 은 페이지 번호)
+            seller, buyer 입장에서 필요한 사실(사업 내용, 제품/서비스, 고객, 시장, 경쟁력, 수치, 조직, 계획 등)을
+            한국어 글머리표로 빠짐없이 간결하게 추출하세요.
+            텍스트에서 명확하게 확인할 수 없는 정보는 생략하고, 수치는 확실한 숫자만 포함하세요.
+            관련 정보가 없으면 빈 문자열을 반환하세요.
+
+            PDF 텍스트:
+            {chunk}
+            """
+        try:
+            return self._complete(settings.PDF_MAP_MODEL, prompt, temperature=0.0)
+        except Exception as e:
+            print(f"PDF 청크 정보 추출 오류: {e}")
+            return None
+
+    def _merge_facts(self, facts, company_name):
+        """ 통합된 사실 목록 (호출 실패 시 None) """
+        prompt = f"""
+            아래는 "{company_name}" 회사 PDF 의 여러 구간에서 추출한 사실 목록입니다.
+            중복은 합치고 서로 다른 수치는 모두 남겨 하나의 한국어 글머리표 목록으로 통합하세요.
+
+            {facts}
+            """
+        try:
+            return self._complete(settings.PDF_MAP_MODEL, prompt, temperature=0.0)
+        except Exception as e:
+            print(f"PDF 사실 통합 오류: {e}")
+            return None
+
+    def _final_summary_prompt(self, facts, company_name):
+        return f"""
+                당신은 회사 분석 전문가입니다. 아래는 PDF 문서 전체에서 구간별로 추출한 "{company_name}" 회사에 대한 사실 목록입니다.
+
+                seller, buyer 의 입장에서 필요한 정보들을 정리하여 문자열로 반환해주세요:
+
+                확인할 수 없는 정보는 생략하세요.
+                특히 매출액이나 투자금액 등 수치는 확실한 숫자만 포함하고 추측하지 마세요.
+
+                추출된 사실:
+                {facts}
+
+                """
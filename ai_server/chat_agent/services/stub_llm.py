@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import time
+from typing import AsyncIterator, List, Optional
+
+from agents import RunConfig
+from agents.items import ModelResponse
+from agents.models.interface import Model, ModelProvider
+from agents.usage import Usage
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText, ResponseTextDeltaEvent,
+)
+
+from chat_agent.services.token_budget import token_counter
+
+# 에이전트 이름(instructions 내 역할)별 고정 응답 템플릿
+_STUB_REPLIES = {
+    "영업 담당자": "[dry-run] 귀사의 요구에 맞춘 제품 구성을 제안드립니다. 도입 시 운영 비용 절감과 처리 속도 개선이 기대됩니다. (#{seed})",
+    "구매 담당자": "[dry-run] 제안 내용 검토했습니다. 가격과 납기, 유지보수 조건을 구체적으로 알려주세요. (#{seed})",
+}
+_DEFAULT_REPLY = "[dry-run] 대화 요약: 제안과 질문, 조건이 오갔습니다. (#{seed})"
+
+
+class StubModel(Model):
+    """
+    네트워크 없이 동작하는 Agents SDK 용 스텁 모델 (dry-run / 부하 측정용).
+    instructions 의 역할에 따라 고정 문장을 돌려주고, latency_ms 만큼 대기해 LLM 지연을 흉내 냅니다.
+    같은 입력에는 항상 같은 응답을 돌려줍니다.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, stream_chunk_chars: int = 8):
+        self.latency_ms = latency_ms
+        self.stream_chunk_chars = stream_chunk_chars
+
+    def _reply(self, system_instructions: Optional[str], input) -> str:
+        prompt = input if isinstance(input, str) else str(input)
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        template = next((reply for role, reply in _STUB_REPLIES.items()
+                         if system_instructions and role in system_instructions), _DEFAULT_REPLY)
+        return template.format(seed=seed)
+
+    def _usage(self, system_instructions: Optional[str], input, text: str) -> Usage:
+        input_tokens = token_counter.count(system_instructions) + token_counter.count(
+            input if isinstance(input, str) else str(input))
+        output_tokens = token_counter.count(text)
+        return Usage(requests=1, input_tokens=input_tokens, output_tokens=output_tokens,
+                     total_tokens=input_tokens + output_tokens)
+
+    @staticmethod
+    def _message(text: str) -> ResponseOutputMessage:
+        return ResponseOutputMessage(
+            id="msg_stub", type="message", role="assistant", status="completed",
+            content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+        )
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                           tracing, *, previous_response_id=None) -> ModelResponse:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        text = self._reply(system_instructions, input)
+        return ModelResponse(output=[self._message(text)], usage=self._usage(system_instructions, input, text),
+                             response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id=None) -> AsyncIterator:
+        text = self._reply(system_instructions, input)
+        chunks: List[str] = [text[i:i + self.stream_chunk_chars]
+                             for i in range(0, len(text), self.stream_chunk_chars)]
+        for chunk in chunks:
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000 / len(chunks))
+            yield ResponseTextDeltaEvent(type="response.output_text.delta", item_id="msg_stub", output_index=0,
+                                         content_index=0, delta=chunk)
+        usage = self._usage(system_instructions, input, text)
+        response = Response(
+            id="resp_stub", created_at=time.time(), model="stub", object="response",
+            output=[self._message(text)], parallel_tool_calls=False, tool_choice="auto", tools=[],
+            usage={"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens,
+                   "total_tokens": usage.total_tokens, "input_tokens_details": {"cached_tokens": 0},
+                   "output_tokens_details": {"reasoning_tokens": 0}},
+        )
+        yield ResponseCompletedEvent(type="response.completed", response=response)
+
+
+class StubModelProvider(ModelProvider):
+    def __init__(self, latency_ms: float = 0.0):
+        self.model = StubModel(latency_ms=latency_ms)
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return self.model
+
+
+def build_stub_run_config(latency_ms: float = 0.0) -> RunConfig:
+    """ 모든 에이전트 호출을 스텁 모델로 보내는 RunConfig (트레이스 업로드도 끔) """
+    return RunConfig(model_provider=StubModelProvider(latency_ms=latency_ms), tracing_disabled=True)
@@ -0,0 +1,172 @@
+import logging
+import math
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 이 없으면 근사치로 계산
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_word = re.compile(r"\w{2,}")
+_sentence_split = re.compile(r"(?<=[.!?。])\s+")
+
+
+class TokenCounter:
+    """
+    로컬 토크나이저로 프롬프트 토큰 수를 계산합니다.
+    tiktoken 을 사용할 수 없으면 ASCII 4자당 1토큰, 그 외 문자 1자당 1토큰으로 보수적으로 근사합니다.
+    """
+
+    def __init__(self, encoding_name: str = "o200k_base"):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"tiktoken 인코딩({encoding_name}) 로드 실패, 근사치로 계산합니다: {e}")
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+        # 근사 모드: 토큰 수가 예산 이하가 될 때까지 이진 탐색으로 자름
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+token_counter = TokenCounter(settings.PROMPT_TOKEN_ENCODING)
+
+
+def _split_units(text: str, separator: str) -> List[str]:
+    units = [unit.strip() for unit in text.split(separator) if unit.strip()]
+    if len(units) <= 1:
+        units = [unit.strip() for unit in _sentence_split.split(text) if unit.strip()]
+    return units
+
+
+def fit_text(text: Optional[str], max_tokens: int, query: Optional[str] = None, ranked: bool = False,
+             separator: str = "\n") -> str:
+    """
+    텍스트를 max_tokens 이하로 줄입니다.
+    단락(또는 문장) 단위로 나눠 관련도 순으로 예산이 허용하는 만큼 고르고, 원래 순서대로 다시 잇습니다.
+    - ranked=True : 이미 관련도 순으로 정렬된 텍스트(검색 결과 등) → 앞에서부터 유지
+    - query 지정  : query 와 겹치는 단어가 많은 단위 우선
+    - 그 외       : 앞부분 우선
+    """
+    if not text or token_counter.count(text) <= max_tokens:
+        return text or ""
+    if max_tokens <= 0:
+        return ""
+
+    units = _split_units(text, separator)
+    order = list(range(len(units)))
+    if query and not ranked:
+        query_terms = {word.lower() for word in _word.findall(query)}
+
+        def relevance(i: int) -> float:
+            words = [word.lower() for word in _word.findall(units[i])]
+            if not words:
+                return 0.0
+            return sum(1 for word in words if word in query_terms) / len(words) ** 0.5
+
+        order.sort(key=lambda i: (-relevance(i), i))
+
+    separator_tokens = token_counter.count(separator)
+    chosen, used = [], 0
+    for i in order:
+        cost = token_counter.count(units[i]) + (separator_tokens if chosen else 0)
+        if used + cost <= max_tokens:
+            chosen.append(i)
+            used += cost
+    if not chosen:
+        return token_counter.truncate(units[order[0]], max_tokens)
+    return separator.join(units[i] for i in sorted(chosen))
+
+
+def fit_sections(sections: Sequence[Tuple[Optional[str], Optional[str]]], max_tokens: int) -> List[str]:
+    """
+    여러 (텍스트, 관련도 기준 query) 섹션을 합계 max_tokens 이하로 줄입니다.
+    예산을 넘으면 각 섹션의 원래 크기에 비례해 예산을 나눠 fit_text 로 압축합니다.
+    """
+    sizes = [token_counter.count(text) for text, _ in sections]
+    total = sum(sizes)
+    if total <= max_tokens:
+        return [text or "" for text, _ in sections]
+    return [
+        fit_text(text, int(max(0, max_tokens) * size / total), query=query)
+        for (text, query), size in zip(sections, sizes)
+    ]
+
+
+def pack_chunks(texts: Iterable[Optional[str]], max_tokens: int, separator: str = "\n") -> Iterator[str]:
+    """
+    텍스트를 순서대로 이어 붙여 max_tokens 이하의 청크로 나눕니다. (입력을 스트리밍으로 받아 청크 단위로 yield)
+    하나만으로 예산을 넘는 텍스트는 예산에 맞게 잘라 단독 청크로 만듭니다.
+    """
+    separator_tokens = token_counter.count(separator)
+    chunk: List[str] = []
+    used = 0
+    for text in texts:
+        if not text:
+            continue
+        cost = token_counter.count(text)
+        if cost > max_tokens:
+            text, cost = token_counter.truncate(text, max_tokens), max_tokens
+        if chunk and used + separator_tokens + cost > max_tokens:
+            yield separator.join(chunk)
+            chunk, used = [], 0
+        used += cost + (separator_tokens if chunk else 0)
+        chunk.append(text)
+    if chunk:
+        yield separator.join(chunk)
+
+
+def get_prompt_budget(role: str) -> int:
+    return settings.AGENT_PROMPT_BUDGETS[role]
+
+
+class ConversationTokenLedger:
+    """ 턴별/대화 전체의 입력·출력 토큰과 예산 때문에 잘라낸 토큰 수를 기록합니다. """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.turns: List[Dict[str, object]] = []
+
+    def record(self, role: str, input_tokens: int, output_tokens: int, trimmed_tokens: int = 0):
+        turn = {"role": role, "input_tokens": input_tokens, "output_tokens": output_tokens,
+                "trimmed_tokens": trimmed_tokens}
+        self.turns.append(turn)
+        logger.info(f"{self.label} 턴 {len(self.turns)} [{role}] 토큰 입력 {input_tokens} / 출력 {output_tokens}"
+                    f" (예산 초과로 제외 {trimmed_tokens})")
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "turns": len(self.turns),
+            "input_tokens": sum(turn["input_tokens"] for turn in self.turns),
+            "output_tokens": sum(turn["output_tokens"] for turn in self.turns),
+            "trimmed_tokens": sum(turn["trimmed_tokens"] for turn in self.turns),
+        }
+
+    def log_summary(self):
+        logger.info(f"{self.label} 대화 전체 토큰: {self.totals()}")
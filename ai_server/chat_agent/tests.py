@@ -0,0 +1,604 @@
+import asyncio
+import functools
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import fitz  # PyMuPDF
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from ai_server.db_backends.pooled_mysql import base as pooled_mysql
+from chat_agent.models import Chat, ChatRoom, Company, CompanyFile, Lead
+from chat_agent.services import agent_chat_service, pdf_service
+from chat_agent.services.agent_chat_service import ConversationMemory
+from chat_agent.services.chat_writer import ChatWriter
+from chat_agent.services.embedding_cache import EmbeddingCache, _DiskTier, make_cache_key
+from chat_agent.services.embedding_providers import HashingEmbeddingProvider, get_embedding_provider
+from chat_agent.services.file_store import JsonFileStore
+from chat_agent.services.llm_scheduler import LLMScheduler, _ModelLimiter, retry_delay_from_headers
+from chat_agent.services.memory_store import RoomMemoryStore
+from chat_agent.services.negotiation_batch import (STATUS_DONE, STATUS_FAILED, STATUS_RUNNING,
+                                                   NegotiationCheckpoint, run_negotiation_batch)
+from chat_agent.services import negotiation_jobs as negotiation_jobs_module
+from chat_agent.services.negotiation_jobs import (EventLog, EventPosition, NegotiationJob, events_after,
+                                                  parse_event_id)
+from chat_agent.services.pdf_service import PDFAnalysisService, _page_runs, _remap_page_refs
+from chat_agent.services.stub_llm import build_stub_run_config
+from chat_agent.services.token_budget import pack_chunks, token_counter
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _cache(self, memory_max_entries=0):
+        return EmbeddingCache(memory_max_entries=memory_max_entries, disk_dir=self.tmp.name,
+                              disk_max_bytes=1024 * 1024)
+
+    def test_disk_tier_round_trip(self):
+        vector = np.array([0.6, 0.8, 0.0, 0.0], dtype=np.float32)
+        writer = self._cache()
+        writer.put("model-a", "안녕하세요", vector)
+        writer.flush()
+
+        # 새 인스턴스(재시작/다른 워커)에서 디스크로부터 읽음
+        reader = self._cache()
+        cached = asyncio.run(reader.aget("model-a", "  안녕하세요 "))
+        np.testing.assert_array_equal(cached, vector)
+        self.assertFalse(cached.flags.writeable)
+        self.assertIsNone(reader.get("model-b", "안녕하세요"))
+        self.assertEqual((reader.disk_hits, reader.misses), (1, 1))
+
+    def test_memory_tier_hit_skips_disk(self):
+        cache = self._cache(memory_max_entries=10)
+        cache.put("model-a", "text", np.ones(4, dtype=np.float32))
+        self.assertIsNotNone(asyncio.run(cache.aget("model-a", "text")))
+        self.assertEqual((cache.memory_hits, cache.disk_hits), (1, 0))
+
+    def test_logs_stats_every_n_lookups(self):
+        cache = EmbeddingCache(memory_max_entries=10, log_every=2)
+        cache.put("model-a", "text", np.ones(4, dtype=np.float32))
+        with self.assertLogs("chat_agent.services.embedding_cache", "INFO") as logs:
+            cache.get("model-a", "text")
+            cache.get("model-a", "other")
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("'hit_rate': 0.5", logs.output[0])
+
+    def test_disk_tier_evicts_oldest_when_full(self):
+        dim = 4
+        tier = _DiskTier(Path(self.tmp.name), "model", dim, max_bytes=2 * (dim * 4 + 32))
+        self.assertEqual(tier.capacity, 2)
+        keys = [make_cache_key("model", f"text {i}") for i in range(3)]
+        for i, key in enumerate(keys):
+            tier.put(key, np.full(dim, i, dtype=np.float32))
+
+        self.assertIsNone(tier.get(keys[0]))
+        np.testing.assert_array_equal(tier.get(keys[2]), np.full(dim, 2, dtype=np.float32))
+        self.assertEqual((len(tier), tier.evictions), (2, 1))
+
+
+class RoomMemoryStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = RoomMemoryStore(self.tmp.name)
+        self.provider = HashingEmbeddingProvider(dim=64)
+
+    def _memory(self, chat_room_id=1):
+        return ConversationMemory(chat_room_id=chat_room_id, store=self.store, embedding_provider=self.provider)
+
+    def test_round_trip_resume_and_search(self):
+        async def scenario():
+            memory = self._memory()
+            await memory.add_conversation_turn("SellerAgent", "클라우드 보안 솔루션을 제안합니다.")
+            await memory.add_conversation_turn("BuyerAgent", "물류 창고 자동화 로봇 예산이 있습니다.",
+                                               "SellerAgent", "클라우드 보안 솔루션을 제안합니다.")
+
+            # 재시작 후 같은 채팅방: 재임베딩 없이 인덱스 복원
+            reloaded = self._memory()
+            remembered = await reloaded.resume(max_turns=2)
+            context = await reloaded.get_relevant_context("물류 창고 자동화 로봇", k=1)
+            return remembered, reloaded, context
+
+        remembered, reloaded, context = asyncio.run(scenario())
+        self.assertEqual(remembered, 2)
+        self.assertEqual((reloaded.index.ntotal, len(reloaded.document_store)), (2, 2))
+        self.assertIn("Turn 2", context)
+        self.assertIn("물류 창고 자동화", context)
+
+    def test_resume_clears_memory_ahead_of_stored_chats(self):
+        async def scenario():
+            memory = self._memory()
+            for i in range(3):
+                await memory.add_conversation_turn("SellerAgent", f"메시지 {i}")
+            # 채팅은 1건만 저장된 상태에서 중단됨 → 메모리를 비우고 채팅으로 다시 적재
+            return await self._memory().resume(max_turns=1)
+
+        self.assertEqual(asyncio.run(scenario()), 0)
+        self.assertFalse(self.store.exists(1))
+
+    def test_append_drops_uncommitted_tail(self):
+        vectors = np.ones((1, 4), dtype=np.float32)
+        self.store.append(1, vectors, [{"text": "a"}])
+        room_dir = Path(self.tmp.name) / "1"
+        # meta 에 반영되지 않은 꼬리 (쓰기 도중 중단된 이전 append)
+        with open(room_dir / "docs.jsonl", "ab") as f:
+            f.write(b'{"text":"partial')
+        with open(room_dir / "vectors.f16", "ab") as f:
+            f.write(b"\x00\x01")
+
+        self.store.append(1, vectors * 2, [{"text": "b"}])
+        loaded, docs = self.store.load(1, 4)
+        self.assertEqual([doc["text"] for doc in docs], ["a", "b"])
+        np.testing.assert_array_equal(loaded, np.array([[1] * 4, [2] * 4], dtype=np.float16))
+
+
+class JsonFileStoreTests(SimpleTestCase):
+    def test_failed_write_keeps_previous_value_and_no_temp_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JsonFileStore(tmp)
+            store.set("5-1", {"summary": "이전 보고서"})
+            with self.assertRaises(TypeError):
+                store.set("5-1", {"summary": object()})  # 직렬화 실패
+            self.assertEqual(store.get("5-1"), {"summary": "이전 보고서"})
+            self.assertEqual([path.name for path in Path(tmp).iterdir()], ["5-1.json"])
+
+
+class FakeAPIError(Exception):
+    """ openai 예외처럼 status_code 와 response.headers 를 가진 테스트용 오류 """
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    def test_token_bucket_waits_for_refill(self):
+        limiter = _ModelLimiter("model", rpm=60, tpm=600)
+        now = time.monotonic()
+        self.assertEqual(limiter.try_take(now, 400), 0.0)
+        # 남은 200 토큰으로는 부족: 400 - 200 = 200 토큰이 다시 차는 데 20초 (600 TPM)
+        self.assertAlmostEqual(limiter.try_take(now, 400), 20.0)
+        limiter.refill(now + 20)
+        self.assertEqual(limiter.try_take(now + 20, 400), 0.0)
+
+    def test_rate_limit_pauses_then_recovers_gradually(self):
+        limiter = _ModelLimiter("model", rpm=60, tpm=600)
+        now = time.monotonic()
+        self.assertEqual(limiter.on_rate_limited(now, 2.0), 2.0)
+        self.assertAlmostEqual(limiter.try_take(now + 0.5, 1), 1.5)
+        self.assertEqual(limiter.rate_factor, 0.5)
+        limiter.on_success()
+        self.assertAlmostEqual(limiter.rate_factor, 0.55)
+        self.assertEqual(limiter.try_take(now + 2, 1), 0.0)
+
+    def test_retry_delay_from_headers(self):
+        self.assertEqual(retry_delay_from_headers({"retry-after-ms": "250"}), 0.25)
+        self.assertEqual(retry_delay_from_headers({"retry-after": "2"}), 2.0)
+        self.assertEqual(retry_delay_from_headers({"x-ratelimit-reset-requests": "1s",
+                                                   "x-ratelimit-reset-tokens": "6m0s"}), 360.0)
+        self.assertIsNone(retry_delay_from_headers({}))
+        self.assertIsNone(retry_delay_from_headers(None))
+
+    def _scheduler(self):
+        return LLMScheduler({}, {"rpm": 6000, "tpm": 1000000}, max_retries=2, max_wait_seconds=5, log_every=0)
+
+    def test_call_retries_after_rate_limit_backoff(self):
+        scheduler = self._scheduler()
+        outcomes = [FakeAPIError(429, {"retry-after-ms": "50"}), "ok"]
+
+        def fn():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        started = time.monotonic()
+        with self.assertLogs("chat_agent.services.llm_scheduler", "WARNING"):
+            self.assertEqual(scheduler.call(fn, model="gpt-test", tokens=10), "ok")
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(scheduler._limiter("gpt-test").rate_limited_count, 1)
+
+    def test_call_retries_transient_errors_but_not_client_errors(self):
+        scheduler = self._scheduler()
+        calls = []
+
+        def flaky():
+            calls.append("flaky")
+            if len(calls) == 1:
+                raise FakeAPIError(502)
+            return "ok"
+
+        def bad_request():
+            calls.append("bad")
+            raise FakeAPIError(400)
+
+        with mock.patch("chat_agent.services.llm_scheduler.transient_retry_delay", return_value=0):
+            self.assertEqual(scheduler.call(flaky, model="gpt-test", tokens=10), "ok")
+            with self.assertRaises(FakeAPIError):
+                scheduler.call(bad_request, model="gpt-test", tokens=10)
+        self.assertEqual(calls, ["flaky", "flaky", "bad"])
+
+    def test_failed_call_refunds_tokens_without_raising_rate(self):
+        scheduler = self._scheduler()
+        limiter = scheduler._limiter("gpt-test")
+        limiter.rate_factor = 0.5
+        grant = scheduler.acquire("gpt-test", 1000)
+        remaining = limiter.token_tokens
+        scheduler.finish(grant, FakeAPIError(500))
+        self.assertEqual(limiter.rate_factor, 0.5)
+        self.assertGreaterEqual(limiter.token_tokens, remaining + 1000 - 1)
+
+
+class PackChunksTests(SimpleTestCase):
+    def test_packs_in_order_within_budget(self):
+        texts = [f"문장 {i} " + "내용 " * 20 for i in range(30)]
+        chunks = list(pack_chunks(texts + [None, ""], 100))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(token_counter.count(chunk) <= 100 for chunk in chunks))
+        self.assertEqual("\n".join(chunks), "\n".join(texts))
+
+    def test_oversized_text_is_truncated_into_its_own_chunk(self):
+        chunks = list(pack_chunks(["짧은 앞 문장", "긴 문장 " * 500, "짧은 뒤 문장"], 50))
+        self.assertEqual(len(chunks), 3)
+        self.assertLessEqual(token_counter.count(chunks[1]), 50)
+
+
+class PageRunsTests(SimpleTestCase):
+    def test_inserted_page_only_changes_nearby_runs(self):
+        pages = [f"페이지 {i}: " + f"사업 내용 {i} " * 30 for i in range(60)]
+        before = [run["key"] for run in _page_runs(pages, 2000, 8)]
+        after = [run["key"] for run in _page_runs(["새로 추가한 표지"] + pages, 2000, 8)]
+        self.assertGreater(len(before), 3)
+        changed = set(after) - set(before)
+        self.assertLessEqual(len(changed), 2)
+        self.assertEqual([run["key"] for run in _page_runs(pages, 2000, 8)], before)
+
+    def test_reused_facts_follow_page_numbers(self):
+        pages = [f"페이지 {i}: " + f"사업 내용 {i} " * 30 for i in range(60)]
+        before = {run["key"]: run["pages"] for run in _page_runs(pages, 2000, 8)}
+        for run in _page_runs(["새로 추가한 표지"] + pages, 2000, 8):
+            if run["key"] in before:
+                facts = f"- 매출 100억 [p.{before[run['key']][0]}]"
+                self.assertEqual(_remap_page_refs(facts, before[run["key"]], run["pages"]),
+                                 f"- 매출 100억 [p.{run['pages'][0]}]")
+                self.assertEqual(run["pages"][0], before[run["key"]][0] + 1)
+
+
+class SSEEventIdTests(SimpleTestCase):
+    def _log(self):
+        log = EventLog()
+        for event in ({"type": "delta"}, {"id": 10}, {"type": "delta"}, {"type": "delta"}, {"id": 11},
+                      {"error": "x"}):
+            log.append(event)
+        return log
+
+    def test_every_event_gets_increasing_sequence_and_chat_watermark(self):
+        log = self._log()
+        positions = [parse_event_id(event_id) for event_id, _ in log.events]
+        self.assertEqual([position.seq for position in positions], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([position.chat_id for position in positions], [0, 10, 10, 10, 11, 11])
+        self.assertTrue(all(position.source == log.source for position in positions))
+
+    def test_same_job_resumes_mid_message_by_sequence(self):
+        log = self._log()
+        # 메시지 도중(첫 번째 델타 뒤) 끊긴 경우 남은 델타부터 이어서
+        self.assertEqual(log.after(parse_event_id(log.events[2][0])), log.events[3:])
+        self.assertEqual(log.after(EventPosition()), log.events)
+
+    def test_other_job_falls_back_to_chat_id(self):
+        log = self._log()
+        self.assertEqual(log.after(parse_event_id("otherjob-3-10")), log.events[2:])
+        self.assertEqual(events_after(log.events, log.source, parse_event_id("11")), log.events[5:])
+        # 채팅방을 비우고 다시 만든 채팅(더 큰 id)은 이전 id 로 재연결해도 모두 전송
+        self.assertEqual(log.after(parse_event_id("5")), log.events)
+        self.assertEqual(parse_event_id("garbage-x"), EventPosition())
+
+
+class FakeRunLock:
+    """ 다른 프로세스가 잡고 있는 리드 실행 잠금: busy 번 시도할 때까지 획득 실패 """
+
+    def __init__(self, busy):
+        self.busy = busy
+
+    async def acquire(self, timeout=0):
+        self.busy -= 1
+        return self.busy < 0
+
+    async def release(self):
+        pass
+
+
+class NegotiationCheckpointTests(SimpleTestCase):
+    def test_reload_keeps_last_status_and_ignores_torn_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "checkpoint.jsonl"
+            checkpoint = NegotiationCheckpoint(str(path))
+            checkpoint.mark(1, STATUS_RUNNING, chat_room_id=7)
+            checkpoint.mark(1, STATUS_DONE, chat_room_id=7, messages=8)
+            checkpoint.mark(2, STATUS_RUNNING)
+            checkpoint.close()
+            with open(path, "a", encoding="utf-8") as f:
+                f.write('{"lead_id": 2, "status": "do')  # 비정상 종료로 잘린 줄
+
+            with self.assertLogs("chat_agent.services.negotiation_batch", "WARNING"):
+                reloaded = NegotiationCheckpoint(str(path))
+            self.assertEqual(reloaded.status(1), STATUS_DONE)
+            self.assertEqual(reloaded.get(1)["messages"], 8)
+            self.assertEqual(reloaded.status(2), STATUS_RUNNING)
+            self.assertIsNone(reloaded.status(3))
+
+
+class FakeDBConnection:
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PooledMySQLBackendTests(SimpleTestCase):
+    def test_pool_follows_changed_connection_params(self):
+        settings_dict = {**connection.settings_dict, "NAME": "a2a", "POOL": {"MAX_SIZE": 2}}
+        wrapper = pooled_mysql.DatabaseWrapper(settings_dict, alias="pool-test")
+        with mock.patch.object(pooled_mysql.mysql_base.DatabaseWrapper, "get_new_connection",
+                               side_effect=lambda params: FakeDBConnection()) as connect:
+            wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+            first = wrapper.connection
+            wrapper._close()
+            self.assertIs(wrapper.get_new_connection(wrapper.get_connection_params()), first)  # 같은 풀에서 재사용
+
+            wrapper.settings_dict["NAME"] = "test_a2a"
+            self.assertIsNot(wrapper.get_new_connection(wrapper.get_connection_params()), first)
+        self.assertEqual([call.args[0]["database"] for call in connect.call_args_list], ["a2a", "test_a2a"])
+
+
+class UnmanagedTablesMixin:
+    """ managed=False 모델의 테이블을 테스트 DB 에 만들고 지웁니다. """
+    models = (Company, CompanyFile, Lead, ChatRoom, Chat)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connection.schema_editor() as editor:
+            for model in cls.models:
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            for model in reversed(cls.models):
+                editor.delete_model(model)
+        super().tearDownClass()
+
+    def create_lead(self):
+        buyer = Company.objects.create(company_name="구매사")
+        seller = Company.objects.create(company_name="판매사")
+        CompanyFile.objects.create(company=buyer, summary="구매사는 물류 자동화를 검토 중입니다.")
+        CompanyFile.objects.create(company=seller, summary="판매사는 창고 로봇을 공급합니다.")
+        return Lead.objects.create(lead_company=buyer, source_company=seller)
+
+
+class ChatWriterTests(UnmanagedTablesMixin, TransactionTestCase):
+    def _write(self, lead):
+        room = ChatRoom.objects.create(lead=lead)
+        writer = ChatWriter(room.id)
+        seller, buyer = lead.source_company, lead.lead_company
+        for i in range(3):
+            writer.add(seller, buyer, f"메시지 {i}", f"{lead.id}-{i}")
+        return room, async_to_sync(writer.flush)()
+
+    def _assert_mapping(self, room, persisted):
+        stored = list(Chat.objects.filter(chat_room_id=room.id).order_by("id").values_list("id", "contents"))
+        self.assertEqual([content for _, content in stored], ["메시지 0", "메시지 1", "메시지 2"])
+        self.assertEqual([(chat["provisionalId"], chat["id"]) for chat in persisted["chats"]],
+                         [(f"{room.lead_id}-{i}", chat_id) for i, (chat_id, _) in enumerate(stored)])
+
+    def test_flush_maps_provisional_ids_to_inserted_ids(self):
+        room, persisted = self._write(self.create_lead())
+        self.assertEqual(persisted["type"], "persisted")
+        self._assert_mapping(room, persisted)
+
+    def test_flush_maps_ids_when_bulk_create_returns_no_pks(self):
+        real_bulk_create = Chat.objects.bulk_create
+
+        def bulk_create_without_pks(chats):
+            created = real_bulk_create(chats)
+            for chat in created:
+                chat.pk = None  # MySQL 처럼 pk 를 돌려주지 않는 경우
+            return created
+
+        with mock.patch.object(Chat.objects, "bulk_create", bulk_create_without_pks):
+            room, persisted = self._write(self.create_lead())
+        self._assert_mapping(room, persisted)
+
+    @skipUnless(connection.vendor == "mysql", "다른 연결의 동시 INSERT 는 MySQL(InnoDB)에서만 재현")
+    def test_flush_ignores_rows_from_another_writer(self):
+        lead = self.create_lead()
+        room = ChatRoom.objects.create(lead=lead)
+        writer = ChatWriter(room.id)
+        for i in range(3):
+            writer.add(lead.source_company, lead.lead_company, f"메시지 {i}", f"{lead.id}-{i}")
+        real_bulk_create = Chat.objects.bulk_create
+
+        def other_writer():
+            Chat.objects.create(chat_room=room, from_field=lead.lead_company, to=lead.source_company,
+                                contents="다른 작성자")
+            connections.close_all()
+
+        def bulk_create_then_other_writer(chats):
+            created = real_bulk_create(chats)
+            # 같은 채팅방에 다른 연결(작성자)이 바로 뒤이어 저장한 행이 가장 최근 ID 가 됨
+            thread = threading.Thread(target=other_writer)
+            thread.start()
+            thread.join()
+            return created
+
+        with mock.patch.object(Chat.objects, "bulk_create", bulk_create_then_other_writer):
+            persisted = async_to_sync(writer.flush)()
+        stored = dict(Chat.objects.filter(chat_room=room).values_list("id", "contents"))
+        self.assertEqual([stored[chat["id"]] for chat in persisted["chats"]], ["메시지 0", "메시지 1", "메시지 2"])
+
+
+@override_settings(AGENT_CHAT_WRITE_BEHIND=False, AGENT_MEMORY_PIPELINED=False, AGENT_MEMORY_SUMMARY_STRATEGY="raw")
+class NegotiationBatchTests(UnmanagedTablesMixin, TransactionTestCase):
+    def _run(self, lead_ids, checkpoint):
+        return async_to_sync(run_negotiation_batch)(
+            lead_ids, concurrency=2, checkpoint=checkpoint, run_config=build_stub_run_config(0),
+            embedding_provider=get_embedding_provider("local"), progress_every=0)
+
+    def test_rerun_skips_done_leads(self):
+        leads = [self.create_lead().id for _ in range(2)]
+        checkpoint = NegotiationCheckpoint(None)
+        report = self._run(leads, checkpoint)
+        self.assertEqual((report.done, report.failed), (2, 0))
+        self.assertTrue(all(checkpoint.status(lead_id) == STATUS_DONE for lead_id in leads))
+
+        report = self._run(leads, checkpoint)
+        self.assertEqual((report.done, report.skipped), (0, 2))
+        self.assertEqual(ChatRoom.objects.filter(lead_id__in=leads).count(), 2)
+
+    def test_interrupted_lead_resumes_in_its_chat_room(self):
+        lead = self.create_lead()
+        checkpoint = NegotiationCheckpoint(None)
+        self._run([lead.id], checkpoint)
+        room = ChatRoom.objects.get(lead=lead)
+        kept = list(Chat.objects.filter(chat_room=room).order_by("id").values_list("id", flat=True)[:3])
+        Chat.objects.filter(chat_room=room).exclude(id__in=kept).delete()
+        checkpoint.mark(lead.id, STATUS_RUNNING, chat_room_id=room.id)  # 배치가 중간에 중단된 상태
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                override_settings(AGENT_MEMORY_PERSIST=True), \
+                mock.patch.object(agent_chat_service, "room_memory_store", RoomMemoryStore(tmp)):
+            report = self._run([lead.id], checkpoint)
+
+        self.assertEqual((report.done, report.resumed), (1, 1))
+        self.assertEqual(ChatRoom.objects.filter(lead=lead).count(), 1)
+        chat_ids = list(Chat.objects.filter(chat_room=room).order_by("id").values_list("id", flat=True))
+        self.assertEqual(chat_ids[:3], kept)  # 저장된 채팅은 그대로 두고 다음 메시지부터 생성
+        self.assertEqual(len(chat_ids), agent_chat_service.MAX_CONVERSATION_MESSAGES)
+        self.assertNotEqual(checkpoint.status(lead.id), STATUS_FAILED)
+
+
+
+@override_settings(AGENT_CHAT_WRITE_BEHIND=False, AGENT_MEMORY_PIPELINED=False, AGENT_MEMORY_SUMMARY_STRATEGY="raw",
+                   AGENT_DRY_RUN=False, NEGOTIATION_FOLLOW_POLL_SECONDS=0)
+class NegotiationJobRunLockTests(UnmanagedTablesMixin, TransactionTestCase):
+    def setUp(self):
+        stub_conversation = functools.partial(agent_chat_service.run_agent_conversation,
+                                              run_config=build_stub_run_config(0),
+                                              embedding_provider=get_embedding_provider("local"))
+        patcher = mock.patch.object(negotiation_jobs_module, "run_agent_conversation", stub_conversation)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, lead, busy):
+        job = NegotiationJob(lead.id, stream_tokens=False)
+        with mock.patch.object(negotiation_jobs_module, "lead_run_lock", lambda lead_id: FakeRunLock(busy)):
+            async_to_sync(job.run)()
+        return job
+
+    def _stored_ids(self, lead):
+        return list(Chat.objects.filter(chat_room__lead=lead).order_by("id").values_list("id", flat=True))
+
+    def test_follows_conversation_generated_by_another_process(self):
+        lead = self.create_lead()
+        self._run(lead, busy=0)
+        stored = self._stored_ids(lead)
+
+        job = self._run(lead, busy=10)  # 잠금을 잡은 다른 프로세스가 이미 대화를 저장함
+        self.assertFalse(job.failed)
+        self.assertEqual([event["id"] for _, event in job.events], stored)
+        self.assertEqual(self._stored_ids(lead), stored)
+        self.assertEqual(ChatRoom.objects.filter(lead=lead).count(), 1)
+
+    def test_takes_over_interrupted_conversation_without_duplicates(self):
+        lead = self.create_lead()
+        self._run(lead, busy=0)
+        kept = self._stored_ids(lead)[:3]
+        Chat.objects.filter(chat_room__lead=lead).exclude(id__in=kept).delete()  # 다른 프로세스가 중간에 죽음
+
+        job = self._run(lead, busy=1)
+        published = [event["id"] for _, event in job.events]
+        self.assertFalse(job.failed)
+        self.assertEqual(published, self._stored_ids(lead))
+        self.assertEqual(published[:3], kept)
+        self.assertEqual(len(published), agent_chat_service.MAX_CONVERSATION_MESSAGES)
+        self.assertEqual(ChatRoom.objects.filter(lead=lead).count(), 1)
+
+
+def _pdf_bytes(pages, title):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.set_metadata({"title": title})
+    return doc.tobytes()
+
+
+class PDFAnalysisCacheTests(UnmanagedTablesMixin, TransactionTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patcher in (mock.patch.object(pdf_service, "pdf_analysis_cache", JsonFileStore(tmp.name)),
+                        mock.patch.object(pdf_service, "pdf_page_facts_store", JsonFileStore(f"{tmp.name}/pages")),
+                        mock.patch.object(pdf_service.clients, "openai")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        llm_patcher = mock.patch.object(PDFAnalysisService, "_extract_company_info_with_ai",
+                                        return_value={"summary": "회사 요약"})
+        self.llm = llm_patcher.start()
+        self.addCleanup(llm_patcher.stop)
+        self.company = Company.objects.create(company_name="판매사")
+
+    @override_settings(PDF_ANALYSIS_MODE="single", PDF_EXTRACT_WORKERS=1)
+    def test_same_bytes_or_same_text_hits_cache(self):
+        pages = ["회사 소개", "제품 소개"]
+        first = CompanyFile.objects.create(company=self.company, url="first")
+        resaved = CompanyFile.objects.create(company=self.company, url="resaved")
+        downloads = {"first": _pdf_bytes(pages, "v1"), "resaved": _pdf_bytes(pages, "v2")}
+        self.assertNotEqual(downloads["first"], downloads["resaved"])
+
+        with mock.patch.object(PDFAnalysisService, "_download_pdf", side_effect=downloads.get):
+            service = PDFAnalysisService()
+            self.assertEqual(service.analyze(first.id), {"summary": {"summary": "회사 요약"}, "cache_hit": False})
+            self.assertTrue(service.analyze(first.id)["cache_hit"])  # 같은 바이트
+            self.assertTrue(service.analyze(resaved.id)["cache_hit"])  # 다시 저장한 PDF, 같은 텍스트
+        self.assertEqual(self.llm.call_count, 1)
+        self.assertIn("회사 요약", CompanyFile.objects.get(id=resaved.id).summary)
+
+    @override_settings(PDF_ANALYSIS_MODE="chunked", PDF_INCREMENTAL_ANALYSIS=True, PDF_EXTRACT_WORKERS=1,
+                       PDF_CHUNK_BOUNDARY_PAGES=4)
+    def test_revised_deck_reuses_unchanged_runs_with_new_page_numbers(self):
+        pages = [f"Page {i} " + f"business detail {i} " * 10 for i in range(24)]
+        first = CompanyFile.objects.create(company=self.company, url="first")
+        revised = CompanyFile.objects.create(company=self.company, url="revised")
+        downloads = {"first": _pdf_bytes(pages, "v1"), "revised": _pdf_bytes(["New cover"] + pages, "v2")}
+
+        def chunk_facts(chunk, company_name):
+            # 구간 텍스트의 "[p.N]\nPage i" 를 그대로 사실로 인용
+            return "\n".join(f"- Page {i} [p.{n}]" for n, i in re.findall(r"\[p\.(\d+)\]\nPage (\d+)", chunk))
+
+        with mock.patch.object(PDFAnalysisService, "_download_pdf", side_effect=downloads.get), \
+                mock.patch.object(PDFAnalysisService, "_extract_chunk_facts", side_effect=chunk_facts) as extract, \
+                mock.patch.object(PDFAnalysisService, "_complete", side_effect=lambda model, prompt, **kw: prompt):
+            service = PDFAnalysisService()
+            service.analyze(first.id)
+            first_calls = extract.call_count
+            summary = service.analyze(revised.id)["summary"]
+
+        self.assertLess(extract.call_count - first_calls, first_calls)  # 바뀐 구간만 다시 추출
+        cited = re.findall(r"- Page (\d+) \[p\.(\d+)\]", summary)
+        self.assertEqual(len(cited), len(pages))
+        self.assertTrue(all(int(n) == int(i) + 2 for i, n in cited))  # 표지가 추가되어 한 페이지씩 밀림
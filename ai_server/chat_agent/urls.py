@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from .views import ChatAgentView, PDFAnalysisView, A2aChatView, ChatSummaryView, LeadDataView
+from .views import ChatAgentView, PDFAnalysisView, PDFAnalysisBulkView, PDFAnalysisJobView, A2aChatView, A2aChatAsyncView, ChatSummaryView, LeadDataView
+
+# ASGI 로 배포하면 기존 경로도 비동기 SSE 뷰로 처리 (A2A_ASYNC_STREAMING)
+a2a_chat_view = A2aChatAsyncView if settings.A2A_ASYNC_STREAMING else A2aChatView
 
 urlpatterns = [
     path('analyze-pdf', PDFAnalysisView.as_view(), name='analyze_pdf'),
+    path('analyze-pdf/bulk', PDFAnalysisBulkView.as_view(), name='analyze_pdf_bulk'),
+    path('analyze-pdf/jobs/<str:job_id>', PDFAnalysisJobView.as_view(), name='analyze_pdf_job'),
     path('chats', ChatAgentView.as_view(), name='chat_agent'),
-    path('leads/<int:lead_id>/agents/chats', A2aChatView.as_view(), name='agent_chats'),
+    path('leads/<int:lead_id>/agents/chats', a2a_chat_view.as_view(), name='agent_chats'),
+    path('leads/<int:lead_id>/agents/chats/async', A2aChatAsyncView.as_view(), name='agent_chats_async'),
     path('rooms/<int:room_id>/summary', ChatSummaryView.as_view(), name='chat_agent_summary'),
     path('leads/details', LeadDataView.as_view(), name='leads_details'),
 ]
\ No newline at end of file
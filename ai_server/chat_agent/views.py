@@ -1,10 +1,8 @@
-import asyncio
 import json
 import logging
-import queue
-import threading
+from typing import Optional
 
-from django.db import close_old_connections
+from django.conf import settings
 from django.http import HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.views import View
@@ -12,12 +10,13 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from chat_agent.services.agent_chat_service import run_agent_conversation
 from chat_agent.services.chat_service import ChatService
 from chat_agent.services.chat_summary_service import create_chat_summary
 from chat_agent.services.lead_details_service import LeadDetailsService
+from chat_agent.services.negotiation_jobs import EventPosition, negotiation_jobs, parse_event_id
+from chat_agent.services.pdf_analysis_jobs import pdf_analysis_jobs
 from chat_agent.services.pdf_service import PDFAnalysisService
-from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.sync import async_to_sync
 
 logger = logging.getLogger(__name__)
 
@@ -38,51 +37,80 @@ class ChatSummaryView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+def format_sse(chat: dict, event_id: Optional[str] = None) -> str:
+    """
+    대화 이벤트를 SSE 형식으로 변환합니다.
+    토큰 델타('delta')와 write-behind 저장 완료('persisted')는 type 이름의 이벤트로 보내 기존 onmessage 소비자에는
+    영향을 주지 않고, 채팅 레코드와 오류는 기존과 같은 기본(message) 이벤트로 보냅니다.
+    event_id 를 id 필드로 보내 브라우저가 재연결 시 Last-Event-ID 로 돌려주게 합니다.
+    (모든 이벤트가 증가하는 순번을 담은 id 를 가지므로 메시지 도중 끊겨도 그 위치부터 이어짐)
+    """
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    if chat.get("type"):
+        return f"{id_line}event: {chat['type']}\ndata: {json.dumps(chat)}\n\n"
+    return f"{id_line}data: {json.dumps(chat)}\n\n"
+
+
+def get_last_event_position(request) -> EventPosition:
+    """ 재연결 위치: Last-Event-ID 헤더(EventSource 자동 재연결) 또는 ?lastEventId= (수동 재연결) """
+    return parse_event_id(request.headers.get('Last-Event-ID') or request.GET.get('lastEventId'))
+
+
+def is_regenerate(request) -> bool:
+    """ ?regenerate=1 : 완료된 채팅방이 있어도 재생하지 않고 대화를 새로 생성 """
+    return request.GET.get('regenerate', '').lower() in ('1', 'true')
+
+
+def sse_response(streaming_content) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(streaming_content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 class A2aChatView(View):
+    """
+    WSGI 용 SSE 뷰. 대화는 리드별 협상 작업(negotiation_jobs)으로 요청과 분리되어 실행되고,
+    이 뷰는 작업의 이벤트를 구독해 전달만 합니다.
+    - 같은 리드를 여러 곳에서 열면 실행 중인 작업 하나를 공유
+    - 연결이 끊겨도 작업은 계속되며, 재연결하면 Last-Event-ID 이후 이벤트만 전송
+    - 완료된 채팅방이 있으면 저장된 채팅을 재생 (?regenerate=1 이면 새로 실행)
+    ASGI 로 배포할 때는 A2aChatAsyncView 를 사용하세요.
+    """
+
     def get(self, request, lead_id):
+        # ?stream=tokens 이면 토큰 단위 델타 이벤트를 함께 전송
+        stream_tokens = request.GET.get('stream') == 'tokens'
+        job = negotiation_jobs.open(lead_id, stream_tokens, regenerate=is_regenerate(request))
+        position = get_last_event_position(request)
+
         def event_stream():
-            # 스레드 간 통신을 위한 큐
-            q = queue.Queue()
-
-            # 비동기 작업을 실행할 스레드
-            def worker():
-                close_old_connections()
-
-                async def process():
-                    try:
-                        async for chat in run_agent_conversation(lead_id):
-                            formatted_data = f"data: {json.dumps(chat)}\n\n"
-                            q.put(formatted_data)
-                    except Exception as e:
-                        logger.error(f"에이전트 대화 실행 중 오류: {e}", exc_info=True)
-                        q.put(f"data: {json.dumps({'error': str(e)})}\n\n")
-                    finally:
-                        # 작업 완료 후 정리
-                        await sync_to_async(close_old_connections)()
-                        q.put(None)
-
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(process())
-                finally:
-                    loop.close()
-
-            # 백그라운드에서 비동기 작업 시작
-            t = threading.Thread(target=worker)
-            t.daemon = True
-            t.start()
-
-            # 큐에서 결과를 하나씩 가져와 반환
-            while True:
-                result = q.get()
-                if result is None:  # 작업 완료 신호
-                    break
-                yield result
-
-        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
-        response['Cache-Control'] = 'no-cache'
-        return response
+            for event_id, chat in job.iter_events(position):
+                if chat.get("type") == "delta" and not stream_tokens:
+                    continue
+                yield format_sse(chat, event_id)
+
+        return sse_response(event_stream())
+
+
+class A2aChatAsyncView(View):
+    """
+    ASGI 용 SSE 뷰. 협상 작업을 이 요청의 이벤트 루프에서 실행하고(보조 스레드 없음), 같은 루프에서 이벤트를
+    구독해 바로 전송합니다. (작업 공유, 재연결, 재생 동작은 A2aChatView 와 동일)
+    """
+
+    async def get(self, request, lead_id):
+        stream_tokens = request.GET.get('stream') == 'tokens'
+        job = await negotiation_jobs.aopen(lead_id, stream_tokens, regenerate=is_regenerate(request))
+        position = get_last_event_position(request)
+
+        async def event_stream():
+            async for event_id, chat in job.aiter_events(position):
+                if chat.get("type") == "delta" and not stream_tokens:
+                    continue
+                yield format_sse(chat, event_id)
+
+        return sse_response(event_stream())
+
 
 class ChatAgentView(APIView):
     def post(self, request):
@@ -114,7 +142,8 @@ class PDFAnalysisView(APIView):
                     )
 
             pdf_service = PDFAnalysisService()
-            analysis = pdf_service.analyze_company_pdf(file_id)
+            result = pdf_service.analyze(file_id)
+            analysis = result["summary"]
 
             if not analysis:
                 return Response(
@@ -124,7 +153,8 @@ class PDFAnalysisView(APIView):
 
             return Response({
                 "message": "PDF analysis completed successfully",
-                "data": analysis
+                "data": analysis,
+                "cacheHit": result["cache_hit"]
             })
 
         except Exception as e:
@@ -133,6 +163,59 @@ class PDFAnalysisView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class PDFAnalysisBulkView(APIView):
+    def post(self, request):
+        """
+        여러 PDF 파일을 백그라운드에서 분석하는 작업을 시작하고 작업 id 를 반환합니다.
+        진행 상태는 PDFAnalysisJobView 로 조회합니다.
+        """
+        file_ids = request.data.get('file_ids')
+        if not isinstance(file_ids, list) or not file_ids:
+            return Response(
+                {"error": "file_ids is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(file_ids) > settings.PDF_BULK_MAX_FILES:
+            return Response(
+                {"error": f"file_ids must not exceed {settings.PDF_BULK_MAX_FILES}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            file_ids = [int(file_id) for file_id in file_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "file_ids must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            job = pdf_analysis_jobs.submit(file_ids)
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response({
+            "message": "PDF analysis job started",
+            "data": job.as_dict()
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class PDFAnalysisJobView(APIView):
+    def get(self, request, job_id):
+        """
+        PDF 일괄 분석 작업의 파일별 진행 상태를 반환합니다.
+        """
+        job = pdf_analysis_jobs.get(job_id)
+        if job is None:
+            return Response(
+                {"error": "job not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"data": job.as_dict()})
+
+
 class LeadDataView(APIView):
     def post(self, request):
         """